@@ -1,10 +1,11 @@
 import os
-import math
 import smtplib
+import sys
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
-from collections import defaultdict
 from email.mime.text import MIMEText
+import click
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
 from flask_jwt_extended import (
@@ -16,29 +17,39 @@ from flask_jwt_extended import (
 from flask_migrate import Migrate
 from jwt.exceptions import ExpiredSignatureError, DecodeError
 from werkzeug.security import generate_password_hash, check_password_hash
-from sklearn.metrics.pairwise import cosine_similarity
-import joblib
-from sqlalchemy import text
+import numpy as np
 from database import db
 from models import Usuario, Filmes, Favoritos, Avaliacao
 from utils import (
-    calcular_vetor_usuario,
+    obter_vetor_usuario,
+    atualizar_vetor_usuario,
+    curte_filme,
     encontrar_vizinhos_cache,
     div_genero,
-    get_user_id)
+    get_user_id,
+    criar_armazem_vetores,
+    admin_autorizado)
+from aquecimento import Aquecimento
+from interacoes import InteracoesUsuario
+from lote import (
+    RecomendadorLote,
+    carregar_interacoes_lote,
+    linhas_resultado,
+    salvar_csv,
+    TIPOS)
+from pontuacao import (
+    pontuar_multiplos, pontuar_multiplos_vizinhos, pontuar_hibrido)
+from precomputadas import JobPrecomputacao, buscar_precomputada
+from cache_recomendacoes import CacheRecomendacoes
+from candidatos import GeradorCandidatos, filmes_da_comunidade
+from catalogo_filmes import CatalogoFilmes
+from matriz_avaliacoes import MatrizAvaliacoes
+from busca import IndiceBusca, IndicePrefixos
+from busca_semantica import BuscaSemantica, BuscaIndisponivel
+from registro_modelos import RegistroModelos, carregar_modelos
+from snapshot_avaliacoes import DIR_SNAPSHOT, atualizar_snapshot
 
-# Carregando modelos e metadata
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-model_embedding = os.path.join(BASE_DIR, 'modelo_recomendacao.pkl')
-model = joblib.load(model_embedding)
-embeddings = model['embeddings']
-tmdb_ids = model['tmdb_ids']
-indices_map = {tmdb_id: i for i, tmdb_id in enumerate(tmdb_ids)}
-meta_por_id = {m["tmdb_id"]: m for m in model["metadata"]}
-MODELO_COLAB_PATH = os.path.join(BASE_DIR, 'modelo_colaborativo.pkl')
-algo_svd = None
-dados_modelo = joblib.load(MODELO_COLAB_PATH)
-algo_svd = dados_modelo.get('model')
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
@@ -56,27 +67,247 @@ app.config['JWT_SECRET_KEY'] = os.getenv("JWT_KEY")
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=2)
 jwt = JWTManager(app)
 
-with app.app_context():
+cache_recomendacoes = CacheRecomendacoes(
+    max_itens=int(os.getenv("CACHE_RECOMENDACOES_MAX", 1000)),
+    ttl=int(os.getenv("CACHE_RECOMENDACOES_TTL", 600)),
+    max_bytes=int(os.getenv("CACHE_RECOMENDACOES_MAX_BYTES", 50 * 1024 * 1024))
+)
+
+# CATALOGO_ATUALIZAR_INTERVALO: segundos entre leituras de filmes novos
+# CATALOGO_RECARREGAR_INTERVALO: segundos entre recargas completas
+catalogo = CatalogoFilmes(
+    intervalo=int(os.getenv("CATALOGO_ATUALIZAR_INTERVALO", 300)),
+    intervalo_recarga=int(os.getenv("CATALOGO_RECARREGAR_INTERVALO", 3600)))
+
+# notas de todos os usuários em memória (caminho de vizinhança)
+# MATRIZ_RECARREGAR_INTERVALO: segundos entre releituras de avaliacoes
+matriz_avaliacoes = MatrizAvaliacoes(
+    max_alteracoes=int(os.getenv("MATRIZ_MAX_ALTERACOES", 1000)),
+    intervalo_recarga=int(os.getenv("MATRIZ_RECARREGAR_INTERVALO", 600)))
+
+indice_busca = IndiceBusca()
+indice_prefixos = IndicePrefixos(
+    max_cache=int(os.getenv("AUTOCOMPLETE_CACHE_MAX", 5000)))
+busca_semantica = BuscaSemantica(
+    nome_modelo=os.getenv("BUSCA_SEMANTICA_MODELO") or None,
+    max_cache=int(os.getenv("BUSCA_SEMANTICA_CACHE_MAX", 1000)))
+
+gerador_candidatos = GeradorCandidatos(
+    k_conteudo=int(os.getenv("CANDIDATOS_CONTEUDO", 1000)),
+    k_svd=int(os.getenv("CANDIDATOS_SVD", 300)),
+    k_comunidade=int(os.getenv("CANDIDATOS_COMUNIDADE", 100))
+)
+
+
+def _comunidade(modelos, user_id, k):
+    """ Fonte de comunidade dos candidatos do híbrido (rota e lote). """
+    return filmes_da_comunidade(
+        matriz_avaliacoes, modelos.armazem, modelos.indices_map, user_id, k)
+
+
+# recomendações pré-calculadas (job noturno), ver precomputadas.py
+# o híbrido usa os mesmos candidatos da rota
+job_precomputacao = JobPrecomputacao(
+    processos=int(os.getenv("PRECOMPUTAR_PROCESSOS", 2)),
+    tam_parte=int(os.getenv("PRECOMPUTAR_TAM_PARTE", 500)),
+    memoria_mb=int(os.getenv("LOTE_MEMORIA_MB", 256)),
+    gerador=gerador_candidatos, comunidade=_comunidade)
+VALIDADE_PRECOMPUTADAS = int(os.getenv("PRECOMPUTADAS_VALIDADE_HORAS", 24))
+
+# fold-in no SVD de usuários fora do treino, ver FatoresSVD.dobrar
+SVD_DOBRA_REG = float(os.getenv("SVD_DOBRA_REG", 0.02))
+SVD_DOBRA_MAX = int(os.getenv("SVD_DOBRA_MAX", 10000))
+
+
+def preparar_modelos(modelos, assincrono=False):
+    """
+    Votos do SVD e perfis de usuário de uma versão dos modelos, feitos
+    antes de ela atender requisições (na carga inicial e nas recargas).
+    """
+    modelos.armazem = criar_armazem_vetores(modelos.versao.split("|")[0])
+    modelos.aquecimento = Aquecimento()
+
+    if modelos.fatores_svd:
+        modelos.fatores_svd.reg_dobra = SVD_DOBRA_REG
+        modelos.fatores_svd.max_dobrados = SVD_DOBRA_MAX
+        if len(catalogo):
+            modelos.fatores_svd.carregar_votos(catalogo.pares_votos())
+
+    if assincrono:
+        modelos.aquecimento.iniciar_em_segundo_plano(
+            app, db, modelos.embeddings, modelos.indices_map, modelos.armazem)
+    else:
+        modelos.aquecimento.executar(
+            db.session, modelos.embeddings, modelos.indices_map,
+            modelos.armazem)
+        modelos.aquecimento.relatar()
+
+
+def _dobrar_svd(fatores_svd, interacoes, forcar=False):
+    """
+    Fatores do SVD para quem não estava no treino, calculados pelas
+    notas atuais (uma vez por versão do modelo; forcar recalcula).
+    """
+    user_id = interacoes.user_id
+    if fatores_svd is None or user_id in fatores_svd.linha_usuario:
+        return
+    if forcar or user_id not in fatores_svd.dobrados:
+        fatores_svd.dobrar(user_id, interacoes.notas_svd)
+
+
+def _atualizar_dobra_svd(user_id):
+    """ Depois de uma nota ou favorito: refaz o fold-in já calculado. """
+    fatores_svd = registro.atual.fatores_svd
+    if fatores_svd is not None and user_id in fatores_svd.dobrados:
+        _dobrar_svd(fatores_svd,
+                    InteracoesUsuario.carregar(db.session, user_id),
+                    forcar=True)
+
+
+def _atualizar_perfil(user_id, tmdb_id, curtia, curte):
+    """
+    Perfil de conteúdo depois de uma escrita já gravada, na versão que
+    o registro indicar (ver RegistroModelos.registrar_escrita).
+    """
+    modelos = registro.registrar_escrita(user_id)
+    atualizar_vetor_usuario(
+        user_id, tmdb_id, curtia=curtia, curte=curte,
+        db_session=db.session, embeddings=modelos.embeddings,
+        indices_map=modelos.indices_map, armazem=modelos.armazem)
+
+
+def _propagar_escrita(user_id, tmdb_id, curtia, curte, avaliacao=False,
+                      nota=None):
+    """
+    Efeitos de uma escrita já gravada: cache, matriz de avaliações
+    (avaliacao=True, com a nota nova ou None), fold-in do SVD e perfil.
+    Uma etapa que falha só deixa a memória atrasada até a próxima
+    recarga; fica no log e a rota responde com sucesso mesmo assim.
+    """
+    etapas = [('cache', lambda: cache_recomendacoes.invalidar(user_id))]
+    if avaliacao:
+        etapas.append(('matriz', lambda: matriz_avaliacoes.registrar(
+            user_id, tmdb_id, nota)))
+    etapas += [('fold-in', lambda: _atualizar_dobra_svd(user_id)),
+               ('perfil', lambda: _atualizar_perfil(
+                   user_id, tmdb_id, curtia, curte))]
+    for nome, etapa in etapas:
+        try:
+            etapa()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(
+                f"Escrita do usuário {user_id} gravada; {nome} não "
+                f"atualizado: {e}")
+
+
+def _descartar_perfis(modelos, user_ids):
+    """ Perfis montados antes de escritas feitas durante a recarga. """
+    for user_id in user_ids:
+        modelos.armazem.remover(user_id)
+
+
+def _modelos_com_votos():
+    modelos = registro.atual
+    if modelos.fatores_svd and modelos.fatores_svd.qtd_votos is None:
+        catalogo.atualizar(db.session)
+        modelos.fatores_svd.carregar_votos(catalogo.pares_votos())
+    return modelos
+
+
+def _diversificar_colaborativo(itens):
+    """ Mesma diversificação por gênero da rota, feita no job. """
+    por_id = {item['tmdb_id']: item for item in itens}
+    filmes = div_genero(catalogo.serializar(list(por_id)),
+                        max_por_genero=3)[:10]
+    return [por_id[filme['tmdb_id']] for filme in filmes]
+
+
+# Carregando modelos e metadata
+# diretórios de artefato (mmap, ver artefatos.py) têm preferência ao .pkl
+# o cache só é limpo depois da troca: até lá a versão antiga atende
+registro = RegistroModelos(
+    BASE_DIR, preparar=preparar_modelos,
+    publicado=lambda modelos: cache_recomendacoes.limpar(),
+    descartar=_descartar_perfis)
+
+
+def _migrando():
+    """
+    `flask --app apy db ...` importa o apy só para aplicar as migrações:
+    esse processo não carrega modelos nem inicia tarefas em segundo plano.
+    """
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('-')]
+    return 'flask' in Path(sys.argv[0]).parts and 'db' in argumentos
+
+
+def iniciar_servidor():
+    """ Cargas iniciais e tarefas em segundo plano do servidor. """
+    with app.app_context():
+        try:
+            print(f"--- Catálogo: "
+                  f"{catalogo.carregar(db.session)} filmes ---")
+            indice_busca.sincronizar(catalogo)
+            indice_prefixos.sincronizar(catalogo)
+            print(f"--- Matriz de avaliações: "
+                  f"{matriz_avaliacoes.carregar(db.session)} notas ---")
+        except Exception as e:
+            db.session.rollback()
+            print(f"provavel tabela nao criada {e}")
+        modelos_iniciais = carregar_modelos(BASE_DIR)
+        # AQUECIMENTO_ASSINCRONO=1 monta os perfis em segundo plano
+        preparar_modelos(
+            modelos_iniciais,
+            assincrono=os.getenv("AQUECIMENTO_ASSINCRONO", "0") == "1")
+        registro.publicar(modelos_iniciais)
+
+    # BUSCA_SEMANTICA_AQUECER=1 carrega o modelo de consultas no início
+    if os.getenv("BUSCA_SEMANTICA_AQUECER", "0") == "1":
+        busca_semantica.aquecer_em_segundo_plano(
+            modelos_iniciais.nome_modelo)
+
+    # MODELOS_OBSERVAR_INTERVALO > 0: recarrega sozinho quando o disco muda
+    if int(os.getenv("MODELOS_OBSERVAR_INTERVALO", 0)) > 0:
+        registro.observar(int(os.getenv("MODELOS_OBSERVAR_INTERVALO")), app)
+
+    # PRECOMPUTAR_INTERVALO_HORAS > 0: job noturno dentro do próprio servidor
+    if int(os.getenv("PRECOMPUTAR_INTERVALO_HORAS", 0)) > 0:
+        job_precomputacao.iniciar_em_segundo_plano(
+            app, db, _modelos_com_votos, _diversificar_colaborativo,
+            intervalo_horas=int(os.getenv("PRECOMPUTAR_INTERVALO_HORAS")))
+
+
+if not _migrando():
+    iniciar_servidor()
+
+
+@app.before_request
+def atualizar_catalogo():
+    """
+    Filmes inseridos na tabela entram no catálogo em memória; votos
+    alterados chegam ao SVD na recarga completa
+    """
     try:
-        sql_users = text("""
-            SELECT DISTINCT id_usuario FROM avaliacoes
-            UNION
-            SELECT DISTINCT id_usuario FROM favoritos
-        """)
-        all_users_ids = [row[0] for row in db.session.execute(
-            sql_users).fetchall()]
-
-        count = 0
-        for uid in all_users_ids:
-            if calcular_vetor_usuario(
-             uid, db.session, embeddings, indices_map) is not None:
-                count += 1
-        print(f"--- Cache pronto: {count} usuários processados ---")
+        if catalogo.atualizar_se_preciso(db.session):
+            fatores_svd = registro.atual.fatores_svd
+            if fatores_svd and fatores_svd.qtd_votos is not None:
+                fatores_svd.carregar_votos(catalogo.pares_votos())
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning(f"Catálogo não atualizado: {e}")
 
+
+@app.before_request
+def atualizar_matriz():
+    """
+    Notas gravadas por outros processos do servidor entram na matriz
+    de avaliações na recarga completa
+    """
+    try:
+        matriz_avaliacoes.recarregar_se_preciso(db.session)
     except Exception as e:
-        print(f"provavel tabela nao criada {e}")
-        print("segunda execução não há erro")
-        pass
+        db.session.rollback()
+        app.logger.warning(f"Matriz de avaliações não recarregada: {e}")
 
 
 @app.route('/login', methods=['POST'])
@@ -218,14 +449,13 @@ def pesquisar_filme():
 
     id_usuario_atual = get_user_id()
 
-    termo_like = f"%{termo_pesquisa}%"
-    filmes_encontrados = Filmes.query.filter(
-        Filmes.titulo.ilike(termo_like)
-        ).order_by(
-            Filmes.qtd_votos.desc()
-        ).limit(20).all()
+    # índice de trigramas sobre o catálogo em memória (ver busca.py)
+    if not len(catalogo):
+        catalogo.atualizar(db.session)
+    indice_busca.sincronizar(catalogo)
+    ids_encontrados = indice_busca.buscar(termo_pesquisa, limite=20)
 
-    if not filmes_encontrados:
+    if not ids_encontrados:
         return jsonify([])
 
     ids_favoritos = set()
@@ -234,23 +464,69 @@ def pesquisar_filme():
             id_usuario=id_usuario_atual).all()
         ids_favoritos = {fav.id_filme for fav in favoritos}
 
-    filmes_json = [
-        {
-            'tmdb_id': filme.tmdb_id,
-            'titulo': filme.titulo,
-            'sinopse': filme.sinopse,
-            'generos': filme.generos,
-            'popularidade': filme.popularidade,
-            'media_votos': filme.media_votos,
-            'qtd_votos': filme.qtd_votos,
-            'poster_path': filme.poster_path,
-            'favoritos': filme.tmdb_id in ids_favoritos
-        } for filme in filmes_encontrados
-    ]
+    filmes_json = catalogo.serializar(
+        ids_encontrados,
+        campos=('tmdb_id', 'titulo', 'sinopse', 'generos', 'popularidade',
+                'media_votos', 'qtd_votos', 'poster_path'))
+    for filme in filmes_json:
+        filme['favoritos'] = filme['tmdb_id'] in ids_favoritos
 
     return jsonify(filmes_json)
 
 
+@app.route('/filmes/autocomplete', methods=['GET'])
+def autocompletar_filme():
+    """
+    Sugestões enquanto o usuário digita: só id, título e pôster,
+    a partir do índice de prefixos em memória
+    """
+    prefixo = request.args.get('q', '')
+    limite = min(request.args.get('limite', 8, type=int), 20)
+
+    if not len(catalogo):
+        catalogo.atualizar(db.session)
+    indice_prefixos.sincronizar(catalogo)
+    ids_sugeridos = indice_prefixos.sugerir(prefixo, limite=max(limite, 1))
+
+    return jsonify(catalogo.serializar(
+        ids_sugeridos, campos=('tmdb_id', 'titulo', 'poster_path')))
+
+
+@app.route('/filmes/busca-semantica', methods=['GET'])
+@jwt_required(optional=True)
+def buscar_semantica():
+    """
+    Busca por descrição em texto livre (ex.: "assalto no espaço") nos
+    embeddings das sinopses, com o mesmo índice das recomendações
+    """
+    consulta = request.args.get('q', '').strip()
+    limite = min(request.args.get('limite', 20, type=int), 50)
+
+    if not consulta:
+        return jsonify({
+            "success": False,
+            "message": "Termo de pesquisa não fornecido"}), 400
+
+    modelos = registro.atual
+    try:
+        linhas, scores = busca_semantica.buscar(
+            modelos, consulta, k=max(limite, 1))
+    except BuscaIndisponivel as e:
+        return jsonify({"success": False,
+                        "message": f"Busca semântica indisponível: {e}"}), 503
+
+    score_por_id = {int(modelos.tmdb_ids[linha]): float(score)
+                    for linha, score in zip(linhas, scores)}
+    resultados = catalogo.serializar(
+        list(score_por_id),
+        campos=('tmdb_id', 'titulo', 'sinopse', 'generos', 'media_votos',
+                'qtd_votos', 'poster_path'))
+    for filme in resultados:
+        filme['score'] = round(score_por_id[filme['tmdb_id']], 3)
+
+    return jsonify(resultados)
+
+
 # Rota para ADICIONAR um filme aos favoritos
 @app.route('/favoritos', methods=['POST'])
 @jwt_required()
@@ -263,25 +539,32 @@ def adicionar_favorito():
         return jsonify({"success": False,
                         "message": "tmdb_id do filme é obrigatório"}), 400
 
-    filme = Filmes.query.filter_by(tmdb_id=tmdb_id).first()
-
-    if not filme:
+    if not catalogo.existe(tmdb_id, db.session):
         return jsonify({"success": False, "message":
                         "Filme não encontrado no banco de dados"}), 404
 
     favorito_existente = Favoritos.query.filter_by(
         id_usuario=id_usuario_atual,
-        id_filme=filme.tmdb_id
+        id_filme=tmdb_id
     ).first()
 
     if favorito_existente:
         return jsonify({"success": False,
                         "message": "Filme já está nos favoritos"}), 409
 
+    avaliacao = Avaliacao.query.filter_by(
+        id_usuario=id_usuario_atual,
+        id_filme=tmdb_id
+    ).first()
+    nota = avaliacao.nota if avaliacao else None
+
     novo_favorito = Favoritos(
-        id_usuario=id_usuario_atual, id_filme=filme.tmdb_id)
+        id_usuario=id_usuario_atual, id_filme=tmdb_id)
     db.session.add(novo_favorito)
     db.session.commit()
+    _propagar_escrita(
+        id_usuario_atual, tmdb_id,
+        curtia=curte_filme(nota, False), curte=True)
 
     return jsonify({"success": True, "message":
                     "Filme adicionado aos favoritos!"}), 200
@@ -317,14 +600,13 @@ def listar_favoritos():
 def remover_favorito(tmdb_id):
     id_usuario_atual = get_user_id()
 
-    filme = Filmes.query.filter_by(tmdb_id=tmdb_id).first()
-    if not filme:
+    if not catalogo.existe(tmdb_id, db.session):
         return jsonify({"success": False,
                         "message": "Filme não encontrado"}), 404
 
     favorito = Favoritos.query.filter_by(
         id_usuario=id_usuario_atual,
-        id_filme=filme.tmdb_id
+        id_filme=tmdb_id
     ).first()
 
     if not favorito:
@@ -332,8 +614,17 @@ def remover_favorito(tmdb_id):
             {"success": False,
              "message": "Este filme não está na sua lista de favoritos"}), 404
 
+    avaliacao = Avaliacao.query.filter_by(
+        id_usuario=id_usuario_atual,
+        id_filme=tmdb_id
+    ).first()
+    nota = avaliacao.nota if avaliacao else None
+
     db.session.delete(favorito)
     db.session.commit()
+    _propagar_escrita(
+        id_usuario_atual, tmdb_id,
+        curtia=True, curte=curte_filme(nota, False))
 
     return jsonify({"success": True,
                     "message": "Filme removido dos favoritos com sucesso"})
@@ -347,6 +638,7 @@ def recomendar_multiplos():
     Utiliza apenas NLP (modelo_recomendacao.pkl)
     """
     id_usuario_atual = get_user_id()
+    modelos = registro.atual
     try:
         data = request.get_json()
         lista_tmdb_ids = data.get('lista_tmdb_ids')
@@ -357,14 +649,14 @@ def recomendar_multiplos():
                 {"success": False,
                  "message": "Nenhum filme fornecido"}), 400
 
-        if embeddings is None or indices_map is None:
+        if modelos is None:
             return jsonify({
                 "success": False,
                 "message": "Modelos de recomendação não carregados."}), 500
 
         indice_filmes = [
-            indices_map[tmdb_id] for tmdb_id in lista_tmdb_ids
-            if tmdb_id in indices_map
+            modelos.indices_map[tmdb_id] for tmdb_id in lista_tmdb_ids
+            if tmdb_id in modelos.indices_map
         ]
 
         if not indice_filmes:
@@ -372,75 +664,35 @@ def recomendar_multiplos():
                 "success": False,
                 "message": "Nenhum dos filmes foi encontrado no modelo"}), 404
 
-        score_similaridade = defaultdict(float)
-
-        for idx in indice_filmes:
-            vetor_filme = embeddings[idx].reshape(1, -1)
-            simi_cossenos = cosine_similarity(
-                vetor_filme, embeddings).flatten()
-            for sim_idx, score in enumerate(simi_cossenos):
-                if sim_idx not in indice_filmes:
-                    score_similaridade[sim_idx] += score
-
-        alpha = 0.8  # similaridade
-        beta = 0.2  # popularidade
-
-        for sim_idx in list(score_similaridade.keys()):
-            tmdb_id = tmdb_ids[sim_idx]
-            meta = meta_por_id.get(tmdb_id, {"media_votos": 5})
-            popularidade = meta["media_votos"] / 10
-            score_similaridade[sim_idx] = (
-                alpha * score_similaridade[sim_idx] + beta * popularidade
-            )
-
-        indices_ordenados = sorted(
-            score_similaridade.items(),
-            key=lambda item: item[1],
-            reverse=True
-        )
-
-        idx_mais_relevantes = [idx for idx, score in indices_ordenados[:30]]
+        if modelos.vizinhos_indices is not None:
+            # listas de vizinhos do treinamento, sem varrer o catálogo
+            idx_mais_relevantes = pontuar_multiplos_vizinhos(
+                indice_filmes, modelos.vizinhos_indices,
+                modelos.vizinhos_scores, modelos.popularidade, k=30)
+        else:
+            idx_mais_relevantes = pontuar_multiplos(
+                indice_filmes, modelos.embeddings, modelos.popularidade,
+                k=30, indice=modelos.indice)
 
-        if not idx_mais_relevantes:
+        if len(idx_mais_relevantes) == 0:
             return jsonify(
              {"success": False,
               "message": "Não foi possível gerar recomendações"}), 404
 
-        tmdb_ids_np = [tmdb_ids[idx] for idx in idx_mais_relevantes]
+        tmdb_ids_np = [modelos.tmdb_ids[idx] for idx in idx_mais_relevantes]
         tmdb_ids_recomendados = [int(id) for id in tmdb_ids_np]
 
-        filmes_recomendados = Filmes.query.filter(
-            Filmes.tmdb_id.in_(tmdb_ids_recomendados)).all()
-
-        mapa_filmes = {filme.tmdb_id: filme for filme in filmes_recomendados}
-        filmes_ordenados = [
-            mapa_filmes[tmdb_id] for tmdb_id in tmdb_ids_recomendados
-            if tmdb_id in mapa_filmes
-        ]
-
         if not incluir_avaliados:
-            av_usuario = db.session.query(Avaliacao.id_filme).filter_by(
-                id_usuario=id_usuario_atual).all()
-
-            ids_avaliados = {av.id_filme for av in av_usuario}
+            ids_avaliados = InteracoesUsuario.carregar(
+                db.session, id_usuario_atual).ids_avaliados
 
-            filmes_ordenados = [
-                f for f in filmes_ordenados
-                if f.tmdb_id not in ids_avaliados
+            tmdb_ids_recomendados = [
+                tmdb_id for tmdb_id in tmdb_ids_recomendados
+                if tmdb_id not in ids_avaliados
             ]
 
-        filmes_finais = filmes_ordenados[:10]
-        resultados_json = [
-            {
-                'tmdb_id': filme.tmdb_id,
-                'titulo': filme.titulo,
-                'sinopse': filme.sinopse,
-                'generos': filme.generos,
-                'media_votos': filme.media_votos,
-                'qtd_votos': filme.qtd_votos,
-                'poster_path': filme.poster_path
-            } for filme in filmes_finais
-        ]
+        # filmes fora do catálogo são ignorados antes do corte em 10
+        resultados_json = catalogo.serializar(tmdb_ids_recomendados)[:10]
         return jsonify(resultados_json)
 
     except Exception as e:
@@ -466,9 +718,14 @@ def avaliar_filme():
             "message": "tmdb_id e nota são obrigatórios"
         }), 400
 
-    filme = Filmes.query.filter_by(tmdb_id=tmdb_id).first()
+    if isinstance(nota, bool) or not isinstance(nota, int) \
+            or not 1 <= nota <= 5:
+        return jsonify({
+            "success": False,
+            "message": "nota deve ser um inteiro de 1 a 5"
+        }), 400
 
-    if not filme:
+    if not catalogo.existe(tmdb_id, db.session):
         return jsonify({
             "success": False,
             "message": "Filme não encontrado no banco de dados"
@@ -476,8 +733,13 @@ def avaliar_filme():
 
     avaliacao = Avaliacao.query.filter_by(
         id_usuario=id_usuario_atual,
-        id_filme=filme.tmdb_id
+        id_filme=tmdb_id
     ).first()
+    nota_anterior = avaliacao.nota if avaliacao else None
+    favoritado = Favoritos.query.filter_by(
+        id_usuario=id_usuario_atual,
+        id_filme=tmdb_id
+    ).first() is not None
 
     try:
         if avaliacao:
@@ -487,7 +749,7 @@ def avaliar_filme():
         else:
             nova_avaliacao = Avaliacao(
                 id_usuario=id_usuario_atual,
-                id_filme=filme.tmdb_id,
+                id_filme=tmdb_id,
                 nota=nota,
                 data_avaliacao=datetime.utcnow()
             )
@@ -495,8 +757,6 @@ def avaliar_filme():
             msg = "Avaliação salva com sucesso!"
 
         db.session.commit()
-        return jsonify({"success": True, "message": msg}), 200
-
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Erro ao salvar avaliação: {e}")
@@ -505,6 +765,12 @@ def avaliar_filme():
             "message": "Erro interno ao salvar avaliação."
         }), 500
 
+    _propagar_escrita(
+        id_usuario_atual, tmdb_id,
+        curtia=curte_filme(nota_anterior, favoritado),
+        curte=curte_filme(nota, favoritado), avaliacao=True, nota=nota)
+    return jsonify({"success": True, "message": msg}), 200
+
 
 # Listar favoritos
 @app.route('/usuario/minhas-avaliacoes', methods=['GET'])
@@ -550,126 +816,86 @@ def recomendar_colaborativo():
     retorno de fallback caso não hajam interações
     utilização do modelo_colaborativo.pkl
     """
-    def score_descoberta(item):
-        nota = item['nota_svd']
-        pop = item['popularidade'] if item['popularidade'] > 1 else 1
-        penalidade = 0.2 * math.log10(pop)
-
-        return nota - penalidade
     try:
         id_usuario_atual = get_user_id()
 
-        qtd_avaliacoes = Avaliacao.query.filter_by(
-            id_usuario=id_usuario_atual).count()
-        qtd_favoritos = Favoritos.query.filter_by(
-            id_usuario=id_usuario_atual).count()
-        total_interacoes = qtd_avaliacoes + qtd_favoritos
+        em_cache, versao_cache = cache_recomendacoes.obter(
+            'colaborativo', id_usuario_atual)
+        if em_cache is not None:
+            return jsonify(em_cache)
+
+        modelos = registro.atual
+        fatores_svd = modelos.fatores_svd
+
+        # notas e favoritos em uma consulta, usados por todas as etapas
+        interacoes = InteracoesUsuario.carregar(db.session, id_usuario_atual)
+        total_interacoes = interacoes.total
+
+        # perfil com histórico: linha do job noturno, se ainda válida
+        if total_interacoes >= 12:
+            itens = buscar_precomputada(
+                db.session, id_usuario_atual, 'colaborativo', interacoes,
+                modelos.versao, VALIDADE_PRECOMPUTADAS)
+            if itens:
+                resultados = catalogo.serializar(
+                    [item['tmdb_id'] for item in itens])
+                for filme in resultados:
+                    filme['origem'] = "Recomendação Pessoal (IA)"
+                cache_recomendacoes.guardar(
+                    'colaborativo', id_usuario_atual, resultados,
+                    versao_cache)
+                return jsonify(resultados)
 
         ids_recomendados = []
         origem_recomendacao = ""
 
-        if total_interacoes > 0:
-            calcular_vetor_usuario(id_usuario_atual,
-                                   db.session, embeddings, indices_map)
-
         # cold start
         if total_interacoes < 12 and total_interacoes > 0:
             vizinhos = encontrar_vizinhos_cache(
                 id_usuario_atual,
                 db.session,
-                embeddings,
-                indices_map,
-                k=30)
+                modelos.embeddings,
+                modelos.indices_map,
+                modelos.armazem,
+                k=30,
+                interacoes=interacoes)
             if vizinhos:
-                vizinhos_tuple = tuple(vizinhos)
-                if len(vizinhos_tuple) == 1:
-                    vizinhos_tuple = (vizinhos_tuple[0],)
-
-                query = text("""
-                    SELECT id_filme, COUNT(id_usuario) as freq
-                    FROM avaliacoes
-                    WHERE id_usuario IN :vizinhos
-                    AND nota >= 4
-                    AND id_filme NOT IN (
-                        SELECT id_filme FROM avaliacoes WHERE id_usuario = :meuid
-                    )
-                    GROUP BY id_filme
-                    ORDER BY freq DESC, AVG(nota) DESC
-                    LIMIT 10
-                """)
-
-                res = db.session.execute(
-                    query, {'vizinhos': vizinhos_tuple,
-                            'meuid': id_usuario_atual}).fetchall()
-                ids_recomendados = [row[0] for row in res]
+                # curtidos (nota >= 4) pelos vizinhos, por frequência e
+                # média, fora os que o usuário já avaliou
+                ids_recomendados = matriz_avaliacoes.mais_curtidos(
+                    vizinhos, k=10, excluir=interacoes.ids_avaliados)
                 origem_recomendacao = "Comunidade Similar (Cluster)"
 
         # svd - matriz
         elif total_interacoes >= 12:
-            if algo_svd:
-                avaliacoes = Avaliacao.query.filter_by(
-                    id_usuario=id_usuario_atual).all()
-                favoritos = Favoritos.query.filter_by(
-                    id_usuario=id_usuario_atual).all()
-
-                ids_vistos = {a.id_filme for a in avaliacoes}
-                ids_vistos.update({f.id_filme for f in favoritos})
-
-                candidatos = Filmes.query.filter(
-                    Filmes.qtd_votos > 20,
-                    ~Filmes.tmdb_id.in_(ids_vistos)
-                ).limit(1500).all()
-
-                previsoes = []
-                for filme in candidatos:
-                    try:
-                        pred = algo_svd.predict(
-                            uid=id_usuario_atual, iid=filme.tmdb_id)
-
-                        if not pred.details.get('was_impossible', False):
-                            previsoes.append({
-                                'id': filme.tmdb_id,
-                                'nota_svd': pred.est,
-                                'popularidade': filme.qtd_votos})
-                    except Exception:
-                        continue
-
-                previsoes.sort(key=score_descoberta, reverse=True)
-                ids_recomendados = [x['id'] for x in previsoes[:20]]
+            if fatores_svd:
+                ids_vistos = interacoes.ids_vistos
+                _dobrar_svd(fatores_svd, interacoes)
+
+                if fatores_svd.qtd_votos is None:
+                    catalogo.atualizar(db.session)
+                    fatores_svd.carregar_votos(catalogo.pares_votos())
+
+                # catálogo inteiro do modelo, sem o antigo LIMIT 1500
+                ids_recomendados = fatores_svd.ranquear(
+                    id_usuario_atual, k=20, ids_excluir=ids_vistos,
+                    min_votos=20)
                 origem_recomendacao = "Recomendação Pessoal (IA)"
 
         # fallback
         if not ids_recomendados:
-            filmes_top = Filmes.query.filter(Filmes.qtd_votos > 100)\
-                .order_by(Filmes.media_votos.desc()).limit(10).all()
-            ids_recomendados = [f.tmdb_id for f in filmes_top]
+            ids_recomendados = catalogo.populares(10, min_votos=100)
             origem_recomendacao = "Populares (Geral)"
 
-        filmes_db = Filmes.query.filter(
-            Filmes.tmdb_id.in_(ids_recomendados)).all()
-        mapa_filmes = {f.tmdb_id: f for f in filmes_db}
-
-        # reordernar após o sql in
-        filmes_ordenados = []
-        for tmdb_id in ids_recomendados:
-            if tmdb_id in mapa_filmes:
-                filmes_ordenados.append(mapa_filmes[tmdb_id])
+        filmes_ordenados = catalogo.serializar(ids_recomendados)
 
         # Diversificação simples (não mostrar 10 filmes iguais)
-        filmes_finais = div_genero(filmes_ordenados, max_por_genero=3)
-        filmes_finais = filmes_finais[:10]
-
-        resultados = [{
-            'tmdb_id': f.tmdb_id,
-            'titulo': f.titulo,
-            'poster_path': f.poster_path,
-            'sinopse': f.sinopse,
-            'generos': f.generos,
-            'media_votos': f.media_votos,
-            'qtd_votos': f.qtd_votos,
-            'origem': origem_recomendacao
-        } for f in filmes_finais]
+        resultados = div_genero(filmes_ordenados, max_por_genero=3)[:10]
+        for filme in resultados:
+            filme['origem'] = origem_recomendacao
 
+        cache_recomendacoes.guardar(
+            'colaborativo', id_usuario_atual, resultados, versao_cache)
         return jsonify(resultados)
 
     except Exception as e:
@@ -687,13 +913,33 @@ def recomendar_hibrido():
     """
     try:
         id_usuario_atual = get_user_id()
-        avaliacoes = Avaliacao.query.filter_by(
-            id_usuario=id_usuario_atual).all()
-        favoritos = Favoritos.query.filter_by(
-            id_usuario=id_usuario_atual).all()
 
-        ids_vistos = {a.id_filme for a in avaliacoes}
-        ids_vistos.update({f.id_filme for f in favoritos})
+        em_cache, versao_cache = cache_recomendacoes.obter(
+            'hibrido', id_usuario_atual)
+        if em_cache is not None:
+            return jsonify(em_cache)
+
+        modelos = registro.atual
+        fatores_svd = modelos.fatores_svd
+        tmdb_ids = modelos.tmdb_ids
+
+        interacoes = InteracoesUsuario.carregar(db.session, id_usuario_atual)
+
+        itens = buscar_precomputada(
+            db.session, id_usuario_atual, 'hibrido', interacoes,
+            modelos.versao, VALIDADE_PRECOMPUTADAS)
+        if itens:
+            extras = {item['tmdb_id']: item for item in itens}
+            resultados = catalogo.serializar(list(extras))
+            for filme in resultados:
+                item = extras[filme['tmdb_id']]
+                filme['score_final'] = round(float(item['score']), 2)
+                filme['motivo'] = str(item['motivo'])
+            cache_recomendacoes.guardar(
+                'hibrido', id_usuario_atual, resultados, versao_cache)
+            return jsonify(resultados)
+
+        ids_vistos = interacoes.ids_vistos
         total_interacoes = len(ids_vistos)
 
         if total_interacoes < 10:
@@ -703,76 +949,55 @@ def recomendar_hibrido():
             peso_nlp = 0.3
             peso_svd = 0.7
 
-        user_vector = calcular_vetor_usuario(
-            id_usuario_atual, db.session, embeddings, indices_map)
+        user_vector = obter_vetor_usuario(
+            id_usuario_atual, db.session, modelos.embeddings,
+            modelos.indices_map, modelos.armazem, interacoes)
 
         if user_vector is None:
             return jsonify({"success": False,
                             "message": "Sem histórico suficiente."}), 404
 
-        # array para todos os filmes
-        scores_nlp_todos = cosine_similarity(user_vector, embeddings)[0]
+        # vetor médio normalizado: produto escalar = similaridade de cossenos
+        vetor_norm = user_vector[0] / np.linalg.norm(user_vector[0])
 
-        candidatos_finais = []
+        # usuário novo no SVD: fold-in antes dos candidatos e das notas
+        _dobrar_svd(fatores_svd, interacoes)
 
-        top_indices_nlp = scores_nlp_todos.argsort()[-1000:][::-1]
+        # candidatos: conteúdo + SVD + comunidade, sem repetição
+        candidatos = gerador_candidatos.gerar(
+            modelos, id_usuario_atual, vetor_norm,
+            comunidade=lambda k: _comunidade(modelos, id_usuario_atual, k))
+        scores_nlp = modelos.embeddings[candidatos] @ vetor_norm
+
+        linhas_vistas = [modelos.indices_map[t] for t in ids_vistos
+                         if t in modelos.indices_map]
+        vistos = np.isin(candidatos, linhas_vistas)
+
+        # nota svd prevista em lote para os candidatos
+        estimativas = None
+        if fatores_svd:
+            estimativas, _ = fatores_svd.prever_linhas(
+                id_usuario_atual, modelos.linhas_svd[candidatos])
 
         # pontuacao hibrida
-        for idx in top_indices_nlp:
-            tmdb_id = tmdb_ids[idx]  # ids mapp na mesma ordem dos embeddings
-
-            if tmdb_id in ids_vistos:
-                continue
-
-            score_nlp = scores_nlp_todos[idx]
-
-            # nota svd normalizada
-            score_svd = 0
-            if algo_svd:
-                try:
-                    pred = algo_svd.predict(id_usuario_atual, tmdb_id)
-                    raw_score = (pred.est - 1) / 4
-                    score_svd = max(0.0, min(1.0, raw_score))
-                except Exception:
-                    score_svd = 0.5
-
-            score_final = (score_nlp * peso_nlp) + (score_svd * peso_svd)
-            candidatos_finais.append(
-                (tmdb_id, score_final, score_nlp, score_svd))
-
-        candidatos_finais.sort(key=lambda x: x[1], reverse=True)
-        top_15 = candidatos_finais[:15]
-
-        ids_recomendados = [x[0] for x in top_15]
-
-        filmes_db = Filmes.query.filter(
-            Filmes.tmdb_id.in_(ids_recomendados)).all()
-        mapa_filmes = {f.tmdb_id: f for f in filmes_db}
-
-        resultados = []
-        for cand in top_15:
-            tid, s_final, s_nlp, s_svd = cand
-            if tid in mapa_filmes:
-                f = mapa_filmes[tid]
-
-                motivo = "Recomendação Equilibrada"
-                if s_nlp > 0.8:
-                    motivo = "Semelhante ao que você curte"
-                if s_svd > 0.8:
-                    motivo = "Alta probabilidade de gostar"
-
-                resultados.append({
-                    'tmdb_id': f.tmdb_id,
-                    'titulo': f.titulo,
-                    'poster_path': f.poster_path,
-                    'sinopse': f.sinopse,
-                    'generos': f.generos,
-                    'media_votos': f.media_votos,
-                    'qtd_votos': f.qtd_votos,
-                    'score_final': round(s_final, 2),  # Debug
-                    'motivo': motivo
-                })
+        top_idx, top_final, _, _, top_motivos = pontuar_hibrido(
+            candidatos, scores_nlp, estimativas, vistos,
+            peso_nlp, peso_svd, k=15)
+
+        # ids mapp na mesma ordem dos embeddings
+        ids_recomendados = [int(tmdb_ids[idx]) for idx in top_idx]
+
+        extras = {tid: (s_final, motivo) for tid, s_final, motivo in zip(
+            ids_recomendados, top_final, top_motivos)}
+
+        resultados = catalogo.serializar(ids_recomendados)
+        for filme in resultados:
+            s_final, motivo = extras[filme['tmdb_id']]
+            filme['score_final'] = round(float(s_final), 2)  # Debug
+            filme['motivo'] = str(motivo)
 
+        cache_recomendacoes.guardar(
+            'hibrido', id_usuario_atual, resultados, versao_cache)
         return jsonify(resultados)
 
     except Exception as e:
@@ -780,6 +1005,211 @@ def recomendar_hibrido():
         return jsonify({"success": False, "message": "Erro interno"}), 500
 
 
+@app.route('/recomendar/cache', methods=['GET'])
+@jwt_required()
+def estatisticas_cache():
+    """
+    Contadores do cache de recomendações (hits, misses, remoções)
+    """
+    return jsonify(cache_recomendacoes.estatisticas())
+
+
+@app.route('/recomendar/matriz', methods=['GET'])
+@jwt_required()
+def estatisticas_matriz():
+    """
+    Tamanho da matriz de avaliações em memória e idade da última recarga
+    """
+    return jsonify(matriz_avaliacoes.estatisticas())
+
+
+@app.route('/filmes/autocomplete/cache', methods=['GET'])
+@jwt_required()
+def estatisticas_autocomplete():
+    """
+    Contadores do cache de prefixos do autocomplete
+    """
+    return jsonify(indice_prefixos.estatisticas())
+
+
+@app.route('/recomendar/candidatos', methods=['GET'])
+@jwt_required()
+def estatisticas_candidatos():
+    """
+    Tempo acumulado e tamanho médio de cada fonte de candidatos do híbrido
+    """
+    return jsonify(gerador_candidatos.estatisticas())
+
+
+@app.route('/recomendar/aquecimento', methods=['GET'])
+@jwt_required()
+def status_aquecimento():
+    """
+    Progresso e tempo do aquecimento dos perfis de usuário
+    """
+    return jsonify(registro.atual.aquecimento.status())
+
+
+@app.route('/admin/modelos', methods=['GET'])
+def status_modelos():
+    """
+    Versão ativa dos modelos e versão encontrada em disco
+    """
+    if not admin_autorizado():
+        return jsonify({"success": False, "message": "Não autorizado"}), 403
+    return jsonify(dict(registro.status(),
+                        busca_semantica=busca_semantica.status()))
+
+
+@app.route('/admin/modelos/recarregar', methods=['POST'])
+def recarregar_modelos():
+    """
+    Carrega, valida e troca os modelos em segundo plano; as requisições
+    em andamento terminam na versão antiga
+    """
+    if not admin_autorizado():
+        return jsonify({"success": False, "message": "Não autorizado"}), 403
+    if registro.recarregando:
+        return jsonify({"success": False,
+                        "message": "Recarga já em andamento"}), 409
+    registro.recarregar_em_segundo_plano(app)
+    return jsonify({"success": True,
+                    "message": "Recarga dos modelos iniciada"}), 202
+
+
+def _recomendador_lote():
+    # LOTE_MEMORIA_MB: memória por bloco de usuários nos produtos matriciais
+    modelos = _modelos_com_votos()
+    return RecomendadorLote(
+        modelos, memoria_mb=int(os.getenv("LOTE_MEMORIA_MB", 256)),
+        gerador=gerador_candidatos.copia(),
+        comunidade=lambda user_id, k: _comunidade(modelos, user_id, k))
+
+
+@app.route('/admin/recomendacoes/lote', methods=['POST'])
+def recomendar_lote():
+    """
+    Recomendações de vários usuários de uma vez (ex.: newsletter).
+    Corpo: {"usuarios": [ids], "tipo": "hibrido", "n": 10}
+    """
+    if not admin_autorizado():
+        return jsonify({"success": False, "message": "Não autorizado"}), 403
+
+    data = request.get_json() or {}
+    usuarios = data.get('usuarios') or []
+    tipo = data.get('tipo', 'hibrido')
+    n = min(int(data.get('n', 10)), 100)
+    limite = int(os.getenv("LOTE_MAX_USUARIOS", 5000))
+
+    if tipo not in TIPOS:
+        return jsonify({"success": False,
+                        "message": f"tipo deve ser um de {TIPOS}"}), 400
+    try:
+        usuarios = list(dict.fromkeys(int(u) for u in usuarios))
+    except (TypeError, ValueError):
+        usuarios = []
+    if not usuarios or len(usuarios) > limite:
+        return jsonify({
+            "success": False,
+            "message": f"Informe de 1 a {limite} ids de usuário"}), 400
+
+    try:
+        interacoes = carregar_interacoes_lote(db.session, usuarios)
+        resultados = _recomendador_lote().recomendar(interacoes, tipo, n)
+        return jsonify({
+            "success": True,
+            "tipo": tipo,
+            "recomendacoes": {
+                str(user_id): [{'tmdb_id': tid, 'score': score,
+                                'motivo': motivo}
+                               for tid, score, motivo in recomendacoes]
+                for user_id, recomendacoes in resultados}
+        })
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+
+
+@app.cli.command('recomendar-lote')
+@click.option('--usuarios', default='',
+              help='Ids separados por vírgula (padrão: todos)')
+@click.option('--tipo', type=click.Choice(TIPOS), default='hibrido')
+@click.option('--n', default=10, show_default=True)
+@click.option('--saida', default='recomendacoes_lote.csv', show_default=True)
+def recomendar_lote_cli(usuarios, tipo, n, saida):
+    """ Gera recomendações em lote e grava em CSV. """
+    if usuarios:
+        ids = list(dict.fromkeys(
+            int(u) for u in usuarios.split(',') if u.strip()))
+    else:
+        ids = [u.id for u in db.session.query(Usuario.id).all()]
+
+    inicio = time.monotonic()
+    interacoes = carregar_interacoes_lote(db.session, ids)
+    resultados = _recomendador_lote().recomendar(interacoes, tipo, n)
+    total = salvar_csv(saida, linhas_resultado(resultados, tipo))
+    print(f"--- {total} recomendações de {len(ids)} usuários em "
+          f"{time.monotonic() - inicio:.2f}s -> {saida} ---")
+
+
+@app.route('/admin/recomendacoes/precomputar', methods=['GET'])
+def status_precomputacao():
+    """
+    Estado da última geração da tabela de recomendações pré-calculadas
+    """
+    if not admin_autorizado():
+        return jsonify({"success": False, "message": "Não autorizado"}), 403
+    return jsonify(job_precomputacao.status())
+
+
+@app.route('/admin/recomendacoes/precomputar', methods=['POST'])
+def precomputar_recomendacoes():
+    """
+    Gera em segundo plano as recomendações pré-calculadas de todos os
+    usuários (híbrido e colaborativo)
+    """
+    if not admin_autorizado():
+        return jsonify({"success": False, "message": "Não autorizado"}), 403
+    if job_precomputacao.estado == 'executando':
+        return jsonify({"success": False,
+                        "message": "Pré-cálculo já em andamento"}), 409
+    job_precomputacao.iniciar_em_segundo_plano(
+        app, db, _modelos_com_votos, _diversificar_colaborativo)
+    return jsonify({"success": True,
+                    "message": "Pré-cálculo iniciado"}), 202
+
+
+@app.cli.command('precomputar-recomendacoes')
+def precomputar_recomendacoes_cli():
+    """ Regrava a tabela de recomendações pré-calculadas (cron noturno). """
+    ok = job_precomputacao.executar(
+        db.session, _modelos_com_votos(), _diversificar_colaborativo,
+        base_dir=BASE_DIR)
+    status = job_precomputacao.status()
+    if not ok:
+        raise click.ClickException(status['erro'] or "Pré-cálculo falhou")
+    print(f"--- {status['linhas']} linhas de {status['usuarios']} usuários "
+          f"em {status['segundos']}s ---")
+
+
+@app.cli.command('snapshot-avaliacoes')
+@click.option('--completo', is_flag=True,
+              help='Relê o MovieLens e todas as notas locais')
+@click.option('--saida', default=None,
+              help='Diretório do snapshot (padrão: SNAPSHOT_AVALIACOES_DIR)')
+@click.option('--ratings', default=os.path.join(
+    BASE_DIR, '..', 'ml_scripts', 'ratings.csv'), show_default=True)
+@click.option('--links', default=os.path.join(
+    BASE_DIR, '..', 'ml_scripts', 'links.csv'), show_default=True)
+def snapshot_avaliacoes_cli(completo, saida, ratings, links):
+    """ Cria ou atualiza o snapshot de notas usado no treino. """
+    saida = saida or os.getenv("SNAPSHOT_AVALIACOES_DIR") \
+        or os.path.join(BASE_DIR, DIR_SNAPSHOT)
+    inicio = time.monotonic()
+    snapshot = atualizar_snapshot(db.session, saida, ratings, links, completo)
+    print(f"--- Snapshot em {saida} ({time.monotonic() - inicio:.2f}s): "
+          f"{snapshot.resumo()} ---")
+
+
 # Rota para remover avaliação
 @app.route('/avaliar/<int:tmdb_id>', methods=['DELETE'])
 @jwt_required()
@@ -795,16 +1225,27 @@ def remover_avaliacao(tmdb_id):
         return jsonify({"message":
                         "Avaliação não encontrada."}), 404
 
+    nota_anterior = avaliacao.nota
+    favoritado = Favoritos.query.filter_by(
+        id_usuario=id_usuario_atual,
+        id_filme=tmdb_id
+    ).first() is not None
+
     try:
         db.session.delete(avaliacao)
         db.session.commit()
-        return jsonify({"success": True,
-                        "message": "Avaliação removida."}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False,
                         "message": str(e)}), 500
 
+    _propagar_escrita(
+        id_usuario_atual, tmdb_id,
+        curtia=curte_filme(nota_anterior, favoritado),
+        curte=favoritado, avaliacao=True)
+    return jsonify({"success": True,
+                    "message": "Avaliação removida."}), 200
+
 
 # Inicialização do bloco de código main()
 if __name__ == '__main__':
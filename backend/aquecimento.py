@@ -0,0 +1,101 @@
+import threading
+import time
+import numpy as np
+from sqlalchemy import text
+
+
+class Aquecimento:
+    """
+    Monta os perfis de todos os usuários com uma única consulta em lote
+    (UNION de curtidas e favoritos) e somas por segmento no NumPy,
+    em vez de uma consulta por usuário. Pode rodar em uma thread enquanto
+    a API já atende; o progresso fica disponível em status().
+    """
+
+    def __init__(self, tam_bloco=50000):
+        self.tam_bloco = tam_bloco
+        self.estado = 'pendente'
+        self.total = 0
+        self.processados = 0
+        self.usuarios = 0
+        self.inicio = None
+        self.segundos = None
+        self.erro = None
+
+    def executar(self, db_session, embeddings, indices_map, armazem):
+        self.estado = 'executando'
+        self.inicio = time.monotonic()
+        try:
+            sql = text("""
+                SELECT id_usuario, id_filme FROM avaliacoes WHERE nota >= 4
+                UNION
+                SELECT id_usuario, id_filme FROM favoritos
+            """)
+            pares = db_session.execute(sql).fetchall()
+
+            usuarios = np.fromiter((p[0] for p in pares), dtype=np.int64,
+                                   count=len(pares))
+            linhas = np.fromiter((indices_map.get(p[1], -1) for p in pares),
+                                 dtype=np.int64, count=len(pares))
+            validos = linhas >= 0
+            usuarios, linhas = usuarios[validos], linhas[validos]
+
+            ids_unicos, posicao = np.unique(usuarios, return_inverse=True)
+            somas = np.zeros((len(ids_unicos), embeddings.shape[1]),
+                             dtype=np.float32)
+            contagens = np.bincount(posicao, minlength=len(ids_unicos))
+            self.total = len(linhas)
+
+            # somas por segmento em blocos para limitar a memória
+            for inicio in range(0, len(linhas), self.tam_bloco):
+                fim = inicio + self.tam_bloco
+                np.add.at(somas, posicao[inicio:fim],
+                          embeddings[linhas[inicio:fim]])
+                self.processados = min(fim, self.total)
+
+            for user_id, soma, contagem in zip(ids_unicos, somas, contagens):
+                # escritas feitas durante o aquecimento já estão no armazém
+                if int(user_id) not in armazem:
+                    armazem.guardar(int(user_id), soma, int(contagem))
+                self.usuarios += 1
+
+            self.estado = 'concluido'
+        except Exception as e:
+            self.estado = 'erro'
+            self.erro = str(e)
+        finally:
+            self.segundos = time.monotonic() - self.inicio
+        return self
+
+    def iniciar_em_segundo_plano(self, app, db, embeddings, indices_map,
+                                 armazem):
+        def alvo():
+            with app.app_context():
+                self.executar(db.session, embeddings, indices_map, armazem)
+                self.relatar()
+
+        thread = threading.Thread(target=alvo, name='aquecimento',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def relatar(self):
+        if self.estado == 'erro':
+            print(f"provavel tabela nao criada {self.erro}")
+            print("segunda execução não há erro")
+        else:
+            print(f"--- Cache pronto: {self.usuarios} usuários processados "
+                  f"em {self.segundos:.2f}s ---")
+
+    def status(self):
+        decorrido = self.segundos
+        if decorrido is None and self.inicio is not None:
+            decorrido = time.monotonic() - self.inicio
+        return {
+            'estado': self.estado,
+            'interacoes_processadas': self.processados,
+            'interacoes_total': self.total,
+            'usuarios': self.usuarios,
+            'segundos': round(decorrido, 2) if decorrido is not None else None,
+            'erro': self.erro
+        }
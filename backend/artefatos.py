@@ -0,0 +1,210 @@
+"""
+Formato de artefato dos modelos: um diretório com arrays .npy e um
+manifesto.json (formato, version, date, model_name, dims e lista de ids).
+O backend abre os .npy com mmap_mode='r', então vários workers
+compartilham as mesmas páginas em vez de cada um ter sua cópia do pickle.
+O artefato de conteúdo pode trazer também a tabela de vizinhos
+(vizinhos_indices int32 e vizinhos_scores float16, K por filme).
+
+Conversão dos pickles existentes:
+    python artefatos.py [diretorio_backend]
+"""
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+
+FORMATO = 1
+DIR_CONTEUDO = 'modelo_recomendacao'
+DIR_COLABORATIVO = 'modelo_colaborativo'
+K_VIZINHOS = 50
+
+
+def escrever_diretorio(diretorio, arrays, manifesto, extras=None):
+    """
+    Grava em diretório temporário e troca no final, para que o backend
+    nunca leia um artefato pela metade.
+    """
+    temporario = f"{diretorio}.tmp"
+    antigo = f"{diretorio}.old"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    for nome, array in arrays.items():
+        np.save(os.path.join(temporario, f'{nome}.npy'),
+                np.ascontiguousarray(array))
+    for nome, conteudo in (extras or {}).items():
+        with open(os.path.join(temporario, nome), 'w', encoding='utf-8') as f:
+            json.dump(conteudo, f, ensure_ascii=False)
+
+    manifesto = dict(manifesto, formato=FORMATO,
+                     arquivos=sorted(f'{nome}.npy' for nome in arrays))
+    with open(os.path.join(temporario, 'manifesto.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.rename(diretorio, antigo)
+    os.rename(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+    return diretorio
+
+
+def ler_manifesto(diretorio):
+    with open(os.path.join(diretorio, 'manifesto.json'),
+              encoding='utf-8') as f:
+        manifesto = json.load(f)
+    if manifesto.get('formato') != FORMATO:
+        raise ValueError(
+            f"Formato de artefato não suportado: {manifesto.get('formato')}")
+    return manifesto
+
+
+def calcular_vizinhos(embeddings, k=K_VIZINHOS, tam_bloco=1024):
+    """
+    Os k filmes mais similares de cada filme (sem ele mesmo), em blocos
+    de linhas para não montar a matriz n x n inteira.
+    Retorna (indices int32, scores float16), ambos n x k, em ordem
+    decrescente de similaridade.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = embeddings.shape[0]
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+    for inicio in range(0, n, tam_bloco):
+        fim = min(inicio + tam_bloco, n)
+        sim = embeddings[inicio:fim] @ embeddings.T
+        sim[np.arange(fim - inicio), np.arange(inicio, fim)] = -np.inf
+        escolhidos = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        valores = np.take_along_axis(sim, escolhidos, axis=1)
+        ordem = np.argsort(-valores, axis=1, kind='stable')
+        indices[inicio:fim] = np.take_along_axis(escolhidos, ordem, axis=1)
+        scores[inicio:fim] = np.take_along_axis(valores, ordem, axis=1)
+    return indices, scores
+
+
+def exportar_conteudo(diretorio, embeddings, tmdb_ids, metadata, version,
+                      model_name, date=None, k_vizinhos=K_VIZINHOS,
+                      vizinhos=None):
+    """
+    Chamado pelo treinamento de conteúdo (treinamento_recomendacao).
+    vizinhos: (indices, scores) já calculados por calcular_vizinhos;
+    sem eles a tabela é calculada aqui. k_vizinhos=0 não grava a tabela.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    manifesto = {
+        'tipo': 'conteudo',
+        'version': version,
+        'date': date or time.strftime("%Y-%m-%d %H:%M:%S"),
+        'model_name': model_name,
+        'dims': list(embeddings.shape),
+        'tmdb_ids': [int(tid) for tid in tmdb_ids],
+    }
+    metadata = [{k: (v.item() if hasattr(v, 'item') else v)
+                 for k, v in m.items()} for m in metadata]
+    arrays = {'embeddings': embeddings}
+    if k_vizinhos and embeddings.shape[0] > 1:
+        if vizinhos is None:
+            vizinhos = calcular_vizinhos(embeddings, k_vizinhos)
+        arrays['vizinhos_indices'] = np.asarray(vizinhos[0], dtype=np.int32)
+        arrays['vizinhos_scores'] = np.asarray(vizinhos[1],
+                                               dtype=np.float16)
+        manifesto['k_vizinhos'] = int(arrays['vizinhos_indices'].shape[1])
+    return escrever_diretorio(diretorio, arrays, manifesto,
+                              extras={'metadata.json': metadata})
+
+
+def exportar_colaborativo(diretorio, algo, version, n_ratings=None,
+                          date=None):
+    """ Chamado pelo treinamento colaborativo com o SVD já treinado. """
+    trainset = algo.trainset
+    manifesto = {
+        'tipo': 'colaborativo',
+        'version': version,
+        'date': date or time.strftime("%Y-%m-%d %H:%M:%S"),
+        'algorithm': 'SVD',
+        'n_ratings': n_ratings,
+        'dims': [trainset.n_users, trainset.n_items, algo.n_factors],
+        'media_global': float(trainset.global_mean),
+        'escala': list(trainset.rating_scale),
+        'enviesado': bool(algo.biased),
+        'ids_usuarios': [int(trainset.to_raw_uid(u))
+                         for u in range(trainset.n_users)],
+        'ids_itens': [int(trainset.to_raw_iid(i))
+                      for i in range(trainset.n_items)],
+    }
+    arrays = {'pu': algo.pu, 'qi': algo.qi, 'bu': algo.bu, 'bi': algo.bi}
+    return escrever_diretorio(diretorio, arrays, manifesto)
+
+
+def _abrir_arrays(diretorio, manifesto):
+    return {
+        nome[:-len('.npy')]: np.load(os.path.join(diretorio, nome),
+                                     mmap_mode='r')
+        for nome in manifesto['arquivos']
+    }
+
+
+def carregar_conteudo(diretorio):
+    """ Mesmas chaves do modelo_recomendacao.pkl, embeddings via mmap. """
+    manifesto = ler_manifesto(diretorio)
+    dados = dict(manifesto)
+    dados.update(_abrir_arrays(diretorio, manifesto))
+    with open(os.path.join(diretorio, 'metadata.json'),
+              encoding='utf-8') as f:
+        dados['metadata'] = json.load(f)
+    if list(dados['embeddings'].shape) != manifesto['dims'] \
+            or len(dados['tmdb_ids']) != manifesto['dims'][0]:
+        raise ValueError(f"Artefato inconsistente em {diretorio}")
+    if 'vizinhos_indices' in dados:
+        forma = (manifesto['dims'][0], manifesto.get('k_vizinhos'))
+        if dados['vizinhos_indices'].shape != forma \
+                or dados['vizinhos_scores'].shape != forma:
+            raise ValueError(
+                f"Tabela de vizinhos inconsistente em {diretorio}")
+    return dados
+
+
+def carregar_colaborativo(diretorio):
+    """ Manifesto + pu, qi, bu, bi via mmap (ver FatoresSVD.do_artefato). """
+    manifesto = ler_manifesto(diretorio)
+    dados = dict(manifesto)
+    dados.update(_abrir_arrays(diretorio, manifesto))
+    n_usuarios, n_itens, _ = manifesto['dims']
+    if dados['pu'].shape[0] != n_usuarios or dados['qi'].shape[0] != n_itens:
+        raise ValueError(f"Artefato inconsistente em {diretorio}")
+    return dados
+
+
+def converter_pickles(base_dir):
+    """ Gera os diretórios de artefato a partir dos .pkl existentes. """
+    import joblib
+
+    caminho = os.path.join(base_dir, 'modelo_recomendacao.pkl')
+    if os.path.exists(caminho):
+        model = joblib.load(caminho)
+        vizinhos = None
+        if model.get('vizinhos_indices') is not None:
+            vizinhos = (model['vizinhos_indices'], model['vizinhos_scores'])
+        exportar_conteudo(
+            os.path.join(base_dir, DIR_CONTEUDO), model['embeddings'],
+            model['tmdb_ids'], model['metadata'], model.get('version'),
+            model.get('model_name'), model.get('date'), vizinhos=vizinhos)
+        print(f"Convertido: {caminho}")
+
+    caminho = os.path.join(base_dir, 'modelo_colaborativo.pkl')
+    if os.path.exists(caminho):
+        dados = joblib.load(caminho)
+        exportar_colaborativo(
+            os.path.join(base_dir, DIR_COLABORATIVO), dados['model'],
+            dados.get('version'), dados.get('n_ratings'), dados.get('date'))
+        print(f"Convertido: {caminho}")
+
+
+if __name__ == '__main__':
+    converter_pickles(sys.argv[1] if len(sys.argv) > 1
+                      else os.path.dirname(os.path.abspath(__file__)))
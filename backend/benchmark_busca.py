@@ -0,0 +1,101 @@
+"""
+Compara a busca de títulos do índice em memória (busca.py) com o
+caminho antigo (ILIKE '%termo%' ordenado por qtd_votos) no banco
+configurado em .env, e mede o p99 do autocomplete contra a meta.
+
+Uso:
+    python benchmark_busca.py [termo ...]
+"""
+import statistics
+import sys
+import time
+from apy import app, catalogo, indice_busca, indice_prefixos
+from models import Filmes
+from pontuacao import top_k
+
+META_P99_AUTOCOMPLETE_MS = 5.0
+CONSULTAS_PADRAO = ['bat', 'batman', 'senhor dos', 'interestelar',
+                    'star wars', 'o poderoso chefao', 'toy', 'amor',
+                    'the', 'matrix']
+
+
+def pesquisar_ilike(termo, limite=20):
+    """ Caminho antigo da rota /filmes/pesquisar. """
+    filmes = Filmes.query.filter(
+        Filmes.titulo.ilike(f"%{termo}%")
+        ).order_by(
+            Filmes.qtd_votos.desc()
+        ).limit(limite).all()
+    return [f.tmdb_id for f in filmes]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def medir(funcao, termo, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(termo)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, tempos
+
+
+def comparar(consultas, repeticoes=50):
+    indice_busca.sincronizar(catalogo)
+    print(f"{'termo':<20}{'ilike p50':>11}{'p99':>9}"
+          f"{'índice p50':>12}{'p99':>9}{'em comum':>10}")
+    todos_ilike, todos_indice = [], []
+    for termo in consultas:
+        ids_ilike, t_ilike = medir(pesquisar_ilike, termo, repeticoes)
+        ids_indice, t_indice = medir(indice_busca.buscar, termo, repeticoes)
+        todos_ilike += t_ilike
+        todos_indice += t_indice
+        comum = len(set(ids_ilike) & set(ids_indice))
+        print(f"{termo:<20}{statistics.median(t_ilike):>9.2f}ms"
+              f"{percentil(t_ilike, 0.99):>7.2f}ms"
+              f"{statistics.median(t_indice):>10.2f}ms"
+              f"{percentil(t_indice, 0.99):>7.2f}ms"
+              f"{comum:>5}/{len(ids_ilike):<4}")
+    print(f"\nGeral: ILIKE p99 {percentil(todos_ilike, 0.99):.2f}ms, "
+          f"índice p99 {percentil(todos_indice, 0.99):.2f}ms")
+
+
+def medir_autocomplete(qtd_titulos=200, meta_ms=META_P99_AUTOCOMPLETE_MS):
+    """
+    Simula a digitação (1 a 6 letras) dos títulos mais votados, sem e
+    com o cache de prefixos. Retorna True se o p99 sem cache cumpre a meta.
+    """
+    indice_prefixos.sincronizar(catalogo)
+    colunas = catalogo.colunas()
+    mais_votados = top_k(colunas['qtd_votos'], qtd_titulos)
+    titulos = colunas['titulo'][mais_votados].tolist()
+    prefixos = list(dict.fromkeys(
+        t[:n] for t in titulos for n in range(1, 7) if t[:n].strip()))
+
+    resultados = {}
+    for rodada in ('sem cache', 'com cache'):
+        tempos = []
+        for prefixo in prefixos:
+            if rodada == 'sem cache':
+                indice_prefixos._cache.clear()
+            inicio = time.perf_counter()
+            indice_prefixos.sugerir(prefixo)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[rodada] = percentil(tempos, 0.99)
+        print(f"Autocomplete {rodada}: {len(prefixos)} prefixos, "
+              f"p50 {statistics.median(tempos):.3f}ms, "
+              f"p99 {resultados[rodada]:.3f}ms")
+
+    cumpre = resultados['sem cache'] <= meta_ms
+    print(f"Meta p99 {meta_ms}ms: {'OK' if cumpre else 'NÃO ATINGIDA'}")
+    return cumpre
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        comparar(sys.argv[1:] or CONSULTAS_PADRAO)
+        print()
+        medir_autocomplete()
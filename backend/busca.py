@@ -0,0 +1,278 @@
+import math
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+import numpy as np
+from pontuacao import top_k
+
+
+def normalizar(texto):
+    """ Minúsculas, sem acentos e com espaços simples. """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """
+    Índice invertido de trigramas sobre os títulos normalizados do
+    catálogo em memória. Uma consulta com 3+ caracteres só confere os
+    títulos que contêm todos os seus trigramas (mesmo resultado do
+    ILIKE '%termo%', mas sem varrer a tabela e ignorando acentos).
+    Sem nenhum título com o termo, cai para similaridade de trigramas
+    (tolera erros de digitação). O ranking mistura qualidade do match e
+    popularidade (qtd_votos).
+    """
+
+    def __init__(self, peso_match=0.7, similaridade_min=0.3):
+        self.peso_match = peso_match
+        self.similaridade_min = similaridade_min
+        self.titulos = []
+        self.tmdb_ids = []
+        self.popularidade = []
+        self.postings = {}   # trigrama -> linhas (em ordem crescente)
+        self._max_log_votos = 1.0
+        self._geracao = None  # geração do catálogo indexada
+        self._lock = threading.Lock()
+        self._lock_construcao = threading.Lock()  # uma indexação por vez
+
+    def __len__(self):
+        return len(self.titulos)
+
+    def sincronizar(self, catalogo):
+        """
+        Indexa só as linhas novas do catálogo (que cresce por append);
+        depois de uma recarga completa do catálogo, monta um índice novo
+        fora do lock e troca tudo de uma vez. Enquanto outra requisição
+        indexa, segue com o índice atual. Barato quando nada mudou.
+        """
+        if self._atualizado(catalogo) \
+                or not self._lock_construcao.acquire(blocking=False):
+            return 0
+        try:
+            # geração antes das colunas: recarga no meio força outra volta
+            geracao = catalogo.geracao
+            colunas = catalogo.colunas()
+            if geracao == self._geracao \
+                    and len(colunas['tmdb_id']) == len(self.titulos):
+                return 0
+            if geracao != self._geracao:
+                novo = IndiceBusca(self.peso_match, self.similaridade_min)
+                novo._indexar(colunas)
+                with self._lock:
+                    self.titulos, self.tmdb_ids = (novo.titulos,
+                                                   novo.tmdb_ids)
+                    self.popularidade, self.postings = (novo.popularidade,
+                                                        novo.postings)
+                    self._max_log_votos = novo._max_log_votos
+                    self._geracao = geracao
+                return len(novo.titulos)
+            with self._lock:
+                return self._indexar(colunas)
+        finally:
+            self._lock_construcao.release()
+
+    def _atualizado(self, catalogo):
+        return catalogo.geracao == self._geracao \
+            and len(catalogo) == len(self.titulos)
+
+    def _indexar(self, colunas):
+        inicio = len(self.titulos)
+        titulos = colunas['titulo'][inicio:].tolist()
+        ids = colunas['tmdb_id'][inicio:].tolist()
+        votos = colunas['qtd_votos'][inicio:].tolist()
+        for deslocamento, (titulo, tmdb_id, qtd) in enumerate(
+                zip(titulos, ids, votos)):
+            linha = inicio + deslocamento
+            titulo = normalizar(titulo)
+            self.titulos.append(titulo)
+            self.tmdb_ids.append(tmdb_id)
+            self.popularidade.append(math.log1p(max(qtd, 0)))
+            for grama in trigramas(titulo):
+                self.postings.setdefault(grama, []).append(linha)
+        self._max_log_votos = max(self.popularidade, default=1.0) or 1.0
+        return len(titulos)
+
+    @staticmethod
+    def _qualidade(titulo, termo):
+        if titulo == termo:
+            return 1.0
+        if titulo.startswith(termo):
+            return 0.8
+        if f' {termo}' in f' {titulo}':
+            return 0.6  # começo de palavra
+        return 0.4
+
+    def _candidatos(self, termo):
+        gramas = trigramas(termo)
+        if not gramas:
+            # termo curto: confere todos os títulos
+            return range(len(self.titulos))
+        listas = [self.postings.get(g) for g in gramas]
+        if any(lista is None for lista in listas):
+            return []
+        listas.sort(key=len)
+        comuns = set(listas[0])
+        for lista in listas[1:]:
+            comuns.intersection_update(lista)
+            if not comuns:
+                break
+        return comuns
+
+    def _aproximados(self, termo):
+        """ Títulos com similaridade (Jaccard) de trigramas suficiente. """
+        gramas = trigramas(termo)
+        if not gramas:
+            return []
+        compartilhados = Counter()
+        for grama in gramas:
+            compartilhados.update(self.postings.get(grama, ()))
+        encontrados = []
+        for linha, qtd in compartilhados.items():
+            total = len(gramas) + len(trigramas(self.titulos[linha])) - qtd
+            similaridade = qtd / total
+            if similaridade >= self.similaridade_min:
+                encontrados.append((linha, 0.3 * similaridade))
+        return encontrados
+
+    def buscar(self, consulta, limite=20):
+        """ tmdb_ids ordenados pelo score (match + popularidade). """
+        termo = normalizar(consulta)
+        if not termo:
+            return []
+        with self._lock:  # sincronizar() não troca o índice no meio
+            return self._buscar(termo, limite)
+
+    def _buscar(self, termo, limite):
+        encontrados = [(linha, self._qualidade(self.titulos[linha], termo))
+                       for linha in self._candidatos(termo)
+                       if termo in self.titulos[linha]]
+        if not encontrados:
+            encontrados = self._aproximados(termo)
+
+        peso_pop = 1 - self.peso_match
+        pontuados = sorted(
+            ((self.peso_match * qualidade
+              + peso_pop * self.popularidade[linha] / self._max_log_votos,
+              self.popularidade[linha], -linha)
+             for linha, qualidade in encontrados),
+            reverse=True)
+        return [self.tmdb_ids[-p[2]] for p in pontuados[:limite]]
+
+
+class IndicePrefixos:
+    """
+    Autocomplete: lista ordenada de chaves (título normalizado a partir
+    de cada palavra) com bisect para achar a faixa do prefixo e
+    argpartition para os mais populares dela. Títulos que começam com o
+    prefixo vêm antes dos que só têm uma palavra começando com ele.
+    Prefixos frequentes ficam em um cache LRU.
+    """
+
+    def __init__(self, max_cache=5000):
+        self.max_cache = max_cache
+        self._dados = ([], np.empty(0), np.empty(0, dtype=np.int64), [])
+        self._tamanho = 0
+        self._geracao = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._lock_construcao = threading.Lock()  # uma reconstrução por vez
+        self.hits = 0
+        self.misses = 0
+
+    def sincronizar(self, catalogo):
+        """
+        Reconstrói as chaves quando o catálogo cresce ou é recarregado.
+        Enquanto outra requisição reconstrói, segue com o índice atual.
+        """
+        if self._atualizado(catalogo) \
+                or not self._lock_construcao.acquire(blocking=False):
+            return False
+        try:
+            if self._atualizado(catalogo):
+                return False
+            geracao = catalogo.geracao
+            self._construir(catalogo.colunas(), geracao)
+            return True
+        finally:
+            self._lock_construcao.release()
+
+    def _atualizado(self, catalogo):
+        return len(catalogo) == self._tamanho \
+            and catalogo.geracao == self._geracao
+
+    def _construir(self, colunas, geracao):
+        titulos = colunas['titulo'].tolist()
+        votos = np.log1p(np.maximum(colunas['qtd_votos'], 0))
+        votos = votos / (votos.max() or 1.0)
+
+        entradas = []
+        for linha, titulo in enumerate(titulos):
+            titulo = normalizar(titulo)
+            inicio = 0
+            for palavra in titulo.split(' '):
+                # começo do título vale mais que começo de palavra
+                bonus = 1.0 if inicio == 0 else 0.0
+                entradas.append((titulo[inicio:], linha, bonus))
+                inicio += len(palavra) + 1
+        entradas.sort()
+
+        chaves = [e[0] for e in entradas]
+        linhas = np.fromiter((e[1] for e in entradas), np.int64,
+                             len(entradas))
+        scores = np.fromiter((e[2] for e in entradas), np.float64,
+                             len(entradas)) + votos[linhas]
+        with self._lock:
+            self._dados = (chaves, scores, linhas,
+                           colunas['tmdb_id'].tolist())
+            self._tamanho = len(titulos)
+            self._geracao = geracao
+            self._cache.clear()
+
+    def sugerir(self, prefixo, limite=8):
+        """ tmdb_ids dos títulos com o prefixo, mais populares primeiro. """
+        prefixo = normalizar(prefixo)
+        if not prefixo:
+            return []
+        chave_cache = (prefixo, limite)
+        with self._lock:
+            if chave_cache in self._cache:
+                self._cache.move_to_end(chave_cache)
+                self.hits += 1
+                return self._cache[chave_cache]
+            self.misses += 1
+
+        chaves, scores, linhas, tmdb_ids = self._dados
+        inicio = bisect_left(chaves, prefixo)
+        fim = bisect_left(chaves, prefixo + '\uffff', inicio)
+
+        # folga para títulos que aparecem por mais de uma palavra
+        melhores = inicio + top_k(scores[inicio:fim], limite * 3)
+        resultado = []
+        vistos = set()
+        for linha in linhas[melhores].tolist():
+            if linha not in vistos:
+                vistos.add(linha)
+                resultado.append(tmdb_ids[linha])
+                if len(resultado) == limite:
+                    break
+
+        with self._lock:
+            self._cache[chave_cache] = resultado
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return resultado
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taxa_acerto': round(self.hits / total, 3) if total else 0.0,
+            'prefixos_em_cache': len(self._cache)
+        }
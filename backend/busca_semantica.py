@@ -0,0 +1,116 @@
+import importlib.util
+import threading
+from collections import OrderedDict
+import numpy as np
+from busca import normalizar
+
+MODELO_PADRAO = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class BuscaIndisponivel(Exception):
+    """ sentence-transformers ausente ou modelo incompatível. """
+
+
+class BuscaSemantica:
+    """
+    Busca em texto livre sobre os embeddings de conteúdo: a consulta é
+    codificada pelo mesmo SentenceTransformer do treinamento e procurada
+    no índice de recomendação (modelos.indice). O modelo só é carregado
+    na primeira busca (ou por aquecer()), sempre em CPU, e os vetores das
+    consultas recentes ficam em um cache LRU.
+    sentence-transformers é opcional: sem ele a rota responde 503.
+    """
+
+    def __init__(self, nome_modelo=None, max_cache=1000):
+        self.nome_modelo = nome_modelo
+        self.max_cache = max_cache
+        self._modelo = None
+        self._nome_carregado = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # cache e troca do modelo
+        # uma carga por vez, sem segurar _lock: buscas em cache seguem
+        self._lock_carga = threading.Lock()
+        self.erro = None
+
+    @staticmethod
+    def instalada():
+        return importlib.util.find_spec('sentence_transformers') is not None
+
+    def _carregado(self, nome):
+        with self._lock:
+            if self._modelo is not None and self._nome_carregado == nome:
+                return self._modelo
+        return None
+
+    def _carregar(self, nome):
+        modelo = self._carregado(nome)
+        if modelo is not None:
+            return modelo
+        with self._lock_carga:
+            modelo = self._carregado(nome)  # carregado enquanto esperava
+            if modelo is not None:
+                return modelo
+            if not self.instalada():
+                raise BuscaIndisponivel(
+                    "sentence-transformers não está instalado")
+            from sentence_transformers import SentenceTransformer
+            try:
+                modelo = SentenceTransformer(nome, device='cpu')
+            except Exception as e:
+                self.erro = str(e)
+                raise BuscaIndisponivel(f"Falha ao carregar {nome}: {e}")
+            with self._lock:
+                self._modelo = modelo
+                self._nome_carregado = nome
+                self._cache.clear()
+            self.erro = None
+            return modelo
+
+    def aquecer(self, nome=None):
+        """ Carrega o modelo e codifica uma consulta de teste. """
+        try:
+            self.codificar("aquecimento", nome)
+        except BuscaIndisponivel as e:
+            print(f"Busca semântica indisponível: {e}")
+
+    def aquecer_em_segundo_plano(self, nome=None):
+        thread = threading.Thread(target=self.aquecer, args=(nome,),
+                                  name='aquece-busca-semantica', daemon=True)
+        thread.start()
+        return thread
+
+    def codificar(self, texto, nome=None):
+        """ Vetor normalizado (float32) da consulta, com cache LRU. """
+        nome = self.nome_modelo or nome or MODELO_PADRAO
+        chave = (nome, normalizar(texto))
+        with self._lock:
+            if chave in self._cache:
+                self._cache.move_to_end(chave)
+                return self._cache[chave]
+
+        modelo = self._carregar(nome)
+        vetor = modelo.encode([texto], normalize_embeddings=True)[0]
+        vetor = np.asarray(vetor, dtype=np.float32)
+
+        with self._lock:
+            self._cache[chave] = vetor
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return vetor
+
+    def buscar(self, modelos, texto, k=20):
+        """ (linhas do catálogo de conteúdo, scores) mais próximas. """
+        vetor = self.codificar(texto, modelos.nome_modelo)
+        if vetor.shape[0] != modelos.embeddings.shape[1]:
+            raise BuscaIndisponivel(
+                "Dimensão do modelo de consulta difere dos embeddings")
+        return modelos.indice.buscar(vetor, k)
+
+    def status(self):
+        return {
+            'instalada': self.instalada(),
+            'carregada': self._modelo is not None,
+            'modelo': self._nome_carregado,
+            'consultas_em_cache': len(self._cache),
+            'erro': self.erro
+        }
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheRecomendacoes:
+    """
+    Cache LRU dos resultados das rotas de recomendação por usuário.
+    Toda escrita (avaliação ou favorito) remove as entradas do usuário.
+    Também expira por TTL e respeita limites de entradas e bytes.
+
+    obter() devolve também a versão lida (contador de escritas e geração
+    do cache, que muda a cada limpar()); guardar() recebe essa versão e
+    descarta o resultado se houve escrita do usuário ou troca de modelos
+    enquanto ele era calculado. Só as últimas max_itens escritas ficam
+    registradas por usuário; as mais antigas viram um piso comum.
+    """
+
+    def __init__(self, max_itens=1000, ttl=600, max_bytes=50 * 1024 * 1024):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()  # chave -> (expira_em, tamanho, valor)
+        self._escritas = 0  # incrementado por invalidar()
+        # user_id -> _escritas da última escrita, da mais antiga à recente
+        self._versoes = OrderedDict()
+        self._piso = 0  # última escrita entre as já esquecidas
+        self._geracao = 0  # incrementada por limpar()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.remocoes = 0
+
+    def _ultima_escrita(self, user_id):
+        return self._versoes.get(user_id, self._piso)
+
+    def obter(self, rota, user_id):
+        """ (valor ou None, versão a repassar ao guardar). """
+        with self._lock:
+            chave = (rota, user_id)
+            versao = (self._escritas, self._geracao)
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._remover(chave)
+                self.misses += 1
+                return None, versao
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[2], versao
+
+    def guardar(self, rota, user_id, valor, versao):
+        tamanho = len(json.dumps(valor, default=str))
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            chave = (rota, user_id)
+            lida, geracao = versao
+            if geracao != self._geracao \
+                    or self._ultima_escrita(user_id) > lida:
+                return  # calculado antes de uma escrita ou troca
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (time.monotonic() + self.ttl, tamanho, valor)
+            self._bytes += tamanho
+            while (len(self._itens) > self.max_itens
+                   or self._bytes > self.max_bytes):
+                self._remover(next(iter(self._itens)))
+                self.remocoes += 1
+
+    def invalidar(self, user_id):
+        """ Chamado após cada escrita que muda o histórico do usuário. """
+        with self._lock:
+            self._escritas += 1
+            self._versoes.pop(user_id, None)
+            self._versoes[user_id] = self._escritas
+            while len(self._versoes) > self.max_itens:
+                _, self._piso = self._versoes.popitem(last=False)
+            for chave in [c for c in self._itens if c[1] == user_id]:
+                self._remover(chave)
+
+    def limpar(self):
+        """ Descarta tudo (ex.: troca de versão dos modelos). """
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+            self._geracao += 1
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._itens.pop(chave)
+        self._bytes -= tamanho
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': round(self.hits / total, 3) if total else 0.0,
+                'remocoes': self.remocoes,
+                'itens': len(self._itens),
+                'bytes': self._bytes
+            }
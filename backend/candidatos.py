@@ -0,0 +1,108 @@
+import threading
+import time
+import numpy as np
+from pontuacao import top_k
+
+
+class GeradorCandidatos:
+    """
+    Candidatos da recomendação híbrida vindos de várias fontes: vizinhos
+    de conteúdo (índice ANN), melhores notas previstas pelo SVD em todo o
+    catálogo e filmes populares entre usuários parecidos. Cada fonte usa
+    seleção parcial (top-k) e o resultado é a união sem repetições, em
+    linhas do catálogo de conteúdo. Tempo e tamanho de cada fonte ficam
+    acumulados em estatisticas().
+    """
+
+    def __init__(self, k_conteudo=1000, k_svd=300, k_comunidade=100):
+        self.k_conteudo = k_conteudo
+        self.k_svd = k_svd
+        self.k_comunidade = k_comunidade
+        self._contadores = {}  # fonte -> [chamadas, segundos, candidatos]
+        self._lock = threading.Lock()
+
+    def _registrar(self, fonte, inicio, qtd):
+        segundos = time.perf_counter() - inicio
+        with self._lock:
+            contador = self._contadores.setdefault(fonte, [0, 0.0, 0])
+            contador[0] += 1
+            contador[1] += segundos
+            contador[2] += qtd
+
+    def gerar(self, modelos, user_id, vetor_norm, comunidade=None,
+              fatores=None):
+        """
+        vetor_norm: vetor do usuário normalizado.
+        comunidade: função k -> linhas do catálogo (ver filmes_da_comunidade).
+        fatores: (pu, bu) do SVD fora de dobrados (ver candidatos_svd).
+        Retorna as linhas candidatas (np.int64, ordenadas e únicas).
+        """
+        partes = []
+
+        inicio = time.perf_counter()
+        linhas, _ = modelos.indice.buscar(vetor_norm, self.k_conteudo)
+        partes.append(np.asarray(linhas, dtype=np.int64))
+        self._registrar('conteudo', inicio, len(linhas))
+
+        if modelos.fatores_svd is not None and self.k_svd > 0:
+            inicio = time.perf_counter()
+            linhas = candidatos_svd(modelos, user_id, self.k_svd, fatores)
+            partes.append(linhas)
+            self._registrar('svd', inicio, len(linhas))
+
+        if comunidade is not None and self.k_comunidade > 0:
+            inicio = time.perf_counter()
+            linhas = np.asarray(comunidade(self.k_comunidade), dtype=np.int64)
+            partes.append(linhas)
+            self._registrar('comunidade', inicio, len(linhas))
+
+        inicio = time.perf_counter()
+        uniao = np.unique(np.concatenate(partes))
+        self._registrar('uniao', inicio, len(uniao))
+        return uniao
+
+    def copia(self):
+        """ Mesmos k, contadores próprios (lote e pré-cálculo). """
+        return GeradorCandidatos(self.k_conteudo, self.k_svd,
+                                 self.k_comunidade)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                fonte: {
+                    'chamadas': chamadas,
+                    'ms_total': round(segundos * 1000, 2),
+                    'ms_medio': round(segundos * 1000 / chamadas, 3),
+                    'candidatos_medio': round(qtd / chamadas, 1)
+                }
+                for fonte, (chamadas, segundos, qtd)
+                in self._contadores.items()
+            }
+
+
+def candidatos_svd(modelos, user_id, k, fatores=None):
+    """
+    Top-k das notas previstas pelo SVD entre os filmes que também estão no
+    catálogo de conteúdo (os demais não têm embedding para o score NLP).
+    fatores: ver FatoresSVD.estimar_catalogo.
+    """
+    est = modelos.fatores_svd.estimar_catalogo(user_id, fatores)
+    if est is None:
+        return np.empty(0, dtype=np.int64)
+    mascara = modelos.linhas_catalogo_svd < 0
+    melhores = top_k(est, k, mascara)
+    return modelos.linhas_catalogo_svd[melhores]
+
+
+def filmes_da_comunidade(matriz_avaliacoes, armazem, indices_map, user_id,
+                         k, n_vizinhos=30):
+    """
+    Filmes mais curtidos (nota >= 4) pelos vizinhos do usuário no armazém
+    de vetores, em linhas do catálogo de conteúdo.
+    """
+    vizinhos = armazem.vizinhos(user_id, n_vizinhos)
+    if not vizinhos:
+        return []
+
+    ids = matriz_avaliacoes.mais_curtidos(vizinhos, k=k)
+    return [indices_map[tid] for tid in ids if tid in indices_map]
@@ -0,0 +1,186 @@
+import threading
+import time
+import numpy as np
+from sqlalchemy import text
+from pontuacao import top_k
+
+CAMPOS_TEXTO = ('titulo', 'sinopse', 'generos', 'poster_path')
+CAMPOS_NUMERICOS = ('media_votos', 'popularidade')
+CAMPOS_PADRAO = ('tmdb_id', 'titulo', 'poster_path', 'sinopse', 'generos',
+                 'media_votos', 'qtd_votos')
+
+
+class CatalogoFilmes:
+    """
+    Cópia em memória da tabela filmes, em colunas NumPy com mapa
+    tmdb_id -> linha. As rotas montam as respostas direto das colunas,
+    sem consultar o banco nem construir objetos do ORM a cada requisição.
+    Novos filmes entram por atualizar(), que só lê as linhas com id acima
+    do último carregado; alterações (votos, títulos, pôsteres) e remoções
+    entram na recarga completa a cada intervalo_recarga segundos. Cada
+    carga troca as colunas de uma vez, então leitores nunca veem um
+    estado pela metade; geracao muda a cada recarga completa.
+    """
+
+    def __init__(self, intervalo=300, intervalo_recarga=3600):
+        self.intervalo = intervalo
+        self.intervalo_recarga = intervalo_recarga
+        self.ultimo_id = 0
+        self.ultima_verificacao = 0.0
+        self.ultima_recarga = 0.0
+        self.geracao = 0
+        self._dados = ({}, self._vazias())  # (tmdb_id -> linha, colunas)
+        self._lock = threading.Lock()  # uma leitura do banco por vez
+
+    @staticmethod
+    def _vazias():
+        colunas = {'tmdb_id': np.empty(0, dtype=np.int64),
+                   'qtd_votos': np.empty(0, dtype=np.int64)}
+        for campo in CAMPOS_TEXTO:
+            colunas[campo] = np.empty(0, dtype=object)
+        for campo in CAMPOS_NUMERICOS:
+            colunas[campo] = np.empty(0, dtype=np.float64)
+        return colunas
+
+    def _ler(self, db_session, a_partir_de):
+        sql = text("""
+            SELECT id, tmdb_id, titulo, sinopse, generos, poster_path,
+                   media_votos, popularidade, qtd_votos
+            FROM filmes WHERE id > :ultimo ORDER BY id
+        """)
+        return db_session.execute(sql, {'ultimo': a_partir_de}).fetchall()
+
+    @staticmethod
+    def _colunas(linhas_db):
+        n = len(linhas_db)
+        colunas = {
+            'tmdb_id': np.fromiter((r[1] for r in linhas_db), np.int64, n),
+            'qtd_votos': np.fromiter(
+                (-1 if r[8] is None else r[8] for r in linhas_db),
+                np.int64, n),
+        }
+        for campo, pos in zip(CAMPOS_TEXTO, (2, 3, 4, 5)):
+            colunas[campo] = np.array([r[pos] for r in linhas_db],
+                                      dtype=object)
+        for campo, pos in zip(CAMPOS_NUMERICOS, (6, 7)):
+            colunas[campo] = np.array(
+                [np.nan if r[pos] is None else r[pos] for r in linhas_db],
+                dtype=np.float64)
+        return colunas
+
+    def _anexar(self, linhas_db):
+        novas = self._colunas(linhas_db)
+        linhas, colunas = self._dados
+        base = len(colunas['tmdb_id'])
+        colunas = {campo: np.concatenate((colunas[campo], novas[campo]))
+                   for campo in colunas}
+        linhas = dict(linhas)
+        for i, tmdb_id in enumerate(novas['tmdb_id'].tolist()):
+            linhas[tmdb_id] = base + i
+        # mapa e colunas trocados juntos
+        self._dados = (linhas, colunas)
+        self.ultimo_id = max(self.ultimo_id, linhas_db[-1][0])
+
+    def _recarregar(self, db_session):
+        linhas_db = self._ler(db_session, 0)
+        colunas = self._colunas(linhas_db) if linhas_db else self._vazias()
+        mapa = {tid: i for i, tid in enumerate(colunas['tmdb_id'].tolist())}
+        self._dados = (mapa, colunas)
+        self.ultimo_id = linhas_db[-1][0] if linhas_db else 0
+        self.ultima_recarga = self.ultima_verificacao = time.monotonic()
+        self.geracao += 1
+        return len(linhas_db)
+
+    def _atualizar(self, db_session):
+        self.ultima_verificacao = time.monotonic()
+        linhas_db = self._ler(db_session, self.ultimo_id)
+        if linhas_db:
+            self._anexar(linhas_db)
+        return len(linhas_db)
+
+    def carregar(self, db_session):
+        """ Carga completa (início do servidor e recargas periódicas). """
+        with self._lock:
+            return self._recarregar(db_session)
+
+    def atualizar(self, db_session):
+        """ Lê só os filmes inseridos depois da última carga. """
+        with self._lock:
+            return self._atualizar(db_session)
+
+    def atualizar_se_preciso(self, db_session):
+        """
+        Recarga completa ou incremental vencida; se outra requisição já
+        está lendo o banco, não espera por ela. True se algo mudou.
+        """
+        agora = time.monotonic()
+        recarregar = self.intervalo_recarga > 0 and \
+            agora - self.ultima_recarga > self.intervalo_recarga
+        atualizar = self.intervalo > 0 and \
+            agora - self.ultima_verificacao > self.intervalo
+        if not (recarregar or atualizar) \
+                or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if recarregar:
+                self._recarregar(db_session)
+                return True
+            return self._atualizar(db_session) > 0
+        finally:
+            self._lock.release()
+
+    def existe(self, tmdb_id, db_session=None):
+        """
+        Checagem de existência das escritas. Se o filme não está em
+        memória, tenta uma atualização incremental antes de negar.
+        """
+        if tmdb_id in self:
+            return True
+        if db_session is not None:
+            self.atualizar(db_session)
+        return tmdb_id in self
+
+    def __contains__(self, tmdb_id):
+        return tmdb_id in self._dados[0]
+
+    def __len__(self):
+        return len(self._dados[0])
+
+    def colunas(self):
+        """ Colunas de uma mesma carga (somente leitura), por linha. """
+        return self._dados[1]
+
+    def pares_votos(self):
+        """ (tmdb_id, qtd_votos) para FatoresSVD.carregar_votos. """
+        colunas = self._dados[1]
+        return zip(colunas['tmdb_id'].tolist(),
+                   colunas['qtd_votos'].tolist())
+
+    def populares(self, k=10, min_votos=100):
+        """ Mesma regra do fallback: qtd_votos > min, maior média. """
+        colunas = self._dados[1]
+        mascara = (colunas['qtd_votos'] <= min_votos) \
+            | np.isnan(colunas['media_votos'])
+        melhores = top_k(colunas['media_votos'], k, mascara)
+        return [int(t) for t in colunas['tmdb_id'][melhores]]
+
+    def serializar(self, tmdb_ids, campos=CAMPOS_PADRAO):
+        """
+        Dicionários prontos para o jsonify, na ordem de tmdb_ids;
+        ids fora do catálogo são ignorados.
+        """
+        mapa, colunas = self._dados
+        linhas = [mapa[tid] for tid in tmdb_ids if tid in mapa]
+        valores = {}
+        for campo in campos:
+            coluna = colunas[campo][linhas]
+            if campo in CAMPOS_NUMERICOS:
+                valores[campo] = [None if np.isnan(v) else v
+                                  for v in coluna.tolist()]
+            elif campo == 'qtd_votos':
+                valores[campo] = [None if v < 0 else v
+                                  for v in coluna.tolist()]
+            else:
+                valores[campo] = coluna.tolist()
+        return [{campo: valores[campo][i] for campo in campos}
+                for i in range(len(linhas))]
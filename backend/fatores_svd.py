@@ -0,0 +1,248 @@
+import threading
+import numpy as np
+from pontuacao import top_k
+
+
+class FatoresSVD:
+    """
+    Fatores do SVD (Surprise) extraídos uma única vez em arrays densos.
+    Reproduz algo_svd.predict() para vários filmes de uma vez:
+    mesma fórmula do estimate(), mesmo clip na escala de notas e mesma
+    regra de was_impossible (só ocorre no SVD sem vieses).
+    Os arrays podem vir mapeados em memória (artefatos.py), sem cópia.
+
+    Usuários que chegaram depois do treino recebem pu/bu por fold-in
+    (dobrar), com qi/bi congelados, e passam a ter previsões reais.
+    """
+
+    def __init__(self, pu, qi, bu, bi, media_global, escala, enviesado,
+                 ids_usuarios, ids_itens, reg_dobra=0.02,
+                 max_dobrados=10000):
+        self.media_global = float(media_global)
+        self.escala = tuple(escala)
+        self.enviesado = bool(enviesado)
+
+        self.pu = np.asarray(pu)
+        self.qi = np.asarray(qi)
+        self.bu = np.asarray(bu)
+        self.bi = np.asarray(bi)
+
+        # id "cru" (id_usuario / tmdb_id) -> linha nas matrizes
+        self.linha_usuario = {
+            int(uid): i for i, uid in enumerate(ids_usuarios)}
+        self.linha_item = {int(tid): i for i, tid in enumerate(ids_itens)}
+        self.tmdb_ids_itens = np.asarray(ids_itens, dtype=np.int64)
+
+        # qtd_votos alinhado com as linhas de qi (-1 = fora do catálogo)
+        self.qtd_votos = None
+
+        # fold-in: id_usuario -> (pu, bu) de quem não estava no treino
+        self.reg_dobra = float(reg_dobra)
+        self.max_dobrados = max_dobrados
+        self.dobrados = {}
+        self._lock_dobrados = threading.Lock()  # escritas e remoções
+
+    @classmethod
+    def do_surprise(cls, algo):
+        """ Extrai os fatores de um SVD treinado (modelo_colaborativo.pkl). """
+        trainset = algo.trainset
+        return cls(
+            algo.pu, algo.qi, algo.bu, algo.bi,
+            media_global=trainset.global_mean,
+            escala=trainset.rating_scale,
+            enviesado=algo.biased,
+            ids_usuarios=[trainset.to_raw_uid(u)
+                          for u in range(trainset.n_users)],
+            ids_itens=[trainset.to_raw_iid(i)
+                       for i in range(trainset.n_items)])
+
+    @classmethod
+    def do_artefato(cls, dados):
+        """ dados: retorno de artefatos.carregar_colaborativo(). """
+        return cls(
+            dados['pu'], dados['qi'], dados['bu'], dados['bi'],
+            media_global=dados['media_global'],
+            escala=dados['escala'],
+            enviesado=dados['enviesado'],
+            ids_usuarios=dados['ids_usuarios'],
+            ids_itens=dados['ids_itens'])
+
+    def linhas_itens(self, tmdb_ids):
+        """ Linhas dos filmes no modelo (-1 para filmes desconhecidos). """
+        return np.fromiter(
+            (self.linha_item.get(tid, -1) for tid in tmdb_ids),
+            dtype=np.int64, count=len(tmdb_ids))
+
+    def _fatores_usuario(self, user_id):
+        """ (pu, bu) do usuário, ou None se o modelo não o conhece. """
+        u = self.linha_usuario.get(user_id)
+        if u is not None:
+            return self.pu[u], self.bu[u]
+        return self.dobrados.get(user_id)
+
+    def calcular_dobra(self, notas):
+        """
+        Fold-in de um usuário fora do treino: pu/bu que minimizam o erro
+        do SVD nas notas dele (tmdb_id -> nota) com qi/bi fixos, por
+        mínimos quadrados regularizados (reg_dobra por nota, como no SGD
+        do Surprise): um sistema k x k por usuário, sem retreinar.
+        Retorna (pu, bu, quantas notas foram usadas), ou None se nenhuma
+        nota é de filme do modelo. Não guarda nada.
+        """
+        pares = [(self.linha_item[tid], nota) for tid, nota in notas.items()
+                 if tid in self.linha_item]
+        if not pares:
+            return None
+
+        linhas = np.array([linha for linha, _ in pares], dtype=np.int64)
+        alvo = np.array([nota for _, nota in pares], dtype=np.float64)
+        q = np.asarray(self.qi[linhas], dtype=np.float64)
+
+        if self.enviesado:
+            alvo -= self.media_global + self.bi[linhas]
+            q = np.hstack([np.ones((len(pares), 1)), q])  # coluna do bu
+
+        a = q.T @ q + self.reg_dobra * len(pares) * np.eye(q.shape[1])
+        x = np.linalg.solve(a, q.T @ alvo)
+
+        if self.enviesado:
+            return x[1:], float(x[0]), len(pares)
+        return x, 0.0, len(pares)
+
+    def dobrar(self, user_id, notas):
+        """
+        calcular_dobra() guardado em dobrados (os mais antigos saem acima
+        de max_dobrados); sem notas em filmes do modelo o usuário volta a
+        ser desconhecido. Retorna quantas notas foram usadas.
+        """
+        dobra = self.calcular_dobra(notas)
+        with self._lock_dobrados:
+            self.dobrados.pop(user_id, None)
+            if dobra is None:
+                return 0
+            self.dobrados[user_id] = dobra[:2]
+            while len(self.dobrados) > self.max_dobrados:
+                del self.dobrados[next(iter(self.dobrados))]
+        return dobra[2]
+
+    def prever(self, user_id, tmdb_ids):
+        """
+        Notas estimadas para todos os tmdb_ids do usuário.
+        Retorna (estimativas, impossiveis), ambos alinhados com tmdb_ids.
+        """
+        return self.prever_linhas(user_id, self.linhas_itens(tmdb_ids))
+
+    def prever_linhas(self, user_id, linhas):
+        """ Igual a prever(), recebendo as linhas de qi (-1 = fora). """
+        linhas = np.asarray(linhas, dtype=np.int64)
+        conhecidos = linhas >= 0
+        linhas_validas = linhas[conhecidos]
+        fatores = self._fatores_usuario(user_id)
+
+        est = np.zeros(len(linhas), dtype=np.float64)
+        impossiveis = np.zeros(len(linhas), dtype=bool)
+
+        if self.enviesado:
+            est += self.media_global
+            if fatores is not None:
+                pu, bu = fatores
+                est += bu
+            est[conhecidos] += self.bi[linhas_validas]
+            if fatores is not None:
+                est[conhecidos] += self.qi[linhas_validas] @ pu
+        else:
+            if fatores is not None:
+                est[conhecidos] = self.qi[linhas_validas] @ fatores[0]
+                impossiveis = ~conhecidos
+            else:
+                impossiveis[:] = True
+            est[impossiveis] = self.media_global
+
+        return np.clip(est, self.escala[0], self.escala[1]), impossiveis
+
+    def prever_bloco(self, user_ids, linhas, dobrados=None):
+        """
+        prever_linhas() para vários usuários: um produto P @ Q.T por
+        bloco. Retorna a matriz (usuários, linhas) de notas estimadas.
+        dobrados (id_usuario -> (pu, bu)) substitui self.dobrados para
+        quem não estava no treino.
+        """
+        if dobrados is None:
+            dobrados = self.dobrados
+        linhas = np.asarray(linhas, dtype=np.int64)
+        conhecidos = linhas >= 0
+        linhas_validas = linhas[conhecidos]
+        us = np.fromiter((self.linha_usuario.get(u, -1) for u in user_ids),
+                         dtype=np.int64, count=len(user_ids))
+        tem = us >= 0
+
+        pu = np.zeros((len(user_ids), self.qi.shape[1]))
+        bu = np.zeros(len(user_ids))
+        pu[tem], bu[tem] = self.pu[us[tem]], self.bu[us[tem]]
+        for i in np.flatnonzero(~tem):
+            fatores = dobrados.get(user_ids[i])
+            if fatores is not None:
+                pu[i], bu[i] = fatores
+                tem[i] = True
+
+        est = np.full((len(user_ids), len(linhas)), self.media_global)
+        produto = pu[tem] @ self.qi[linhas_validas].T
+        if self.enviesado:
+            est[tem] += bu[tem][:, None]
+            est[:, conhecidos] += self.bi[linhas_validas]
+            est[np.ix_(tem, conhecidos)] += produto
+        else:
+            est[np.ix_(tem, conhecidos)] = produto
+
+        return np.clip(est, self.escala[0], self.escala[1])
+
+    def carregar_votos(self, pares_votos):
+        """ pares_votos: iterável de (tmdb_id, qtd_votos) da tabela filmes. """
+        votos = np.full(len(self.linha_item), -1, dtype=np.float64)
+        for tmdb_id, qtd in pares_votos:
+            linha = self.linha_item.get(tmdb_id)
+            if linha is not None:
+                votos[linha] = qtd if qtd is not None else -1
+        self.qtd_votos = votos
+
+    def estimar_catalogo(self, user_id, fatores=None):
+        """
+        Nota prevista para todos os itens do SVD (qi @ pu + bi) em um
+        único produto, já limitada à escala. None quando todas as
+        previsões seriam was_impossible. fatores: (pu, bu) de um fold-in
+        que não está em dobrados (ex.: bloco do lote).
+        """
+        if fatores is None:
+            fatores = self._fatores_usuario(user_id)
+        if not self.enviesado and fatores is None:
+            return None
+
+        if self.enviesado:
+            est = self.media_global + self.bi
+            if fatores is not None:
+                pu, bu = fatores
+                est = est + bu + self.qi @ pu
+        else:
+            est = self.qi @ fatores[0]
+        return np.clip(est, self.escala[0], self.escala[1])
+
+    def ranquear(self, user_id, k=20, ids_excluir=(), min_votos=20):
+        """
+        Ranking de todo o catálogo conhecido pelo SVD: qi @ pu + bi em um
+        único produto, com a penalidade de popularidade do
+        score_descoberta (0.2 * log10(qtd_votos)) e top-k parcial.
+        Retorna os tmdb_ids ordenados.
+        """
+        est = self.estimar_catalogo(user_id)
+        if est is None:
+            return []
+
+        penalidade = 0.2 * np.log10(np.maximum(self.qtd_votos, 1))
+        scores = est - penalidade
+
+        mascara = self.qtd_votos <= min_votos
+        linhas_excluir = self.linhas_itens(list(ids_excluir))
+        mascara[linhas_excluir[linhas_excluir >= 0]] = True
+
+        melhores = top_k(scores, k, mascara)
+        return [int(tid) for tid in self.tmdb_ids_itens[melhores]]
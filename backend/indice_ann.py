@@ -0,0 +1,201 @@
+import hashlib
+import os
+import numpy as np
+from pontuacao import top_k
+
+
+class BuscaExata:
+    """
+    Busca por força bruta no catálogo inteiro (produto escalar).
+    Serve de fallback e de referência para o recall do índice aproximado.
+    """
+    tipo = 'exato'
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def buscar(self, vetor, k):
+        scores = self.embeddings @ vetor
+        indices = top_k(scores, k)
+        return indices, scores[indices]
+
+
+class IndiceIVF:
+    """
+    Índice invertido (IVF) em NumPy puro para vetores normalizados.
+    O catálogo é agrupado em n_listas por k-means esférico; a busca só
+    compara o vetor com os filmes das n_sondas listas mais próximas.
+    n_sondas é o ajuste entre recall e latência (n_sondas = n_listas
+    equivale à busca exata).
+    """
+    tipo = 'ivf'
+
+    def __init__(self, embeddings, n_listas=None, n_sondas=8):
+        self.embeddings = embeddings
+        n = embeddings.shape[0]
+        self.n_listas = n_listas or max(1, int(np.sqrt(n)))
+        self.n_sondas = n_sondas
+        self.centroides = None
+        self.ordem = None
+        self.offsets = None
+
+    def construir(self, iteracoes=10, semente=42, tam_bloco=8192):
+        rng = np.random.default_rng(semente)
+        n = self.embeddings.shape[0]
+        iniciais = rng.choice(n, size=min(self.n_listas, n), replace=False)
+        centroides = self.embeddings[iniciais].astype(np.float32)
+        self.n_listas = centroides.shape[0]
+
+        for _ in range(iteracoes):
+            grupos = self._atribuir(centroides, tam_bloco)
+            somas = np.zeros_like(centroides)
+            np.add.at(somas, grupos, self.embeddings)
+            contagem = np.bincount(grupos, minlength=self.n_listas)
+
+            # listas vazias recebem um filme aleatório como novo centro
+            vazias = np.flatnonzero(contagem == 0)
+            if vazias.size:
+                somas[vazias] = self.embeddings[
+                    rng.choice(n, size=vazias.size, replace=False)]
+
+            normas = np.linalg.norm(somas, axis=1, keepdims=True)
+            centroides = somas / np.maximum(normas, 1e-12)
+
+        grupos = self._atribuir(centroides, tam_bloco)
+        self.centroides = centroides
+        self.ordem = np.argsort(grupos, kind='stable')
+        self.offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(grupos, minlength=self.n_listas))))
+        return self
+
+    def _atribuir(self, centroides, tam_bloco):
+        n = self.embeddings.shape[0]
+        grupos = np.empty(n, dtype=np.int64)
+        for inicio in range(0, n, tam_bloco):
+            bloco = self.embeddings[inicio:inicio + tam_bloco]
+            grupos[inicio:inicio + tam_bloco] = np.argmax(
+                bloco @ centroides.T, axis=1)
+        return grupos
+
+    def buscar(self, vetor, k, n_sondas=None):
+        n_sondas = n_sondas or self.n_sondas
+        if n_sondas >= self.n_listas:
+            return BuscaExata(self.embeddings).buscar(vetor, k)
+
+        listas = top_k(self.centroides @ vetor, n_sondas)
+        candidatos = np.concatenate([
+            self.ordem[self.offsets[lista]:self.offsets[lista + 1]]
+            for lista in listas
+        ])
+
+        scores = self.embeddings[candidatos] @ vetor
+        melhores = top_k(scores, k)
+        return candidatos[melhores], scores[melhores]
+
+    def salvar(self, caminho):
+        np.savez(caminho,
+                 centroides=self.centroides,
+                 ordem=self.ordem,
+                 offsets=self.offsets,
+                 forma=np.array(self.embeddings.shape),
+                 assinatura=assinatura_embeddings(self.embeddings))
+
+    @classmethod
+    def carregar(cls, caminho, embeddings, n_sondas=8):
+        """
+        Retorna None se o arquivo foi gerado com outros embeddings (ex.:
+        modelo retreinado com o mesmo tamanho).
+        """
+        dados = np.load(caminho)
+        if tuple(dados['forma']) != embeddings.shape \
+                or 'assinatura' not in dados.files \
+                or str(dados['assinatura']) \
+                != assinatura_embeddings(embeddings):
+            return None
+        indice = cls(embeddings, n_listas=dados['centroides'].shape[0],
+                     n_sondas=n_sondas)
+        indice.centroides = dados['centroides']
+        indice.ordem = dados['ordem']
+        indice.offsets = dados['offsets']
+        return indice
+
+
+def assinatura_embeddings(embeddings):
+    """ Hash do conteúdo dos embeddings (identifica o cache do índice). """
+    dados = np.ascontiguousarray(embeddings)
+    return hashlib.sha1(memoryview(dados).cast('B')).hexdigest()
+
+
+def recall_at_k(indice, embeddings, consultas, k=10):
+    """
+    Fração média dos k vizinhos exatos que o índice também retorna.
+    """
+    exata = BuscaExata(embeddings)
+    acertos = 0
+    for vetor in consultas:
+        esperado, _ = exata.buscar(vetor, k)
+        obtido, _ = indice.buscar(vetor, k)
+        acertos += len(np.intersect1d(esperado, obtido))
+    return acertos / (k * len(consultas))
+
+
+def amostrar_consultas(embeddings, n=50, semente=0):
+    """
+    Consultas parecidas com as das rotas, para medir o recall: metade
+    são somas de 2 a 10 filmes do catálogo (perfis e sementes), metade
+    são filmes com ruído (textos da busca semântica). Um filme do
+    catálogo como consulta acha a si mesmo e à própria lista do IVF,
+    o que superestima o recall.
+    """
+    rng = np.random.default_rng(semente)
+    total, dim = embeddings.shape
+    consultas = np.empty((n, dim), dtype=np.float32)
+    for i in range(n // 2):
+        sementes = rng.choice(total, size=rng.integers(2, 11), replace=False)
+        consultas[i] = embeddings[sementes].sum(axis=0)
+    base = embeddings[rng.choice(total, size=n - n // 2, replace=False)]
+    ruido = rng.normal(size=base.shape)
+    ruido *= (np.linalg.norm(base, axis=1, keepdims=True)
+              / np.linalg.norm(ruido, axis=1, keepdims=True))
+    consultas[n // 2:] = base + ruido
+    consultas /= np.maximum(
+        np.linalg.norm(consultas, axis=1, keepdims=True), 1e-12)
+    return consultas
+
+
+def criar_indice(embeddings, caminho_cache=None):
+    """
+    Escolhe o índice de busca do conteúdo pelas variáveis de ambiente:
+    INDICE_ANN ('ivf' ou 'exato'), ANN_MIN_FILMES, ANN_SONDAS e
+    ANN_RECALL_MIN. Catálogos pequenos usam busca exata.
+    Se o recall@10 medido (ver amostrar_consultas) ficar abaixo do
+    mínimo, n_sondas é dobrado até atingir o alvo (no limite vira
+    busca exata).
+    O cache em disco só é reaproveitado para os mesmos embeddings.
+    """
+    tipo = os.getenv("INDICE_ANN", "ivf")
+    min_filmes = int(os.getenv("ANN_MIN_FILMES", 20000))
+    n_sondas = int(os.getenv("ANN_SONDAS", 8))
+    recall_min = float(os.getenv("ANN_RECALL_MIN", 0.9))
+
+    if tipo != 'ivf' or embeddings.shape[0] < min_filmes:
+        return BuscaExata(embeddings)
+
+    indice = None
+    if caminho_cache and os.path.exists(caminho_cache):
+        indice = IndiceIVF.carregar(caminho_cache, embeddings, n_sondas)
+
+    if indice is None:
+        indice = IndiceIVF(embeddings, n_sondas=n_sondas).construir()
+        if caminho_cache:
+            indice.salvar(caminho_cache)
+
+    amostra = amostrar_consultas(embeddings)
+    recall = recall_at_k(indice, embeddings, amostra, k=10)
+    while recall < recall_min and indice.n_sondas < indice.n_listas:
+        indice.n_sondas = min(indice.n_sondas * 2, indice.n_listas)
+        recall = recall_at_k(indice, embeddings, amostra, k=10)
+
+    print(f"--- Índice IVF: {indice.n_listas} listas, "
+          f"{indice.n_sondas} sondas, recall@10 = {recall:.3f} ---")
+    return indice
@@ -0,0 +1,72 @@
+import hashlib
+from sqlalchemy import text
+
+
+class InteracoesUsuario:
+    """
+    Retrato das interações de um usuário (notas e favoritos) carregado
+    com uma única consulta no início da requisição. Rotas e funções de
+    utils consomem este objeto em vez de consultar avaliacoes/favoritos
+    de novo a cada etapa.
+    """
+
+    def __init__(self, user_id, notas, favoritos):
+        self.user_id = user_id
+        self.notas = notas            # tmdb_id -> nota
+        self.favoritos = favoritos    # set de tmdb_id
+
+    @classmethod
+    def carregar(cls, db_session, user_id):
+        sql = text("""
+            SELECT id_filme, nota, 0 AS favorito
+            FROM avaliacoes WHERE id_usuario = :uid
+            UNION ALL
+            SELECT id_filme, NULL, 1 AS favorito
+            FROM favoritos WHERE id_usuario = :uid
+        """)
+        notas = {}
+        favoritos = set()
+        for id_filme, nota, favorito in db_session.execute(
+                sql, {'uid': user_id}):
+            if favorito:
+                favoritos.add(id_filme)
+            else:
+                notas[id_filme] = nota
+        return cls(user_id, notas, favoritos)
+
+    @property
+    def total(self):
+        """ Avaliações + favoritos (um filme pode contar duas vezes). """
+        return len(self.notas) + len(self.favoritos)
+
+    @property
+    def ids_avaliados(self):
+        return set(self.notas)
+
+    @property
+    def ids_vistos(self):
+        return self.favoritos.union(self.notas)
+
+    @property
+    def ids_curtidos(self):
+        """ Mesmo critério do UNION: nota >= 4 ou favorito. """
+        curtidos = {tid for tid, nota in self.notas.items() if nota >= 4}
+        return curtidos | self.favoritos
+
+    @property
+    def notas_svd(self):
+        """
+        Notas como o SVD as vê no treino (snapshot_avaliacoes.py):
+        favorito vale 5.0, mas a avaliação do usuário prevalece.
+        """
+        notas = dict.fromkeys(self.favoritos, 5.0)
+        notas.update((tid, float(nota)) for tid, nota in self.notas.items())
+        return notas
+
+    def assinatura(self):
+        """
+        Resumo das interações: muda com qualquer nota, favorito ou
+        remoção (favoritos não têm data, então não basta comparar datas).
+        """
+        conteudo = repr((sorted(self.notas.items()), sorted(self.favoritos)))
+        return hashlib.sha1(conteudo.encode()).hexdigest()[:16]
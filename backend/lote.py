@@ -0,0 +1,233 @@
+"""
+Recomendações em lote para muitos usuários (newsletter, pré-cálculo).
+Em vez de um produto matriz-vetor por requisição, cada bloco de
+usuários vira um produto matriz-matriz (vetores x embeddings e P @ Q.T
+do SVD), com o tamanho do bloco limitado por um orçamento de memória.
+"""
+import csv
+from functools import partial
+import numpy as np
+from sqlalchemy import bindparam, text
+from interacoes import InteracoesUsuario
+from pontuacao import motivos_hibrido, top_k_linhas
+
+TIPOS = ('hibrido', 'colaborativo', 'conteudo')
+
+
+def carregar_interacoes_lote(db_session, user_ids, tam_consulta=1000):
+    """ InteracoesUsuario de cada usuário, uma consulta a cada mil ids. """
+    por_usuario = {uid: InteracoesUsuario(uid, {}, set())
+                   for uid in user_ids}
+    sql = text("""
+        SELECT id_usuario, id_filme, nota, 0 AS favorito
+        FROM avaliacoes WHERE id_usuario IN :ids
+        UNION ALL
+        SELECT id_usuario, id_filme, NULL, 1 AS favorito
+        FROM favoritos WHERE id_usuario IN :ids
+    """).bindparams(bindparam('ids', expanding=True))
+
+    for inicio in range(0, len(user_ids), tam_consulta):
+        ids = list(user_ids[inicio:inicio + tam_consulta])
+        for uid, id_filme, nota, favorito in db_session.execute(
+                sql, {'ids': ids}):
+            if favorito:
+                por_usuario[uid].favoritos.add(id_filme)
+            else:
+                por_usuario[uid].notas[id_filme] = nota
+    return por_usuario
+
+
+class RecomendadorLote:
+    """
+    Mesmas regras das rotas, aplicadas a blocos de usuários:
+    - conteudo: 0.8 * similaridade somada dos curtidos + 0.2 * nota
+      média (como /recomendar/multiplos com os curtidos como sementes);
+    - colaborativo: ranking do SVD com penalidade de popularidade
+      (FatoresSVD.ranquear);
+    - hibrido: fusão NLP + SVD de pontuar_hibrido, com os mesmos pesos
+      por quantidade de interações. Com gerador (GeradorCandidatos), só
+      os candidatos dele entram no ranking, como na rota; sem ele, o
+      catálogo inteiro.
+
+    comunidade: função (id_usuario, k) -> linhas do catálogo, a fonte
+    de comunidade do gerador (ver filmes_da_comunidade).
+    """
+
+    def __init__(self, modelos, memoria_mb=256, gerador=None,
+                 comunidade=None):
+        self.modelos = modelos
+        self.memoria_bytes = memoria_mb * 1024 * 1024
+        self.gerador = gerador
+        self.comunidade = comunidade
+
+    def tamanho_bloco(self, colunas):
+        """ Usuários por bloco: ~3 matrizes float64 (bloco x colunas). """
+        return max(1, int(self.memoria_bytes // (colunas * 8 * 3)))
+
+    def _linhas_catalogo(self, tmdb_ids):
+        indices_map = self.modelos.indices_map
+        return [indices_map[t] for t in tmdb_ids if t in indices_map]
+
+    def _somas_curtidos(self, interacoes):
+        """ Soma dos embeddings curtidos (bloco x d) e quantidades. """
+        embeddings = self.modelos.embeddings
+        somas = np.zeros((len(interacoes), embeddings.shape[1]),
+                         dtype=np.float32)
+        contagens = np.zeros(len(interacoes), dtype=np.int64)
+        for i, inter in enumerate(interacoes):
+            linhas = self._linhas_catalogo(inter.ids_curtidos)
+            if linhas:
+                somas[i] = embeddings[linhas].sum(axis=0)
+                contagens[i] = len(linhas)
+        return somas, contagens
+
+    def _dobrados(self, interacoes):
+        """
+        Fold-in de quem não estava no treino do SVD, só para este bloco:
+        não passa pelo dobrados compartilhado (nem pelo seu limite).
+        """
+        svd = self.modelos.fatores_svd
+        dobrados = {}
+        for inter in interacoes:
+            if inter.user_id not in svd.linha_usuario:
+                dobra = svd.calcular_dobra(inter.notas_svd)
+                if dobra is not None:
+                    dobrados[inter.user_id] = dobra[:2]
+        return dobrados
+
+    def _mascara_vistos(self, interacoes, n, linha_de):
+        mascara = np.zeros((len(interacoes), n), dtype=bool)
+        for i, inter in enumerate(interacoes):
+            linhas = [linha_de[t] for t in inter.ids_vistos if t in linha_de]
+            mascara[i, linhas] = True
+        return mascara
+
+    def _bloco_conteudo(self, interacoes):
+        modelos = self.modelos
+        somas, contagens = self._somas_curtidos(interacoes)
+        scores = 0.8 * (somas @ modelos.embeddings.T) \
+            + 0.2 * modelos.popularidade
+        scores[self._mascara_vistos(
+            interacoes, scores.shape[1], modelos.indices_map)] = -np.inf
+        scores[contagens == 0] = -np.inf
+        return scores, modelos.tmdb_ids, None
+
+    def _bloco_colaborativo(self, interacoes, min_votos=20):
+        svd = self.modelos.fatores_svd
+        user_ids = [inter.user_id for inter in interacoes]
+        est = svd.prever_bloco(user_ids, np.arange(len(svd.tmdb_ids_itens)),
+                               self._dobrados(interacoes))
+        scores = est - 0.2 * np.log10(np.maximum(svd.qtd_votos, 1))
+        scores[:, svd.qtd_votos <= min_votos] = -np.inf
+        scores[self._mascara_vistos(
+            interacoes, scores.shape[1], svd.linha_item)] = -np.inf
+        return scores, svd.tmdb_ids_itens, None
+
+    def _fora_dos_candidatos(self, interacoes, vetores, contagens,
+                             dobrados):
+        """ Máscara (bloco x catálogo) do que o gerador não propôs. """
+        fora = np.ones((len(interacoes), len(self.modelos.tmdb_ids)),
+                       dtype=bool)
+        for i, inter in enumerate(interacoes):
+            if not contagens[i]:
+                continue
+            comunidade = None
+            if self.comunidade is not None:
+                comunidade = partial(self.comunidade, inter.user_id)
+            linhas = self.gerador.gerar(
+                self.modelos, inter.user_id, vetores[i], comunidade,
+                dobrados.get(inter.user_id))
+            fora[i, linhas] = False
+        return fora
+
+    def _bloco_hibrido(self, interacoes):
+        modelos = self.modelos
+        somas, contagens = self._somas_curtidos(interacoes)
+        normas = np.linalg.norm(somas, axis=1, keepdims=True)
+        vetores = somas / np.maximum(normas, 1e-12)
+        scores_nlp = vetores @ modelos.embeddings.T
+
+        dobrados = {}
+        if modelos.fatores_svd is not None:
+            dobrados = self._dobrados(interacoes)
+            est = modelos.fatores_svd.prever_bloco(
+                [inter.user_id for inter in interacoes], modelos.linhas_svd,
+                dobrados)
+            scores_svd = np.clip((est - 1) / 4, 0.0, 1.0)
+        else:
+            scores_svd = np.zeros_like(scores_nlp)
+
+        # mesmos pesos da rota: SVD pesa mais a partir de 10 interações
+        poucas = np.array([len(inter.ids_vistos) < 10
+                           for inter in interacoes])[:, None]
+        peso_nlp = np.where(poucas, 0.7, 0.3)
+        scores = scores_nlp * peso_nlp + scores_svd * (1 - peso_nlp)
+
+        scores[self._mascara_vistos(
+            interacoes, scores.shape[1], modelos.indices_map)] = -np.inf
+        scores[contagens == 0] = -np.inf  # sem histórico: rota dá 404
+        if self.gerador is not None:
+            scores[self._fora_dos_candidatos(
+                interacoes, vetores, contagens, dobrados)] = -np.inf
+        return scores, modelos.tmdb_ids, (scores_nlp, scores_svd)
+
+    def recomendar(self, interacoes_por_usuario, tipo='hibrido', n=10):
+        """
+        Gera (id_usuario, [(tmdb_id, score, motivo), ...]) bloco a bloco;
+        motivo só existe no híbrido (None nos demais).
+        Usuários sem recomendação possível recebem lista vazia.
+        """
+        if tipo not in TIPOS:
+            raise ValueError(f"tipo deve ser um de {TIPOS}")
+        svd = self.modelos.fatores_svd
+        if tipo == 'colaborativo':
+            if svd is None:
+                raise ValueError("modelo colaborativo não carregado")
+            if svd.qtd_votos is None:
+                raise ValueError("votos do SVD não carregados")
+
+        colunas = len(self.modelos.tmdb_ids)
+        if tipo == 'hibrido' and svd is not None:
+            colunas += len(self.modelos.tmdb_ids)
+        elif tipo == 'colaborativo':
+            colunas = len(svd.tmdb_ids_itens)
+        bloco = self.tamanho_bloco(colunas)
+
+        interacoes = list(interacoes_por_usuario.values())
+        pontuar = getattr(self, f'_bloco_{tipo}')
+        for inicio in range(0, len(interacoes), bloco):
+            parte = interacoes[inicio:inicio + bloco]
+            scores, ids_colunas, detalhes = pontuar(parte)
+            melhores = top_k_linhas(scores, n)
+            for i, inter in enumerate(parte):
+                colunas_i = melhores[i][np.isfinite(scores[i, melhores[i]])]
+                motivos = [None] * len(colunas_i)
+                if detalhes is not None:
+                    scores_nlp, scores_svd = detalhes
+                    motivos = motivos_hibrido(
+                        scores_nlp[i, colunas_i],
+                        scores_svd[i, colunas_i]).tolist()
+                yield inter.user_id, [
+                    (int(ids_colunas[j]), round(float(scores[i, j]), 4), m)
+                    for j, m in zip(colunas_i, motivos)]
+
+
+def linhas_resultado(resultados, tipo):
+    """ Achata em dicionários, uma linha por filme recomendado. """
+    for user_id, recomendacoes in resultados:
+        for posicao, (tmdb_id, score, motivo) in enumerate(
+                recomendacoes, start=1):
+            yield {'id_usuario': user_id, 'tipo': tipo, 'posicao': posicao,
+                   'tmdb_id': tmdb_id, 'score': score, 'motivo': motivo}
+
+
+def salvar_csv(caminho, linhas):
+    campos = ['id_usuario', 'tipo', 'posicao', 'tmdb_id', 'score', 'motivo']
+    total = 0
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos)
+        escritor.writeheader()
+        for linha in linhas:
+            escritor.writerow(linha)
+            total += 1
+    return total
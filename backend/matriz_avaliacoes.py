@@ -0,0 +1,201 @@
+"""
+Matriz esparsa usuário x filme com as notas da tabela avaliacoes,
+montada na inicialização, atualizada pelas rotas de escrita e relida
+do banco a cada intervalo_recarga segundos (escritas de outros
+processos do servidor só chegam por essa recarga). Substitui
+as agregações por requisição (GROUP BY sobre avaliacoes) dos caminhos
+de vizinhança: filmes curtidos pelos vizinhos viram uma soma sobre
+fatias de linhas da matriz.
+"""
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text
+
+
+class MatrizAvaliacoes:
+    """
+    Base em CSR (notas em int8) + alterações recentes por usuário. As
+    escritas vão para as alterações; acima de max_alteracoes usuários
+    alterados a base é remontada em memória, sem consultar o banco.
+    """
+
+    def __init__(self, max_alteracoes=1000, intervalo_recarga=600):
+        self.max_alteracoes = max_alteracoes
+        self.intervalo_recarga = intervalo_recarga
+        self.ultima_recarga = 0.0
+        # (csr, linha de cada usuário, tmdb_id de cada coluna), trocado
+        # por inteiro ao remontar
+        self._base = (sparse.csr_matrix((0, 0), dtype=np.int8), {},
+                      np.empty(0, dtype=np.int64))
+        self._alteracoes = {}   # user_id -> {tmdb_id: nota ou None}
+        # alterações feitas durante a leitura do banco, que a recarga
+        # mantém por cima da base nova (None fora de uma recarga)
+        self._durante_recarga = None
+        self._lock = threading.Lock()
+        self._lock_recarga = threading.Lock()  # uma leitura do banco por vez
+
+    def _recarregar(self, db_session):
+        with self._lock:
+            self._durante_recarga = {}
+        try:
+            res = db_session.execute(text(
+                "SELECT id_usuario, id_filme, nota FROM avaliacoes")
+            ).fetchall()
+            usuarios = np.array([r[0] for r in res], dtype=np.int64)
+            filmes = np.array([r[1] for r in res], dtype=np.int64)
+            notas = np.array([r[2] for r in res], dtype=np.int8)
+            base = self._montar(usuarios, filmes, notas)
+            with self._lock:
+                self._base = base
+                self._alteracoes = self._durante_recarga
+        finally:
+            with self._lock:
+                self._durante_recarga = None
+        self.ultima_recarga = time.monotonic()
+        return len(res)
+
+    def carregar(self, db_session):
+        """ Carga completa (início do servidor e recargas periódicas). """
+        with self._lock_recarga:
+            return self._recarregar(db_session)
+
+    def recarregar_se_preciso(self, db_session):
+        """
+        Recarga completa vencida; se outra requisição já está lendo o
+        banco, não espera por ela. True se a base foi trocada.
+        """
+        vencida = self.intervalo_recarga > 0 and \
+            time.monotonic() - self.ultima_recarga > self.intervalo_recarga
+        if not vencida or not self._lock_recarga.acquire(blocking=False):
+            return False
+        try:
+            self._recarregar(db_session)
+            return True
+        finally:
+            self._lock_recarga.release()
+
+    @staticmethod
+    def _montar(usuarios, filmes, notas):
+        ids_usuarios, linhas = np.unique(usuarios, return_inverse=True)
+        ids_filmes, colunas = np.unique(filmes, return_inverse=True)
+        matriz = sparse.csr_matrix(
+            (notas, (linhas, colunas)),
+            shape=(len(ids_usuarios), len(ids_filmes)), dtype=np.int8)
+        linha_usuario = {int(uid): i for i, uid in enumerate(ids_usuarios)}
+        return matriz, linha_usuario, ids_filmes
+
+    def _linha_base(self, base, user_id):
+        matriz, linha_usuario, ids_filmes = base
+        linha = linha_usuario.get(user_id)
+        if linha is None:
+            return {}
+        inicio, fim = matriz.indptr[linha], matriz.indptr[linha + 1]
+        return dict(zip(ids_filmes[matriz.indices[inicio:fim]].tolist(),
+                        matriz.data[inicio:fim].tolist()))
+
+    def notas_usuario(self, user_id):
+        """ tmdb_id -> nota, já com as alterações recentes. """
+        with self._lock:
+            base, alteracoes = self._base, self._alteracoes.get(user_id)
+        notas = self._linha_base(base, user_id)
+        for tmdb_id, nota in (alteracoes or {}).items():
+            if nota is None:
+                notas.pop(tmdb_id, None)
+            else:
+                notas[tmdb_id] = nota
+        return notas
+
+    def registrar(self, user_id, tmdb_id, nota):
+        """ Chamado após gravar (nota) ou remover (None) uma avaliação. """
+        valor = None if nota is None else int(nota)
+        with self._lock:
+            self._alteracoes.setdefault(user_id, {})[int(tmdb_id)] = valor
+            if self._durante_recarga is not None:
+                self._durante_recarga.setdefault(
+                    user_id, {})[int(tmdb_id)] = valor
+            remontar = len(self._alteracoes) > self.max_alteracoes
+        if remontar:
+            self.remontar()
+
+    def remontar(self):
+        """ Incorpora as alterações à base CSR. """
+        with self._lock:
+            base, alteracoes = self._base, self._alteracoes
+            matriz, linha_usuario, ids_filmes = base
+            coo = matriz.tocoo()
+            ids_usuarios = np.empty(len(linha_usuario), dtype=np.int64)
+            for uid, linha in linha_usuario.items():
+                ids_usuarios[linha] = uid
+            manter = ~np.isin(ids_usuarios[coo.row], list(alteracoes))
+            usuarios = [ids_usuarios[coo.row[manter]]]
+            filmes = [ids_filmes[coo.col[manter]]]
+            notas = [coo.data[manter]]
+            for uid in alteracoes:
+                linha = self._linha_base(base, uid)
+                linha.update(alteracoes[uid])
+                linha = {t: n for t, n in linha.items() if n is not None}
+                usuarios.append(np.full(len(linha), uid, dtype=np.int64))
+                filmes.append(np.fromiter(linha, dtype=np.int64))
+                notas.append(np.fromiter(linha.values(), dtype=np.int8))
+            self._base = self._montar(
+                np.concatenate(usuarios), np.concatenate(filmes),
+                np.concatenate(notas))
+            self._alteracoes = {}
+
+    def _curtidos(self, vizinhos, nota_minima):
+        """ (tmdb_ids, notas) das avaliações >= nota_minima dos vizinhos. """
+        with self._lock:
+            base, alteracoes = self._base, dict(self._alteracoes)
+        matriz, linha_usuario, ids_filmes = base
+
+        linhas = [linha_usuario[uid] for uid in vizinhos
+                  if uid in linha_usuario and uid not in alteracoes]
+        fatia = matriz[linhas]
+        curtiu = fatia.data >= nota_minima
+        filmes = [ids_filmes[fatia.indices[curtiu]]]
+        notas = [fatia.data[curtiu].astype(np.int64)]
+
+        for uid in vizinhos:
+            if uid in alteracoes:
+                linha = self.notas_usuario(uid)
+                curtidos = [(t, n) for t, n in linha.items()
+                            if n >= nota_minima]
+                filmes.append(np.array([t for t, _ in curtidos],
+                                       dtype=np.int64))
+                notas.append(np.array([n for _, n in curtidos],
+                                      dtype=np.int64))
+        return np.concatenate(filmes), np.concatenate(notas)
+
+    def mais_curtidos(self, vizinhos, k=10, excluir=(), nota_minima=4):
+        """
+        Filmes com nota >= nota_minima entre os vizinhos, ordenados por
+        quantos vizinhos curtiram e depois pela média dessas notas (mesma
+        ordem do antigo GROUP BY ... ORDER BY freq DESC, AVG(nota) DESC);
+        empates finais por tmdb_id.
+        """
+        vizinhos = list(dict.fromkeys(int(uid) for uid in vizinhos))
+        filmes, notas = self._curtidos(vizinhos, nota_minima)
+        if filmes.size == 0:
+            return []
+        ids, posicoes = np.unique(filmes, return_inverse=True)
+        freq = np.bincount(posicoes)
+        media = np.bincount(posicoes, weights=notas) / freq
+
+        validos = ~np.isin(ids, list(excluir))
+        ids, freq, media = ids[validos], freq[validos], media[validos]
+        ordem = np.lexsort((ids, -media, -freq))[:k]
+        return ids[ordem].tolist()
+
+    def estatisticas(self):
+        with self._lock:
+            matriz, linha_usuario, ids_filmes = self._base
+            return {
+                'usuarios': len(linha_usuario),
+                'filmes': len(ids_filmes),
+                'avaliacoes': int(matriz.nnz),
+                'usuarios_alterados': len(self._alteracoes),
+                'segundos_desde_recarga': round(
+                    time.monotonic() - self.ultima_recarga, 1)
+            }
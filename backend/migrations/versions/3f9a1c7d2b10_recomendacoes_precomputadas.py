@@ -0,0 +1,41 @@
+"""tabela recomendacoes_precomputadas
+
+As demais tabelas vêm do dump inicial do banco (postgres_init).
+
+Revision ID: 3f9a1c7d2b10
+Revises:
+Create Date: 2026-10-18 16:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # versões anteriores criavam a tabela na inicialização do servidor
+    if sa.inspect(op.get_bind()).has_table('recomendacoes_precomputadas'):
+        return
+    op.create_table(
+        'recomendacoes_precomputadas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('id_usuario', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=20), nullable=False),
+        sa.Column('itens', sa.JSON(), nullable=False),
+        sa.Column('assinatura', sa.String(length=16), nullable=False),
+        sa.Column('versao_modelos', sa.String(length=255), nullable=False),
+        sa.Column('gerado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id_usuario', 'tipo', name='uq_usuario_tipo')
+    )
+
+
+def downgrade():
+    op.drop_table('recomendacoes_precomputadas')
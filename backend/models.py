@@ -65,3 +65,21 @@ class Avaliacao(db.Model):
 
     def __repr__(self):
         return f'<Avaliacao usuario={self.id_usuario} Filme={self.id_filme} Nota={self.nota}>'
+
+
+class RecomendacaoPrecomputada(db.Model):
+    __tablename__ = 'recomendacoes_precomputadas'
+    id = db.Column(db.Integer, primary_key=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id'),
+                           nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)
+    itens = db.Column(db.JSON, nullable=False)
+    assinatura = db.Column(db.String(16), nullable=False)
+    versao_modelos = db.Column(db.String(255), nullable=False)
+    gerado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('id_usuario', 'tipo',
+                                          name='uq_usuario_tipo'),)
+
+    def __repr__(self):
+        return f'<RecomendacaoPrecomputada usuario={self.id_usuario} tipo={self.tipo}>'
@@ -0,0 +1,163 @@
+import numpy as np
+
+
+def top_k(scores, k, mascara=None):
+    """
+    Índices dos k maiores scores em ordem decrescente.
+    Acha o k-ésimo maior score com partition (O(n)) e só ordena os k
+    escolhidos; empates mantêm a ordem original dos índices, igual ao
+    sorted() estável de antes, inclusive no corte (entre empatados no
+    k-ésimo score ficam os de menor índice).
+    mascara: array booleano, True = excluir o índice.
+    """
+    scores = np.asarray(scores)
+    if mascara is not None:
+        scores = np.where(mascara, -np.inf, scores)
+
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < n:
+        limiar = -np.partition(-scores, k - 1)[k - 1]
+        acima = np.flatnonzero(scores > limiar)
+        empatados = np.flatnonzero(scores == limiar)[:k - acima.size]
+        escolhidos = np.concatenate((acima, empatados))
+        escolhidos.sort()
+    else:
+        escolhidos = np.arange(n)
+
+    ordem = np.argsort(-scores[escolhidos], kind='stable')
+    escolhidos = escolhidos[ordem]
+
+    return escolhidos[np.isfinite(scores[escolhidos])]
+
+
+def top_k_linhas(scores, k):
+    """
+    top_k() para cada linha de uma matriz (usuários x filmes) de uma vez.
+    Retorna uma matriz (linhas, k) de índices em ordem decrescente;
+    entradas -inf (excluídas) ficam no fim e devem ser descartadas.
+    Empates no corte seguem a mesma regra de top_k(): menor índice.
+    """
+    scores = np.asarray(scores)
+    b, n = scores.shape
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((b, 0), dtype=np.int64)
+
+    if k < n:
+        limiar = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+        acima = scores > limiar
+        empatados = scores == limiar
+        falta = k - acima.sum(axis=1, keepdims=True)
+        marcados = acima | (empatados
+                            & (np.cumsum(empatados, axis=1) <= falta))
+        escolhidos = np.nonzero(marcados)[1].reshape(b, k)
+    else:
+        escolhidos = np.tile(np.arange(n), (b, 1))
+
+    valores = np.take_along_axis(scores, escolhidos, axis=1)
+    ordem = np.argsort(-valores, axis=1, kind='stable')
+    return np.take_along_axis(escolhidos, ordem, axis=1)
+
+
+def preparar_popularidade(tmdb_ids, meta_por_id):
+    """
+    media_votos/10 alinhado com tmdb_ids (mesma ordem dos embeddings).
+    Filmes sem metadata recebem nota 5, como no cálculo antigo.
+    """
+    medias = []
+    for tmdb_id in tmdb_ids:
+        meta = meta_por_id.get(tmdb_id, {"media_votos": 5})
+        medias.append(meta["media_votos"])
+    return np.asarray(medias, dtype=np.float64) / 10
+
+
+def pontuar_multiplos(indices_sementes, embeddings, popularidade,
+                      k=30, alpha=0.8, beta=0.2, indice=None,
+                      n_candidatos=500):
+    """
+    Similaridade somada de todas as sementes em um único produto matricial.
+    Os embeddings já são normalizados (comprimento 1), então o produto
+    escalar é a similaridade de cossenos.
+    Com um índice aproximado, só os n_candidatos mais similares são
+    pontuados com a popularidade.
+    Retorna os índices do catálogo ordenados pelo score final.
+    """
+    indices_sementes = np.asarray(indices_sementes, dtype=np.int64)
+    if indices_sementes.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    vetor_sementes = embeddings[indices_sementes].sum(axis=0)
+
+    if indice is None or indice.tipo == 'exato':
+        candidatos = np.arange(embeddings.shape[0])
+        similaridade = embeddings @ vetor_sementes
+    else:
+        candidatos, similaridade = indice.buscar(
+            vetor_sementes, n_candidatos + indices_sementes.size)
+
+    scores = alpha * similaridade + beta * popularidade[candidatos]
+    mascara = np.isin(candidatos, indices_sementes)
+
+    return candidatos[top_k(scores, k, mascara)]
+
+
+def pontuar_multiplos_vizinhos(indices_sementes, vizinhos_indices,
+                               vizinhos_scores, popularidade, k=30,
+                               alpha=0.8, beta=0.2):
+    """
+    Mesmo score de pontuar_multiplos, mas somando as listas de vizinhos
+    pré-calculadas no treinamento: O(sementes x K) em vez de O(sementes x
+    catálogo). Um filme fora da lista de uma semente conta similaridade 0
+    para ela, então só entram candidatos vizinhos de alguma semente.
+    Sementes repetidas contam uma vez cada, como em pontuar_multiplos.
+    """
+    indices_sementes = np.asarray(indices_sementes, dtype=np.int64)
+    if indices_sementes.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    vizinhos = np.asarray(vizinhos_indices[indices_sementes]).ravel()
+    similaridades = np.asarray(
+        vizinhos_scores[indices_sementes], dtype=np.float32).ravel()
+    candidatos, posicoes = np.unique(vizinhos, return_inverse=True)
+    similaridade = np.bincount(posicoes, weights=similaridades,
+                               minlength=candidatos.size)
+
+    scores = alpha * similaridade + beta * popularidade[candidatos]
+    mascara = np.isin(candidatos, indices_sementes)
+
+    return candidatos[top_k(scores, k, mascara)].astype(np.int64)
+
+
+def motivos_hibrido(scores_nlp, scores_svd):
+    """ Texto exibido com cada recomendação híbrida. """
+    return np.where(
+        scores_svd > 0.8, "Alta probabilidade de gostar",
+        np.where(scores_nlp > 0.8, "Semelhante ao que você curte",
+                 "Recomendação Equilibrada"))
+
+
+def pontuar_hibrido(candidatos, scores_nlp, estimativas_svd, vistos,
+                    peso_nlp, peso_svd, k=15):
+    """
+    Fusão NLP + SVD em arrays alinhados com candidatos (índices do
+    catálogo). A nota do SVD é normalizada para 0..1 ((nota - 1) / 4);
+    sem SVD ela vale 0. vistos: máscara booleana dos já avaliados.
+    Retorna (indices, score_final, score_nlp, score_svd, motivos) do top k.
+    """
+    candidatos = np.asarray(candidatos)
+    scores_nlp = np.asarray(scores_nlp, dtype=np.float64)
+    if estimativas_svd is None:
+        scores_svd = np.zeros_like(scores_nlp)
+    else:
+        scores_svd = np.clip((estimativas_svd - 1) / 4, 0.0, 1.0)
+
+    score_final = scores_nlp * peso_nlp + scores_svd * peso_svd
+    melhores = top_k(score_final, k, vistos)
+
+    motivos = motivos_hibrido(scores_nlp[melhores], scores_svd[melhores])
+
+    return (candidatos[melhores], score_final[melhores],
+            scores_nlp[melhores], scores_svd[melhores], motivos)
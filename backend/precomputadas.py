@@ -0,0 +1,255 @@
+"""
+Tabela recomendacoes_precomputadas: resultados do híbrido e do
+colaborativo gerados em lote (job noturno) e servidos pelas rotas
+enquanto continuam válidos. Uma linha é válida se foi gerada com a
+versão atual dos modelos, dentro da validade, e se a assinatura das
+interações do usuário não mudou desde então; senão a rota calcula ao
+vivo.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from candidatos import GeradorCandidatos
+from lote import RecomendadorLote, carregar_interacoes_lote
+from models import RecomendacaoPrecomputada, Usuario
+from registro_modelos import carregar_modelos
+
+# modelos de cada processo do pool, carregados por _iniciar_processo
+_modelos_job = None
+
+
+def buscar_precomputada(db_session, user_id, tipo, interacoes, versao,
+                        validade_horas=24):
+    """ Itens guardados para o usuário, ou None se não valem mais. """
+    try:
+        linha = db_session.query(RecomendacaoPrecomputada).filter_by(
+            id_usuario=user_id, tipo=tipo).first()
+    except Exception:
+        db_session.rollback()  # tabela ainda não criada
+        return None
+    if linha is None:
+        return None
+    if linha.versao_modelos != versao \
+            or linha.assinatura != interacoes.assinatura():
+        return None
+    if linha.gerado_em < datetime.utcnow() - timedelta(hours=validade_horas):
+        return None
+    return linha.itens
+
+
+def _iniciar_processo(base_dir, versao, qtd_votos, reg_dobra):
+    """
+    Processo novo (spawn): lê do disco a mesma versão dos modelos, com
+    os votos e a regularização do fold-in do processo principal.
+    """
+    global _modelos_job
+    modelos = carregar_modelos(base_dir)
+    if modelos.versao != versao:
+        raise RuntimeError("modelos em disco mudaram durante o pré-cálculo")
+    if modelos.fatores_svd is not None:
+        modelos.fatores_svd.qtd_votos = qtd_votos
+        modelos.fatores_svd.reg_dobra = reg_dobra
+    _modelos_job = modelos
+
+
+def _pontuar_parte(args, modelos=None):
+    """
+    args: (interações, tipo, n, memoria_mb, k_candidatos, comunidade),
+    com k_candidatos = (k_conteudo, k_svd, k_comunidade) ou None e as
+    linhas de comunidade de cada usuário já calculadas (dict).
+    """
+    interacoes, tipo, n, memoria_mb, k_candidatos, comunidade = args
+    gerador = None
+    if k_candidatos is not None:
+        gerador = GeradorCandidatos(*k_candidatos)
+    recomendador = RecomendadorLote(
+        modelos or _modelos_job, memoria_mb=memoria_mb, gerador=gerador,
+        comunidade=lambda user_id, k: comunidade.get(user_id, []))
+    return list(recomendador.recomendar(interacoes, tipo, n))
+
+
+class JobPrecomputacao:
+    """
+    Gera as linhas da tabela para todos os usuários: carrega as
+    interações em lote, divide os usuários em partes e pontua cada parte
+    com o RecomendadorLote. Com base_dir (comando flask), as partes vão
+    para um pool de processos iniciados com spawn, que carregam os
+    modelos do disco; no servidor (rota /admin ou intervalo), que tem
+    outras threads, as partes rodam em série na thread do job.
+
+    Híbrido: top 15 com motivo entre os candidatos de gerador (os
+    mesmos k da rota), para que a linha guardada seja a resposta que a
+    rota daria; comunidade(modelos, id_usuario, k) fornece a fonte de
+    comunidade, calculada neste processo (o armazém de vetores e a
+    matriz de avaliações não vão para o pool). Sem gerador, o catálogo
+    inteiro.
+    Colaborativo: só usuários com 12+ interações (caminho do SVD na
+    rota), top 20 do ranking; a diversificação por gênero fica para
+    quem serve (pos_colaborativo).
+    """
+
+    def __init__(self, processos=2, tam_parte=500, memoria_mb=256,
+                 gerador=None, comunidade=None):
+        self.processos = processos
+        self.tam_parte = tam_parte
+        self.gerador = gerador
+        self.comunidade = comunidade
+        self.memoria_mb = memoria_mb
+        self.estado = 'parado'
+        self.usuarios = 0
+        self.linhas = 0
+        self.segundos = None
+        self.ultima_execucao = None
+        self.erro = None
+        self._lock = threading.Lock()
+
+    def _candidatos(self, modelos, parte, tipo):
+        """ (k_candidatos, comunidade por usuário) de uma parte. """
+        if tipo != 'hibrido' or self.gerador is None:
+            return None, {}
+        gerador = self.gerador
+        comunidade = {}
+        if self.comunidade is not None and gerador.k_comunidade > 0:
+            comunidade = {
+                user_id: list(self.comunidade(
+                    modelos, user_id, gerador.k_comunidade))
+                for user_id in parte}
+        return (gerador.k_conteudo, gerador.k_svd,
+                gerador.k_comunidade), comunidade
+
+    def _pontuar(self, modelos, partes, tipo, n, base_dir=None):
+        args = [(parte, tipo, n, self.memoria_mb)
+                + self._candidatos(modelos, parte, tipo)
+                for parte in partes]
+        if base_dir and self.processos > 1 and len(partes) > 1:
+            svd = modelos.fatores_svd
+            with ProcessPoolExecutor(
+                    min(self.processos, len(partes)),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_processo,
+                    initargs=(base_dir, modelos.versao,
+                              svd.qtd_votos if svd else None,
+                              svd.reg_dobra if svd else None)) as pool:
+                for resultado in pool.map(_pontuar_parte, args):
+                    yield from resultado
+        else:
+            for arg in args:
+                yield from _pontuar_parte(arg, modelos)
+
+    def _gravar(self, db_session, tipo, resultados, assinaturas, versao,
+                pos=None):
+        """ Substitui as linhas dos usuários; retorna quantas gravou. """
+        ids = [user_id for user_id, _ in resultados]
+        db_session.query(RecomendacaoPrecomputada).filter(
+            RecomendacaoPrecomputada.tipo == tipo,
+            RecomendacaoPrecomputada.id_usuario.in_(ids)
+        ).delete(synchronize_session=False)
+        agora = datetime.utcnow()
+        novas = [{
+            'id_usuario': user_id,
+            'tipo': tipo,
+            'itens': pos(itens) if pos else itens,
+            'assinatura': assinaturas[user_id],
+            'versao_modelos': versao,
+            'gerado_em': agora
+        } for user_id, itens in resultados if itens]
+        db_session.bulk_insert_mappings(RecomendacaoPrecomputada, novas)
+        db_session.commit()
+        return len(novas)
+
+    def executar(self, db_session, modelos, pos_colaborativo=None,
+                 user_ids=None, base_dir=None):
+        """
+        pos_colaborativo: função itens -> itens finais (ex.: gêneros).
+        base_dir: diretório dos modelos para o pool de processos (só em
+        processos sem outras threads, como o comando flask).
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.estado = 'executando'
+        self.erro = None
+        inicio = time.monotonic()
+        try:
+            if user_ids is None:
+                user_ids = [u.id for u in db_session.query(Usuario.id).all()]
+            interacoes = carregar_interacoes_lote(db_session, user_ids)
+            assinaturas = {uid: inter.assinatura()
+                           for uid, inter in interacoes.items()}
+            self.usuarios = len(user_ids)
+            self.linhas = 0
+
+            trabalhos = [('hibrido', 15, interacoes, None)]
+            if modelos.fatores_svd is not None \
+                    and modelos.fatores_svd.qtd_votos is not None:
+                com_historico = {uid: inter
+                                 for uid, inter in interacoes.items()
+                                 if inter.total >= 12}
+                trabalhos.append(('colaborativo', 20, com_historico,
+                                  pos_colaborativo))
+
+            for tipo, n, por_usuario, pos in trabalhos:
+                lista = list(por_usuario.values())
+                partes = [
+                    {i.user_id: i for i in lista[k:k + self.tam_parte]}
+                    for k in range(0, len(lista), self.tam_parte)]
+                resultados = []
+                for user_id, itens in self._pontuar(modelos, partes, tipo,
+                                                    n, base_dir):
+                    resultados.append((user_id, [
+                        {'tmdb_id': tid, 'score': score, 'motivo': motivo}
+                        for tid, score, motivo in itens]))
+                    if len(resultados) >= self.tam_parte:
+                        self.linhas += self._gravar(
+                            db_session, tipo, resultados, assinaturas,
+                            modelos.versao, pos)
+                        resultados = []
+                if resultados:
+                    self.linhas += self._gravar(
+                        db_session, tipo, resultados, assinaturas,
+                        modelos.versao, pos)
+
+            self.estado = 'concluido'
+            self.ultima_execucao = datetime.utcnow().strftime(
+                "%Y-%m-%d %H:%M:%S")
+            return True
+        except Exception as e:
+            db_session.rollback()
+            self.estado = 'erro'
+            self.erro = str(e)
+            print(f"Erro ao pré-calcular recomendações: {e}")
+            return False
+        finally:
+            self.segundos = round(time.monotonic() - inicio, 2)
+            self._lock.release()
+
+    def iniciar_em_segundo_plano(self, app, db, obter_modelos,
+                                 pos_colaborativo=None, intervalo_horas=0):
+        """
+        Roda uma vez, ou a cada intervalo_horas (job noturno) se > 0.
+        obter_modelos: função que devolve a versão ativa dos modelos.
+        """
+        def alvo():
+            while True:
+                with app.app_context():
+                    self.executar(db.session, obter_modelos(),
+                                  pos_colaborativo)
+                if intervalo_horas <= 0:
+                    return
+                time.sleep(intervalo_horas * 3600)
+
+        thread = threading.Thread(target=alvo, name='precomputacao',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            'estado': self.estado,
+            'usuarios': self.usuarios,
+            'linhas': self.linhas,
+            'segundos': self.segundos,
+            'ultima_execucao': self.ultima_execucao,
+            'erro': self.erro
+        }
@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+import joblib
+import numpy as np
+import artefatos
+from fatores_svd import FatoresSVD
+from indice_ann import criar_indice
+from pontuacao import preparar_popularidade
+
+
+class Modelos:
+    """
+    Uma versão completa dos modelos carregados. Nunca é alterada depois
+    de publicada: o registro troca a referência inteira, então uma
+    requisição que leu registro.atual termina na mesma versão.
+    """
+
+    def __init__(self, base_dir, conteudo, fatores_svd, versao):
+        self.versao = versao
+        self.embeddings = conteudo['embeddings']
+        self.nome_modelo = conteudo.get('model_name')
+        self.tmdb_ids = conteudo['tmdb_ids']
+        self.indices_map = {tid: i for i, tid in enumerate(self.tmdb_ids)}
+        self.meta_por_id = {m["tmdb_id"]: m for m in conteudo["metadata"]}
+        self.popularidade = preparar_popularidade(
+            self.tmdb_ids, self.meta_por_id)
+        # top-K vizinhos de cada filme, gerados no treinamento (opcional)
+        self.vizinhos_indices = conteudo.get('vizinhos_indices')
+        self.vizinhos_scores = conteudo.get('vizinhos_scores')
+        self.indice = criar_indice(
+            self.embeddings,
+            os.path.join(base_dir, 'modelo_recomendacao.ivf.npz'))
+        self.fatores_svd = fatores_svd
+        # linha de cada filme do catálogo de conteúdo nos fatores do SVD
+        self.linhas_svd = (fatores_svd.linhas_itens(self.tmdb_ids)
+                           if fatores_svd else None)
+        # caminho inverso: item do SVD -> linha do catálogo (-1 se ausente)
+        self.linhas_catalogo_svd = None
+        if fatores_svd:
+            self.linhas_catalogo_svd = np.full(
+                len(fatores_svd.tmdb_ids_itens), -1, dtype=np.int64)
+            presentes = np.flatnonzero(self.linhas_svd >= 0)
+            self.linhas_catalogo_svd[self.linhas_svd[presentes]] = presentes
+
+        # preenchidos por quem carrega (ver apy.preparar_modelos)
+        self.armazem = None
+        self.aquecimento = None
+
+    def validar(self):
+        n, _ = self.embeddings.shape
+        if n != len(self.tmdb_ids):
+            raise ValueError("embeddings e tmdb_ids com tamanhos diferentes")
+        if len(self.indices_map) != n:
+            raise ValueError("tmdb_ids duplicados no modelo de conteúdo")
+        if not np.isfinite(self.embeddings[:min(n, 1000)]).all():
+            raise ValueError("embeddings com valores não finitos")
+        if self.vizinhos_indices is not None:
+            if self.vizinhos_indices.shape[0] != n \
+                    or self.vizinhos_scores.shape \
+                    != self.vizinhos_indices.shape:
+                raise ValueError("tabela de vizinhos inconsistente")
+        svd = self.fatores_svd
+        if svd is not None:
+            if svd.qi.shape[0] != len(svd.tmdb_ids_itens) \
+                    or svd.pu.shape[0] != len(svd.linha_usuario) \
+                    or svd.pu.shape[1] != svd.qi.shape[1]:
+                raise ValueError("fatores do SVD inconsistentes")
+
+
+def versao_em_disco(base_dir):
+    """
+    Identifica os modelos presentes em disco: versão/data do manifesto dos
+    artefatos, ou data de modificação dos .pkl.
+    """
+    partes = []
+    for diretorio, pkl in ((artefatos.DIR_CONTEUDO, 'modelo_recomendacao.pkl'),
+                           (artefatos.DIR_COLABORATIVO,
+                            'modelo_colaborativo.pkl')):
+        caminho = os.path.join(base_dir, diretorio)
+        if os.path.isdir(caminho):
+            manifesto = artefatos.ler_manifesto(caminho)
+            partes.append(f"{manifesto['version']}@{manifesto['date']}")
+        elif os.path.exists(os.path.join(base_dir, pkl)):
+            modificado = os.path.getmtime(os.path.join(base_dir, pkl))
+            partes.append(f"pkl@{modificado}")
+        else:
+            partes.append("-")
+    return "|".join(partes)
+
+
+def carregar_modelos(base_dir):
+    """ Diretórios de artefato (mmap) têm preferência aos .pkl. """
+    versao = versao_em_disco(base_dir)
+
+    dir_conteudo = os.path.join(base_dir, artefatos.DIR_CONTEUDO)
+    if os.path.isdir(dir_conteudo):
+        conteudo = artefatos.carregar_conteudo(dir_conteudo)
+    else:
+        conteudo = joblib.load(
+            os.path.join(base_dir, 'modelo_recomendacao.pkl'))
+
+    fatores_svd = None
+    dir_colab = os.path.join(base_dir, artefatos.DIR_COLABORATIVO)
+    if os.path.isdir(dir_colab):
+        fatores_svd = FatoresSVD.do_artefato(
+            artefatos.carregar_colaborativo(dir_colab))
+    else:
+        algo_svd = joblib.load(
+            os.path.join(base_dir, 'modelo_colaborativo.pkl')).get('model')
+        if algo_svd:
+            fatores_svd = FatoresSVD.do_surprise(algo_svd)
+
+    modelos = Modelos(base_dir, conteudo, fatores_svd, versao)
+    modelos.validar()
+    return modelos
+
+
+class RegistroModelos:
+    """
+    Guarda a versão ativa dos modelos e troca por uma nova sem reiniciar
+    o servidor. A nova versão é carregada, validada e preparada
+    (preparar(modelos), ex.: votos e perfis de usuário) fora do caminho
+    das requisições; só então a referência é trocada e publicado(modelos)
+    é chamado (ex.: descartar resultados em cache da versão anterior).
+
+    Escritas feitas durante a preparação só chegam à versão antiga:
+    quem escreve avisa com registrar_escrita(user_id) e, logo antes da
+    troca, descartar(modelos, user_ids) tira da versão nova o que foi
+    montado com o retrato anterior a essas escritas.
+    """
+
+    def __init__(self, base_dir, preparar=None, publicado=None,
+                 descartar=None):
+        self.base_dir = base_dir
+        self.preparar = preparar
+        self.publicado = publicado
+        self.descartar = descartar
+        self._atual = None
+        self._lock = threading.Lock()
+        # usuários com escritas durante a recarga (None fora dela)
+        self._escritas = None
+        self._lock_troca = threading.Lock()
+        self.recarregando = False
+        self.ultima_troca = None
+        self.ultimo_erro = None
+        self.versao_com_erro = None
+
+    @property
+    def atual(self):
+        return self._atual
+
+    def registrar_escrita(self, user_id):
+        """
+        Chamado depois do commit de uma escrita do usuário. Retorna a
+        versão em que aplicar a escrita: se a troca vier depois, o
+        usuário é descartado da versão nova.
+        """
+        with self._lock_troca:
+            if self._escritas is not None:
+                self._escritas.add(user_id)
+            return self._atual
+
+    def publicar(self, modelos):
+        with self._lock_troca:
+            escritas, self._escritas = self._escritas, None
+            if escritas and self.descartar:
+                self.descartar(modelos, escritas)
+            self._atual = modelos
+        self.ultima_troca = time.strftime("%Y-%m-%d %H:%M:%S")
+        if self.publicado:
+            self.publicado(modelos)
+
+    def recarregar(self):
+        """ Retorna True se uma nova versão foi publicada. """
+        if not self._lock.acquire(blocking=False):
+            return False  # já existe uma recarga em andamento
+        self.recarregando = True
+        with self._lock_troca:
+            self._escritas = set()
+        try:
+            novos = carregar_modelos(self.base_dir)
+            if self.preparar:
+                self.preparar(novos)
+            self.publicar(novos)
+            self.ultimo_erro = None
+            print(f"--- Modelos trocados para a versão {novos.versao} ---")
+            return True
+        except Exception as e:
+            self.ultimo_erro = str(e)
+            try:
+                self.versao_com_erro = versao_em_disco(self.base_dir)
+            except Exception:
+                self.versao_com_erro = None
+            print(f"Erro ao recarregar modelos, mantendo a versão atual: {e}")
+            return False
+        finally:
+            with self._lock_troca:
+                self._escritas = None
+            self.recarregando = False
+            self._lock.release()
+
+    def recarregar_em_segundo_plano(self, app=None):
+        def alvo():
+            if app is None:
+                self.recarregar()
+                return
+            with app.app_context():
+                self.recarregar()
+
+        thread = threading.Thread(target=alvo, name='recarga-modelos',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def observar(self, intervalo, app=None):
+        """ Verifica o disco a cada intervalo segundos e recarrega. """
+        def alvo():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    em_disco = versao_em_disco(self.base_dir)
+                except Exception:
+                    continue  # artefato sendo escrito
+                if em_disco == self.versao_com_erro:
+                    continue
+                if self._atual is None or em_disco != self._atual.versao:
+                    if app is None:
+                        self.recarregar()
+                    else:
+                        with app.app_context():
+                            self.recarregar()
+
+        thread = threading.Thread(target=alvo, name='observa-modelos',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        atual = self._atual
+        return {
+            'versao': atual.versao if atual else None,
+            'versao_em_disco': versao_em_disco(self.base_dir),
+            'filmes': len(atual.tmdb_ids) if atual else 0,
+            'svd': atual is not None and atual.fatores_svd is not None,
+            'recarregando': self.recarregando,
+            'ultima_troca': self.ultima_troca,
+            'ultimo_erro': self.ultimo_erro
+        }
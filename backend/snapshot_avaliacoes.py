@@ -0,0 +1,239 @@
+"""
+Snapshot das notas usadas pelo treino colaborativo, no mesmo formato de
+diretório dos artefatos (.npy + manifesto.json, ver artefatos.py):
+MovieLens (usuários + 1.000.000, só filmes do catálogo), avaliações
+locais e favoritos como nota 5.0 (a avaliação vale mais que o favorito
+no mesmo filme). Usuários e filmes são codificados em inteiros e as
+notas ficam em COO (linhas, colunas, notas, origens).
+
+Depois da primeira carga, atualizar() só lê do banco as avaliações com
+data_avaliacao depois da marca d'água; favoritos não têm data e são
+relidos inteiros. Se o total de avaliações não bater (remoções), as
+avaliações locais são relidas, sem reler o MovieLens.
+
+    flask --app apy snapshot-avaliacoes [--completo]
+"""
+import csv
+import os
+import time
+from datetime import datetime
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text
+import artefatos
+
+DIR_SNAPSHOT = 'snapshot_avaliacoes'
+OFFSET_MOVIELENS = 1000000
+ORIGEM_MOVIELENS = 0
+ORIGEM_AVALIACAO = 1
+ORIGEM_FAVORITO = 2
+
+
+def ler_movielens(caminho_ratings, caminho_links, ids_filmes):
+    """ (usuarios, filmes, notas) do MovieLens com o offset aplicado. """
+    tmdb_por_movie = {}
+    with open(caminho_links, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            if linha['tmdbId']:
+                tmdb_por_movie[linha['movieId']] = int(float(linha['tmdbId']))
+
+    vistos = set()
+    usuarios, filmes, notas = [], [], []
+    with open(caminho_ratings, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            tmdb_id = tmdb_por_movie.get(linha['movieId'])
+            if tmdb_id is None or tmdb_id not in ids_filmes:
+                continue
+            usuario = int(linha['userId']) + OFFSET_MOVIELENS
+            if (usuario, tmdb_id) in vistos:
+                continue  # dois movieId com o mesmo tmdbId
+            vistos.add((usuario, tmdb_id))
+            usuarios.append(usuario)
+            filmes.append(tmdb_id)
+            notas.append(float(linha['rating']))
+    return (np.array(usuarios, dtype=np.int64),
+            np.array(filmes, dtype=np.int64),
+            np.array(notas, dtype=np.float32))
+
+
+def _codificar(ids, conhecidos):
+    """
+    Códigos inteiros dos ids, mantendo os códigos já existentes e
+    acrescentando os novos no fim. Retorna (códigos, todos os ids).
+    """
+    novos = np.setdiff1d(ids, conhecidos)
+    todos = np.concatenate([conhecidos, novos]).astype(np.int64)
+    ordem = np.argsort(todos, kind='stable')
+    posicoes = np.searchsorted(todos[ordem], ids)
+    return ordem[posicoes].astype(np.int32), todos
+
+
+class SnapshotAvaliacoes:
+    """
+    Notas em COO com usuários/filmes codificados. csr() monta a matriz
+    usuário x filme; dataframe() devolve o formato do treinamento
+    (id_usuario, tmdb_id, nota).
+    """
+
+    def __init__(self, linhas, colunas, notas, origens, ids_usuarios,
+                 ids_itens, marca_dagua=None, info=None):
+        self.linhas = linhas
+        self.colunas = colunas
+        self.notas = notas
+        self.origens = origens
+        self.ids_usuarios = ids_usuarios
+        self.ids_itens = ids_itens
+        self.marca_dagua = marca_dagua
+        self.info = info or {}
+
+    def __len__(self):
+        return len(self.notas)
+
+    @classmethod
+    def montar(cls, usuarios, filmes, notas, origens, marca_dagua=None,
+               anterior=None, info=None):
+        """ A partir dos ids; anterior mantém os códigos já usados. """
+        vazio = np.empty(0, dtype=np.int64)
+        linhas, ids_usuarios = _codificar(
+            usuarios, anterior.ids_usuarios if anterior else vazio)
+        colunas, ids_itens = _codificar(
+            filmes, anterior.ids_itens if anterior else vazio)
+        return cls(linhas, colunas, np.asarray(notas, dtype=np.float32),
+                   np.asarray(origens, dtype=np.int8), ids_usuarios,
+                   ids_itens, marca_dagua, info)
+
+    @classmethod
+    def construir(cls, conexao, caminho_ratings, caminho_links):
+        """ Carga completa: MovieLens + banco. """
+        ids_filmes = {row[0] for row in conexao.execute(
+            text("SELECT tmdb_id FROM filmes"))}
+        ml = ler_movielens(caminho_ratings, caminho_links, ids_filmes)
+        return cls._com_locais(conexao, ml, {})
+
+    @classmethod
+    def _com_locais(cls, conexao, ml, avaliacoes, marca_dagua=None,
+                    anterior=None):
+        """
+        Junta o MovieLens (já lido) às notas locais: avaliacoes é o dict
+        (usuário, filme) -> nota já conhecido; as mais novas que a marca
+        d'água e os favoritos vêm do banco.
+        """
+        incremental = marca_dagua is not None
+        filtro = "WHERE data_avaliacao > :marca" if incremental else ""
+        res = conexao.execute(text(f"""
+            SELECT id_usuario, id_filme, nota, data_avaliacao
+            FROM avaliacoes {filtro}
+        """), {'marca': marca_dagua} if incremental else {}).fetchall()
+        for id_usuario, id_filme, nota, data in res:
+            avaliacoes[(id_usuario, id_filme)] = float(nota)
+            if data is not None:
+                if isinstance(data, str):
+                    data = datetime.fromisoformat(data)
+                marca_dagua = max(marca_dagua, data) if marca_dagua else data
+
+        total = conexao.execute(
+            text("SELECT COUNT(*) FROM avaliacoes")).scalar()
+        if incremental and total != len(avaliacoes):
+            # remoções não aparecem pela marca d'água: relê as locais
+            return cls._com_locais(conexao, ml, {}, None, anterior)
+
+        favoritos = [(u, f) for u, f in conexao.execute(text(
+            "SELECT id_usuario, id_filme FROM favoritos"))
+            if (u, f) not in avaliacoes]
+
+        pares_locais = list(avaliacoes) + favoritos
+        usuarios = np.concatenate([
+            ml[0], np.array([u for u, _ in pares_locais], dtype=np.int64)])
+        filmes = np.concatenate([
+            ml[1], np.array([f for _, f in pares_locais], dtype=np.int64)])
+        notas = np.concatenate([
+            ml[2], np.array(list(avaliacoes.values()), dtype=np.float32),
+            np.full(len(favoritos), 5.0, dtype=np.float32)])
+        origens = np.concatenate([
+            np.full(len(ml[0]), ORIGEM_MOVIELENS, dtype=np.int8),
+            np.full(len(avaliacoes), ORIGEM_AVALIACAO, dtype=np.int8),
+            np.full(len(favoritos), ORIGEM_FAVORITO, dtype=np.int8)])
+        return cls.montar(
+            usuarios, filmes, notas, origens,
+            marca_dagua.isoformat() if marca_dagua else None, anterior)
+
+    def atualizar(self, conexao):
+        """ Novo snapshot com o que mudou no banco desde a marca d'água. """
+        usuarios = self.ids_usuarios[self.linhas]
+        filmes = self.ids_itens[self.colunas]
+        ml = self.origens == ORIGEM_MOVIELENS
+        locais = self.origens == ORIGEM_AVALIACAO
+        avaliacoes = dict(zip(
+            zip(usuarios[locais].tolist(), filmes[locais].tolist()),
+            self.notas[locais].tolist()))
+        marca = (datetime.fromisoformat(self.marca_dagua)
+                 if self.marca_dagua else None)
+        return self._com_locais(
+            conexao, (usuarios[ml], filmes[ml], self.notas[ml]), avaliacoes,
+            marca, anterior=self)
+
+    def csr(self):
+        """ Matriz usuário x filme (códigos do snapshot) em CSR. """
+        return sparse.csr_matrix(
+            (self.notas, (self.linhas, self.colunas)),
+            shape=(len(self.ids_usuarios), len(self.ids_itens)))
+
+    def dataframe(self):
+        """ DataFrame id_usuario, tmdb_id, nota, como no treinamento. """
+        import pandas as pd
+        return pd.DataFrame({
+            'id_usuario': self.ids_usuarios[self.linhas],
+            'tmdb_id': self.ids_itens[self.colunas],
+            'nota': self.notas})
+
+    def resumo(self):
+        return {
+            'notas': len(self),
+            'usuarios': len(self.ids_usuarios),
+            'filmes': len(self.ids_itens),
+            'movielens': int((self.origens == ORIGEM_MOVIELENS).sum()),
+            'avaliacoes': int((self.origens == ORIGEM_AVALIACAO).sum()),
+            'favoritos': int((self.origens == ORIGEM_FAVORITO).sum()),
+            'marca_dagua': self.marca_dagua
+        }
+
+    def salvar(self, diretorio):
+        manifesto = dict(self.resumo(), tipo='avaliacoes',
+                         date=time.strftime("%Y-%m-%d %H:%M:%S"),
+                         offset_movielens=OFFSET_MOVIELENS)
+        arrays = {
+            'linhas': self.linhas, 'colunas': self.colunas,
+            'notas': self.notas, 'origens': self.origens,
+            'ids_usuarios': self.ids_usuarios, 'ids_itens': self.ids_itens}
+        return artefatos.escrever_diretorio(diretorio, arrays, manifesto)
+
+    @classmethod
+    def carregar(cls, diretorio):
+        """ Abre os arrays com mmap (milissegundos). """
+        manifesto = artefatos.ler_manifesto(diretorio)
+        arrays = {
+            nome[:-len('.npy')]: np.load(os.path.join(diretorio, nome),
+                                         mmap_mode='r')
+            for nome in manifesto['arquivos']}
+        if not (len(arrays['linhas']) == len(arrays['colunas'])
+                == len(arrays['notas']) == manifesto['notas']):
+            raise ValueError(f"Snapshot inconsistente em {diretorio}")
+        return cls(arrays['linhas'], arrays['colunas'], arrays['notas'],
+                   arrays['origens'], arrays['ids_usuarios'],
+                   arrays['ids_itens'], manifesto.get('marca_dagua'),
+                   manifesto)
+
+
+def atualizar_snapshot(conexao, diretorio, caminho_ratings=None,
+                       caminho_links=None, completo=False):
+    """
+    Atualiza o snapshot em disco (ou cria, se não existir ou completo) e
+    retorna o novo snapshot.
+    """
+    if completo or not os.path.isdir(diretorio):
+        snapshot = SnapshotAvaliacoes.construir(
+            conexao, caminho_ratings, caminho_links)
+    else:
+        snapshot = SnapshotAvaliacoes.carregar(diretorio).atualizar(conexao)
+    snapshot.salvar(diretorio)
+    return snapshot
@@ -0,0 +1,123 @@
+"""
+Backend de teste: cópia do backend em um diretório temporário, com um
+modelo de conteúdo sintético alinhado ao modelo_colaborativo.pkl e um
+banco SQLite semeado antes de importar o apy.
+"""
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+import joblib
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+# módulos do backend importáveis nos testes de unidade; o apy dos testes
+# de rota vem da cópia montada pela fixture backend
+sys.path.insert(0, str(BACKEND_DIR))
+
+# id_usuario -> quantidade de avaliações (>= 12: caminho do SVD)
+USUARIOS = {1: 15, 2: 5}
+
+
+def _modelo_conteudo(destino, tmdb_ids, rng):
+    embeddings = rng.normal(size=(len(tmdb_ids), 32)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    metadata = [{'tmdb_id': t, 'titulo': f'Filme {t}',
+                 'media_votos': float(rng.uniform(3, 9))} for t in tmdb_ids]
+    joblib.dump({'version': 'teste', 'date': '-', 'model_name': 'teste',
+                 'embeddings': embeddings, 'tmdb_ids': tmdb_ids,
+                 'metadata': metadata},
+                destino / 'modelo_recomendacao.pkl')
+
+
+def _semear(url_banco, tmdb_ids, rng):
+    from flask import Flask
+    from database import db
+    import models
+
+    app = Flask('semente')
+    app.config['SQLALCHEMY_DATABASE_URI'] = url_banco
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for i, tmdb_id in enumerate(tmdb_ids):
+            db.session.add(models.Filmes(
+                tmdb_id=tmdb_id, titulo=f'Filme {tmdb_id}',
+                sinopse=f'sinopse {tmdb_id}',
+                qtd_votos=int(rng.integers(0, 3000)),
+                media_votos=float(rng.uniform(3, 9)),
+                generos='Ação,Drama' if i % 2 else 'Comédia',
+                poster_path=f'/p{tmdb_id}.jpg'))
+        for user_id, quantidade in USUARIOS.items():
+            db.session.add(models.Usuario(
+                id=user_id, username=f'u{user_id}', name='teste',
+                email=f'{user_id}@teste.com', pw_hash='-', generos_fav=''))
+            inicio = user_id * 20
+            for tmdb_id in tmdb_ids[inicio:inicio + quantidade]:
+                db.session.add(models.Avaliacao(
+                    id_usuario=user_id, id_filme=tmdb_id,
+                    nota=int(rng.integers(3, 6))))
+            db.session.add(models.Favoritos(
+                id_usuario=user_id, id_filme=tmdb_ids[inicio + quantidade]))
+        db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """ Módulo apy importado sobre o backend de teste. """
+    destino = tmp_path_factory.mktemp('backend')
+    for arquivo in BACKEND_DIR.glob('*.py'):
+        shutil.copy(arquivo, destino)
+    shutil.copy(BACKEND_DIR / 'modelo_colaborativo.pkl', destino)
+
+    algo = joblib.load(destino / 'modelo_colaborativo.pkl')['model']
+    tmdb_ids = [int(algo.trainset.to_raw_iid(i))
+                for i in range(algo.trainset.n_items)]
+    rng = np.random.default_rng(0)
+    _modelo_conteudo(destino, tmdb_ids, rng)
+
+    url_banco = f"sqlite:///{destino / 'teste.sqlite'}"
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATABASE_URL', url_banco)
+        mp.setenv('JWT_KEY', 'chave-de-teste-com-tamanho-suficiente')
+        mp.setenv('SECRET_KEY', 'teste')
+        mp.syspath_prepend(str(destino))
+        mp.chdir(destino)
+        _semear(url_banco, tmdb_ids, rng)
+        import apy
+        yield apy
+    sys.modules.pop('apy', None)
+
+
+@pytest.fixture(scope='session')
+def cliente(backend):
+    return backend.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def cabecalhos(backend):
+    from flask_jwt_extended import create_access_token
+    with backend.app.app_context():
+        return {
+            user_id: {'Authorization':
+                      'Bearer ' + create_access_token(identity=str(user_id))}
+            for user_id in USUARIOS}
+
+
+@contextmanager
+def consultas_sql(backend):
+    """ Lista com o SQL de cada consulta enviada ao banco no bloco. """
+    with backend.app.app_context():
+        engine = backend.db.engine
+    consultas = []
+
+    def registrar(conexao, cursor, sql, parametros, contexto, executemany):
+        consultas.append(sql)
+
+    event.listen(engine, 'before_cursor_execute', registrar)
+    try:
+        yield consultas
+    finally:
+        event.remove(engine, 'before_cursor_execute', registrar)
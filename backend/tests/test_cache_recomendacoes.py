@@ -0,0 +1,47 @@
+"""
+As versões por usuário do cache ficam limitadas como as entradas, sem
+deixar passar um resultado calculado antes de uma escrita.
+"""
+from cache_recomendacoes import CacheRecomendacoes
+
+
+def test_versoes_limitadas_pelo_tamanho_do_cache():
+    cache = CacheRecomendacoes(max_itens=10)
+    for user_id in range(1000):
+        cache.invalidar(user_id)
+    assert len(cache._versoes) == 10
+
+    # usuário esquecido volta a ser guardado normalmente
+    _, versao = cache.obter('hibrido', 1)
+    cache.guardar('hibrido', 1, [1, 2], versao)
+    assert cache.obter('hibrido', 1)[0] == [1, 2]
+
+
+def test_escrita_durante_o_calculo_descarta_o_resultado():
+    cache = CacheRecomendacoes(max_itens=10)
+    _, versao = cache.obter('hibrido', 1)
+    cache.invalidar(1)
+    cache.guardar('hibrido', 1, ['antigo'], versao)
+    assert cache.obter('hibrido', 1)[0] is None
+
+    # mesmo quando a escrita do usuário já saiu das versões guardadas
+    _, versao = cache.obter('hibrido', 1)
+    cache.invalidar(1)
+    for user_id in range(100, 120):
+        cache.invalidar(user_id)
+    assert 1 not in cache._versoes
+    cache.guardar('hibrido', 1, ['antigo'], versao)
+    assert cache.obter('hibrido', 1)[0] is None
+
+
+def test_escrita_de_outro_usuario_nao_descarta():
+    cache = CacheRecomendacoes(max_itens=10)
+    _, versao = cache.obter('hibrido', 1)
+    cache.invalidar(2)
+    cache.guardar('hibrido', 1, ['novo'], versao)
+    assert cache.obter('hibrido', 1)[0] == ['novo']
+
+    _, versao = cache.obter('colaborativo', 1)
+    cache.limpar()
+    cache.guardar('colaborativo', 1, ['antigo'], versao)
+    assert cache.obter('colaborativo', 1)[0] is None
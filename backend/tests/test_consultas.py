@@ -0,0 +1,40 @@
+"""
+Cada rota de recomendação lê as interações do usuário em uma única
+consulta (InteracoesUsuario.carregar); catálogo, matriz de avaliações e
+perfis vêm da memória.
+"""
+import re
+import pytest
+from conftest import consultas_sql
+
+TABELAS_INTERACOES = re.compile(r'\bFROM (avaliacoes|favoritos)\b')
+
+
+@pytest.mark.parametrize('rota', ['colaborativo', 'hibrido'])
+@pytest.mark.parametrize('user_id', [1, 2])
+def test_rota_le_interacoes_uma_vez(backend, cliente, cabecalhos, rota,
+                                    user_id):
+    backend.cache_recomendacoes.limpar()
+
+    with consultas_sql(backend) as consultas:
+        resposta = cliente.get(f'/recomendar/{rota}',
+                               headers=cabecalhos[user_id])
+
+    assert resposta.status_code == 200
+    interacoes = [sql for sql in consultas if TABELAS_INTERACOES.search(sql)]
+    assert len(interacoes) == 1
+    # interações + consulta da tabela de recomendações pré-calculadas
+    assert len(consultas) <= 2
+
+
+@pytest.mark.parametrize('rota', ['colaborativo', 'hibrido'])
+def test_rota_em_cache_nao_consulta_o_banco(backend, cliente, cabecalhos,
+                                            rota):
+    backend.cache_recomendacoes.limpar()
+    cliente.get(f'/recomendar/{rota}', headers=cabecalhos[1])
+
+    with consultas_sql(backend) as consultas:
+        resposta = cliente.get(f'/recomendar/{rota}', headers=cabecalhos[1])
+
+    assert resposta.status_code == 200
+    assert consultas == []
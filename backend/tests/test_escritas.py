@@ -0,0 +1,50 @@
+"""
+Rotas de escrita: a nota é validada antes do commit, e uma falha nos
+efeitos em memória depois do commit não vira erro para o cliente.
+"""
+import pytest
+
+USER_ID = 1
+
+
+def _nota_gravada(backend, tmdb_id):
+    from models import Avaliacao
+    with backend.app.app_context():
+        avaliacao = backend.db.session.query(Avaliacao).filter_by(
+            id_usuario=USER_ID, id_filme=tmdb_id).first()
+        return avaliacao.nota if avaliacao else None
+
+
+@pytest.mark.parametrize('nota', [0, 6, 4.5, '4', True])
+def test_nota_invalida(backend, cliente, cabecalhos, nota):
+    tmdb_id = int(backend.registro.atual.tmdb_ids[2])
+    resposta = cliente.post('/avaliar', json={'tmdb_id': tmdb_id,
+                                              'nota': nota},
+                            headers=cabecalhos[USER_ID])
+    assert resposta.status_code == 400
+    assert _nota_gravada(backend, tmdb_id) is None
+
+
+def test_falha_depois_do_commit_responde_sucesso(backend, cliente,
+                                                 cabecalhos, monkeypatch):
+    tmdb_id = int(backend.registro.atual.tmdb_ids[2])
+    invalidados = []
+
+    def falhar(*args):
+        raise RuntimeError('matriz indisponível')
+
+    monkeypatch.setattr(backend.matriz_avaliacoes, 'registrar', falhar)
+    monkeypatch.setattr(backend.cache_recomendacoes, 'invalidar',
+                        invalidados.append)
+
+    resposta = cliente.post('/avaliar', json={'tmdb_id': tmdb_id,
+                                              'nota': 5},
+                            headers=cabecalhos[USER_ID])
+    assert resposta.status_code == 200
+    assert _nota_gravada(backend, tmdb_id) == 5
+
+    resposta = cliente.delete(f'/avaliar/{tmdb_id}',
+                              headers=cabecalhos[USER_ID])
+    assert resposta.status_code == 200
+    assert _nota_gravada(backend, tmdb_id) is None
+    assert invalidados == [USER_ID, USER_ID]
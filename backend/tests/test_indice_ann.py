@@ -0,0 +1,41 @@
+"""
+O recall que criar_indice mede precisa valer para consultas que ele
+não viu, comparadas com o top_k exato.
+"""
+import numpy as np
+from indice_ann import (BuscaExata, IndiceIVF, amostrar_consultas,
+                        criar_indice)
+
+N_FILMES = 6000
+
+
+def _catalogo():
+    """ Embeddings normalizados agrupados em torno de 60 centros. """
+    rng = np.random.default_rng(1)
+    centros = rng.normal(size=(60, 32))
+    embeddings = centros[rng.integers(0, 60, N_FILMES)] \
+        + 0.6 * rng.normal(size=(N_FILMES, 32))
+    embeddings = embeddings.astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def test_recall_do_indice_em_consultas_novas(monkeypatch):
+    monkeypatch.setenv('INDICE_ANN', 'ivf')
+    monkeypatch.setenv('ANN_MIN_FILMES', str(N_FILMES // 2))
+    monkeypatch.setenv('ANN_SONDAS', '1')
+    monkeypatch.setenv('ANN_RECALL_MIN', '0.95')
+    embeddings = _catalogo()
+
+    indice = criar_indice(embeddings)
+    assert isinstance(indice, IndiceIVF)
+    # com filmes do catálogo como consulta, 1 sonda já parecia bastar
+    assert indice.n_sondas > 1
+
+    exata = BuscaExata(embeddings)
+    consultas = amostrar_consultas(embeddings, n=200, semente=9)
+    acertos = 0
+    for vetor in consultas:
+        esperado = set(exata.buscar(vetor, 10)[0].tolist())  # top_k exato
+        acertos += len(esperado & set(indice.buscar(vetor, 10)[0].tolist()))
+    assert acertos / (10 * len(consultas)) >= 0.9
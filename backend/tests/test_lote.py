@@ -0,0 +1,68 @@
+"""
+O fold-in por bloco do lote precisa dar as mesmas notas que
+FatoresSVD.dobrar, sem escrever no dobrados compartilhado.
+"""
+from pathlib import Path
+from types import SimpleNamespace
+import joblib
+import numpy as np
+import pytest
+from fatores_svd import FatoresSVD
+from interacoes import InteracoesUsuario
+from lote import RecomendadorLote
+
+MODELO = Path(__file__).resolve().parents[1] / 'modelo_colaborativo.pkl'
+
+
+def _svd():
+    algo = joblib.load(MODELO)['model']
+    svd = FatoresSVD.do_surprise(algo)
+    rng = np.random.default_rng(0)
+    svd.carregar_votos((int(t), int(rng.integers(0, 5000)))
+                       for t in svd.tmdb_ids_itens)
+    return svd
+
+
+@pytest.fixture
+def usuarios():
+    """ Usuários fora do treino (e um do treino), com notas e favoritos. """
+    svd = _svd()
+    rng = np.random.default_rng(4)
+    tmdb_ids = svd.tmdb_ids_itens.tolist()
+    por_usuario = {}
+    for i in range(40):
+        user_id = -(i + 1)
+        escolhidos = rng.choice(tmdb_ids, size=8 + i, replace=False)
+        notas = {int(t): int(rng.integers(1, 6)) for t in escolhidos[:-2]}
+        notas[999999999] = 5  # fora do modelo: ignorado pela dobra
+        por_usuario[user_id] = InteracoesUsuario(
+            user_id, notas, {int(t) for t in escolhidos[-2:]})
+    # só filmes fora do modelo: sem dobra, como na rota
+    por_usuario[-99] = InteracoesUsuario(-99, {999999999: 4}, set())
+    treino = int(next(iter(svd.linha_usuario)))
+    por_usuario[treino] = InteracoesUsuario(treino, {}, set())
+    return por_usuario
+
+
+def test_dobra_por_bloco_igual_a_dobrar(usuarios):
+    svd = _svd()
+    modelos = SimpleNamespace(fatores_svd=svd, tmdb_ids=svd.tmdb_ids_itens)
+    lote = RecomendadorLote(modelos, memoria_mb=1)
+    assert lote.tamanho_bloco(len(svd.tmdb_ids_itens)) < len(usuarios)
+    resultados = dict(lote.recomendar(usuarios, tipo='colaborativo', n=20))
+    assert svd.dobrados == {}
+
+    referencia = _svd()
+    penalidade = 0.2 * np.log10(np.maximum(referencia.qtd_votos, 1))
+    for user_id, inter in usuarios.items():
+        if user_id not in referencia.linha_usuario:
+            referencia.dobrar(user_id, inter.notas_svd)
+        esperado = referencia.ranquear(user_id, k=20,
+                                       ids_excluir=inter.ids_vistos)
+        assert [t for t, _, _ in resultados[user_id]] == esperado
+
+        scores = referencia.estimar_catalogo(user_id) - penalidade
+        linhas = referencia.linhas_itens(esperado)
+        np.testing.assert_allclose(
+            [s for _, s, _ in resultados[user_id]], scores[linhas],
+            atol=1e-4)
@@ -0,0 +1,110 @@
+"""
+mais_curtidos (CSR + alterações recentes) contra o GROUP BY sobre
+avaliacoes que ele substituiu, num SQLite com notas aleatórias.
+"""
+import numpy as np
+import pytest
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.orm import Session
+from matriz_avaliacoes import MatrizAvaliacoes
+
+N_USUARIOS, N_FILMES = 30, 40
+
+# consulta antiga de /recomendar/colaborativo; o desempate por id_filme
+# é o mesmo de mais_curtidos (o SQL deixava a ordem indefinida)
+CONSULTA_ANTIGA = text("""
+    SELECT id_filme, COUNT(id_usuario) as freq
+    FROM avaliacoes
+    WHERE id_usuario IN :vizinhos
+    AND nota >= 4
+    AND id_filme NOT IN (
+        SELECT id_filme FROM avaliacoes WHERE id_usuario = :meuid
+    )
+    GROUP BY id_filme
+    ORDER BY freq DESC, AVG(nota) DESC, id_filme
+    LIMIT 10
+""").bindparams(bindparam('vizinhos', expanding=True))
+
+
+@pytest.fixture
+def sessao():
+    engine = create_engine('sqlite://')
+    with Session(engine) as sessao:
+        sessao.execute(text(
+            "CREATE TABLE avaliacoes (id_usuario INTEGER, id_filme INTEGER,"
+            " nota INTEGER, UNIQUE (id_usuario, id_filme))"))
+        rng = np.random.default_rng(11)
+        for user_id in range(1, N_USUARIOS + 1):
+            for tmdb_id in range(100, 100 + N_FILMES):
+                if rng.random() < 0.4:
+                    _gravar(sessao, user_id, tmdb_id,
+                            int(rng.integers(1, 6)))
+        sessao.commit()
+        yield sessao
+
+
+def _gravar(sessao, user_id, tmdb_id, nota):
+    parametros = {'u': user_id, 'f': tmdb_id, 'n': nota}
+    if nota is None:
+        sessao.execute(text("DELETE FROM avaliacoes"
+                            " WHERE id_usuario = :u AND id_filme = :f"),
+                       parametros)
+    else:
+        sessao.execute(text("INSERT OR REPLACE INTO avaliacoes"
+                            " VALUES (:u, :f, :n)"), parametros)
+
+
+def _conferir(sessao, matriz):
+    rng = np.random.default_rng(5)
+    for user_id in range(1, N_USUARIOS + 1):
+        vizinhos = rng.choice(np.arange(1, N_USUARIOS + 1), size=8,
+                              replace=False).tolist()
+        avaliados = [r[0] for r in sessao.execute(text(
+            "SELECT id_filme FROM avaliacoes WHERE id_usuario = :u"),
+            {'u': user_id})]
+        esperado = [r[0] for r in sessao.execute(
+            CONSULTA_ANTIGA, {'vizinhos': vizinhos, 'meuid': user_id})]
+        assert matriz.mais_curtidos(vizinhos, k=10,
+                                    excluir=avaliados) == esperado
+
+
+def _escrever(sessao, matriz, rng, n):
+    """ Sobrescritas, inserções e remoções pelo caminho das rotas. """
+    for _ in range(n):
+        user_id = int(rng.integers(1, N_USUARIOS + 1))
+        tmdb_id = int(rng.integers(100, 100 + N_FILMES))
+        nota = None if rng.random() < 0.3 else int(rng.integers(1, 6))
+        _gravar(sessao, user_id, tmdb_id, nota)
+        matriz.registrar(user_id, tmdb_id, nota)
+    sessao.commit()
+
+
+@pytest.mark.parametrize('max_alteracoes', [1000, 3])
+def test_mais_curtidos_igual_ao_group_by(sessao, max_alteracoes):
+    matriz = MatrizAvaliacoes(max_alteracoes=max_alteracoes)
+    matriz.carregar(sessao)
+    _conferir(sessao, matriz)
+
+    rng = np.random.default_rng(max_alteracoes)
+    _escrever(sessao, matriz, rng, 60)
+    _conferir(sessao, matriz)
+
+
+def test_recarga_periodica_traz_escritas_de_outro_processo(sessao):
+    matriz = MatrizAvaliacoes(intervalo_recarga=600)
+    matriz.carregar(sessao)
+    rng = np.random.default_rng(2)
+    _escrever(sessao, matriz, rng, 20)
+
+    # escritas de outro worker: só o banco muda
+    for _ in range(40):
+        user_id = int(rng.integers(1, N_USUARIOS + 1))
+        tmdb_id = int(rng.integers(100, 100 + N_FILMES))
+        _gravar(sessao, user_id, tmdb_id, int(rng.integers(4, 6)))
+    sessao.commit()
+
+    assert not matriz.recarregar_se_preciso(sessao)
+    matriz.ultima_recarga -= 601
+    assert matriz.recarregar_se_preciso(sessao)
+    assert matriz.estatisticas()['usuarios_alterados'] == 0
+    _conferir(sessao, matriz)
@@ -0,0 +1,103 @@
+"""
+Rankings vetorizados contra os laços que eles substituíram.
+"""
+import numpy as np
+import pytest
+from artefatos import calcular_vizinhos
+from pontuacao import (pontuar_multiplos, pontuar_multiplos_vizinhos, top_k,
+                       top_k_linhas)
+
+
+def _ranking_antigo(indices_sementes, embeddings, tmdb_ids, meta_por_id,
+                    k=30, alpha=0.8, beta=0.2):
+    """ Laço por semente de /recomendar/multiplos antes da vetorização. """
+    score_similaridade = {}
+    for idx in indices_sementes:
+        normas = np.linalg.norm(embeddings, axis=1) \
+            * np.linalg.norm(embeddings[idx])
+        simi_cossenos = (embeddings @ embeddings[idx]) / normas
+        for sim_idx, score in enumerate(simi_cossenos):
+            if sim_idx not in indices_sementes:
+                score_similaridade[sim_idx] = \
+                    score_similaridade.get(sim_idx, 0.0) + score
+
+    for sim_idx in list(score_similaridade):
+        meta = meta_por_id.get(tmdb_ids[sim_idx], {"media_votos": 5})
+        score_similaridade[sim_idx] = (alpha * score_similaridade[sim_idx]
+                                       + beta * meta["media_votos"] / 10)
+
+    ordenados = sorted(score_similaridade.items(), key=lambda item: item[1],
+                       reverse=True)
+    return [idx for idx, _ in ordenados[:k]]
+
+
+@pytest.fixture
+def catalogo():
+    """ Embeddings normalizados com linhas repetidas (empates exatos). """
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(80, 16))
+    embeddings[40:50] = embeddings[10]
+    embeddings[60:64] = embeddings[5]
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    tmdb_ids = list(range(1000, 1080))
+    # linhas repetidas com a mesma média; 60..63 sem metadata (nota 5)
+    medias = rng.uniform(3, 9, size=80)
+    medias[40:50] = 7.0
+    meta_por_id = {t: {"media_votos": float(medias[i])}
+                   for i, t in enumerate(tmdb_ids) if not 60 <= i < 64}
+    return embeddings, tmdb_ids, meta_por_id
+
+
+@pytest.mark.parametrize('sementes', [
+    [3], [3, 7, 21], [10], [10, 5], [3, 3, 7], [5, 5, 5, 60]])
+def test_pontuar_multiplos_igual_ao_laco(catalogo, sementes):
+    from pontuacao import preparar_popularidade
+    embeddings, tmdb_ids, meta_por_id = catalogo
+    popularidade = preparar_popularidade(tmdb_ids, meta_por_id)
+
+    novo = pontuar_multiplos(sementes, embeddings, popularidade, k=30)
+    assert novo.tolist() == _ranking_antigo(sementes, embeddings, tmdb_ids,
+                                            meta_por_id)
+
+
+@pytest.mark.parametrize('sementes', [
+    [3, 3, 7], [5, 5, 5, 60], [10, 21, 10], [3, 7, 21]])
+def test_vizinhos_pesam_sementes_como_pontuar_multiplos(catalogo, sementes):
+    from pontuacao import preparar_popularidade
+    embeddings, tmdb_ids, meta_por_id = catalogo
+    popularidade = preparar_popularidade(tmdb_ids, meta_por_id)
+    # listas completas (k = n - 1) com scores exatos: a única diferença
+    # para o catálogo inteiro é a similaridade da semente consigo mesma
+    vizinhos_indices, _ = calcular_vizinhos(embeddings,
+                                            k=embeddings.shape[0] - 1)
+    vizinhos_scores = np.take_along_axis(
+        embeddings @ embeddings.T, vizinhos_indices.astype(np.int64), axis=1)
+
+    assert pontuar_multiplos_vizinhos(
+        sementes, vizinhos_indices, vizinhos_scores, popularidade,
+        k=30).tolist() == pontuar_multiplos(
+        sementes, embeddings, popularidade, k=30).tolist()
+
+
+def test_top_k_igual_ao_sorted_estavel():
+    rng = np.random.default_rng(3)
+    scores = rng.integers(0, 5, size=200).astype(float)  # muitos empates
+    mascara = rng.random(200) < 0.2
+    esperado = [i for i, _ in sorted(
+        ((i, s) for i, s in enumerate(scores) if not mascara[i]),
+        key=lambda item: item[1], reverse=True)]
+
+    for k in (1, 10, 150, 500):
+        assert top_k(scores, k, mascara).tolist() == esperado[:k]
+
+
+def test_top_k_linhas_igual_a_top_k():
+    rng = np.random.default_rng(5)
+    scores = rng.integers(0, 4, size=(6, 50)).astype(float)
+    scores[rng.random(scores.shape) < 0.2] = -np.inf
+
+    for k in (1, 7, 45, 50):
+        linhas = top_k_linhas(scores, k)
+        for i, linha in enumerate(linhas):
+            assert linha.tolist() == np.argsort(
+                -scores[i], kind='stable')[:k].tolist()
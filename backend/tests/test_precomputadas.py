@@ -0,0 +1,45 @@
+"""
+A linha pré-calculada do híbrido é servida no lugar do cálculo ao vivo,
+então precisa ser a mesma resposta: mesmos candidatos, ordem e motivos.
+"""
+import pytest
+
+
+@pytest.fixture
+def candidatos_reduzidos(backend, monkeypatch):
+    """ Poucos candidatos, para o corte do gerador mudar o ranking. """
+    gerador = backend.gerador_candidatos
+    monkeypatch.setattr(gerador, 'k_conteudo', 30)
+    monkeypatch.setattr(gerador, 'k_svd', 10)
+    monkeypatch.setattr(gerador, 'k_comunidade', 5)
+
+
+def _hibrido(backend, cliente, cabecalhos, user_id):
+    backend.cache_recomendacoes.limpar()
+    resposta = cliente.get('/recomendar/hibrido',
+                           headers=cabecalhos[user_id])
+    assert resposta.status_code == 200
+    return [(f['tmdb_id'], f['score_final'], f['motivo'])
+            for f in resposta.get_json()]
+
+
+@pytest.mark.parametrize('user_id', [1, 2])
+def test_precomputada_igual_ao_calculo_ao_vivo(
+        backend, cliente, cabecalhos, candidatos_reduzidos, user_id):
+    from models import RecomendacaoPrecomputada
+    ao_vivo = _hibrido(backend, cliente, cabecalhos, user_id)
+
+    with backend.app.app_context():
+        sessao = backend.db.session
+        assert backend.job_precomputacao.executar(
+            sessao, backend._modelos_com_votos(),
+            backend._diversificar_colaborativo, user_ids=[user_id])
+        try:
+            assert sessao.query(RecomendacaoPrecomputada).filter_by(
+                id_usuario=user_id, tipo='hibrido').count() == 1
+            assert _hibrido(backend, cliente, cabecalhos, user_id) \
+                == ao_vivo
+        finally:
+            sessao.query(RecomendacaoPrecomputada).delete()
+            sessao.commit()
+            backend.cache_recomendacoes.limpar()
@@ -0,0 +1,59 @@
+"""
+Escritas feitas enquanto uma recarga prepara a versão nova não podem
+deixar nela um perfil montado com o retrato anterior do banco.
+"""
+import numpy as np
+from interacoes import InteracoesUsuario
+from utils import encontrar_vizinhos_cache
+
+USER_ID = 2
+
+
+def _perfil_esperado(backend, modelos):
+    interacoes = InteracoesUsuario.carregar(backend.db.session, USER_ID)
+    linhas = [modelos.indices_map[t] for t in interacoes.ids_curtidos
+              if t in modelos.indices_map]
+    return modelos.embeddings[linhas].mean(axis=0)
+
+
+def _perfil_publicado(backend):
+    """ Perfil da versão atual, recalculado pelo caminho das rotas. """
+    modelos = backend.registro.atual
+    encontrar_vizinhos_cache(
+        USER_ID, backend.db.session, modelos.embeddings,
+        modelos.indices_map, modelos.armazem)
+    return modelos.armazem.obter(USER_ID).ravel()
+
+
+def test_escrita_durante_recarga_nao_fica_na_versao_nova(
+        backend, cliente, cabecalhos, monkeypatch):
+    registro = backend.registro
+    antigos = registro.atual
+    tmdb_id = int(antigos.tmdb_ids[0])  # nem avaliado nem favorito
+    assert USER_ID in antigos.armazem
+
+    preparar = registro.preparar
+
+    def preparar_com_escrita(novos):
+        preparar(novos)  # perfis montados com o banco de antes da escrita
+        resposta = cliente.post('/favoritos', json={'tmdb_id': tmdb_id},
+                                headers=cabecalhos[USER_ID])
+        assert resposta.status_code == 200
+
+    monkeypatch.setattr(registro, 'preparar', preparar_com_escrita)
+    with backend.app.app_context():
+        assert registro.recarregar()
+        novos = registro.atual
+        assert novos is not antigos
+
+        np.testing.assert_allclose(
+            _perfil_publicado(backend), _perfil_esperado(backend, novos),
+            rtol=1e-5, atol=1e-6)
+
+        # a próxima escrita soma sobre a versão nova, já consistente
+        resposta = cliente.delete(f'/favoritos/{tmdb_id}',
+                                  headers=cabecalhos[USER_ID])
+        assert resposta.status_code == 200
+        np.testing.assert_allclose(
+            _perfil_publicado(backend), _perfil_esperado(backend, novos),
+            rtol=1e-5, atol=1e-6)
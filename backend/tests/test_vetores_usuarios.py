@@ -0,0 +1,61 @@
+"""
+Modo mmap: dois ArmazemVetores sobre o mesmo diretório fazem o papel de
+dois workers. Uma linha descartada por um deles não pode receber as
+escritas que o outro ainda atribuía ao usuário antigo.
+"""
+import multiprocessing
+import numpy as np
+from vetores_usuarios import ArmazemVetores
+
+DIM = 4
+
+
+def _workers(tmp_path, max_usuarios=2):
+    caminho = str(tmp_path / 'vetores')
+    return (ArmazemVetores(max_usuarios=max_usuarios, caminho_mmap=caminho),
+            ArmazemVetores(max_usuarios=max_usuarios, caminho_mmap=caminho))
+
+
+def test_linha_descartada_por_outro_worker(tmp_path):
+    a, b = _workers(tmp_path)
+    a.guardar(1, np.ones(DIM), 1)
+    a.guardar(2, np.full(DIM, 2.0), 1)
+    assert a.obter(1) is not None  # linha de 1 no mapa local de a
+
+    # b descarta o usuário 1 (atualizado há mais tempo) e dá a linha ao 3
+    b.guardar(2, np.full(DIM, 2.0), 1)
+    b.guardar(3, np.full(DIM, 3.0), 1)
+
+    assert not a.somar(1, np.ones(DIM), 1)
+    np.testing.assert_allclose(b.obter(3).ravel(), 3.0)
+
+    a.guardar(1, np.full(DIM, 5.0), 1)
+    np.testing.assert_allclose(b.obter(1).ravel(), 5.0)
+    assert 3 in b  # a linha do 3 era a mais recente
+    np.testing.assert_allclose(b.obter(3).ravel(), 3.0)
+
+
+def _somar_varias(caminho, repeticoes):
+    armazem = ArmazemVetores(max_usuarios=4, caminho_mmap=caminho)
+    for _ in range(repeticoes):
+        armazem.somar(1, np.ones(DIM), 1)
+
+
+def test_somas_concorrentes_de_dois_workers(tmp_path):
+    a, _ = _workers(tmp_path, max_usuarios=4)
+    a.guardar(1, np.zeros(DIM), 1)
+    repeticoes, n_processos = 2000, 4
+
+    contexto = multiprocessing.get_context('fork')
+    processos = [contexto.Process(target=_somar_varias,
+                                  args=(a.caminho_mmap, repeticoes))
+                 for _ in range(n_processos)]
+    for p in processos:
+        p.start()
+    for p in processos:
+        p.join()
+        assert p.exitcode == 0
+
+    total = n_processos * repeticoes
+    np.testing.assert_allclose(
+        a.obter(1).ravel(), total / (1 + total), rtol=1e-5)
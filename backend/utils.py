@@ -1,21 +1,41 @@
+import os
+import hmac
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sqlalchemy import text
+from flask import request
 from flask_jwt_extended import get_jwt_identity
+from interacoes import InteracoesUsuario
+from vetores_usuarios import ArmazemVetores
 
-CACHE_VETORES_USUARIOS = {}
 
-
-def calcular_vetor_usuario(user_id, db_session, embeddings, indices_map):
-    sql = text("""
-        SELECT id_filme FROM avaliacoes WHERE id_usuario = :uid AND nota >= 4
-        UNION
-        SELECT id_filme FROM favoritos WHERE id_usuario = :uid
-    """)
-    result = db_session.execute(sql, {'uid': user_id}).fetchall()
-    ids_curtidos = [row[0] for row in result]
+def criar_armazem_vetores(versao=""):
+    """
+    Um armazém por versão do modelo de conteúdo (os vetores dependem dos
+    embeddings). VETORES_USUARIOS_MMAP: diretório compartilhado entre os
+    workers (opcional).
+    """
+    caminho_mmap = os.getenv("VETORES_USUARIOS_MMAP") or None
+    if caminho_mmap:
+        subdir = "".join(c if c.isalnum() else "_" for c in versao)
+        caminho_mmap = os.path.join(caminho_mmap, subdir or "padrao")
+    return ArmazemVetores(
+        max_usuarios=int(os.getenv("VETORES_USUARIOS_MAX", 100000)),
+        caminho_mmap=caminho_mmap
+    )
+
+
+def calcular_vetor_usuario(
+        user_id, db_session, embeddings, indices_map, armazem,
+        interacoes=None):
+    """
+    Recalcula o perfil a partir das interações (nota >= 4 ou favorito).
+    Usa o retrato da requisição se vier pronto; senão carrega um.
+    """
+    if interacoes is None:
+        interacoes = InteracoesUsuario.carregar(db_session, user_id)
+    ids_curtidos = interacoes.ids_curtidos
 
     if not ids_curtidos:
+        armazem.remover(user_id)
         return None
 
     indices_validos = []
@@ -24,54 +44,76 @@ def calcular_vetor_usuario(user_id, db_session, embeddings, indices_map):
             indices_validos.append(indices_map[tmdb_id])
 
     if not indices_validos:
+        armazem.remover(user_id)
         return None
 
     vetores = embeddings[indices_validos]
     vetor_medio = np.mean(vetores, axis=0).reshape(1, -1)
 
-    CACHE_VETORES_USUARIOS[user_id] = vetor_medio
+    armazem.guardar(
+        user_id, vetores.sum(axis=0), len(indices_validos))
     return vetor_medio
 
 
-def encontrar_vizinhos_cache(
-        user_id, db_session, embeddings, indices_map, k=30):
+def obter_vetor_usuario(
+        user_id, db_session, embeddings, indices_map, armazem,
+        interacoes=None):
     """
-    Compara o usuário atual com o cache.
-    Precisa de embeddings/map se calcular na hora.
+    Perfil do usuário mantido incrementalmente; só recalcula
+    se o usuário ainda não está no armazém.
     """
-    meu_vetor = CACHE_VETORES_USUARIOS.get(user_id)
+    vetor = armazem.obter(user_id)
+    if vetor is None:
+        vetor = calcular_vetor_usuario(
+            user_id, db_session, embeddings, indices_map, armazem,
+            interacoes)
+    return vetor
 
-    if meu_vetor is None:
-        meu_vetor = calcular_vetor_usuario(
-            user_id, db_session, embeddings, indices_map)
 
-    if meu_vetor is None:
-        return []
+def curte_filme(nota, favoritado):
+    """ Mesmo critério de InteracoesUsuario.ids_curtidos. """
+    return favoritado or (nota is not None and int(nota) >= 4)
 
-    outros_ids = []
-    outros_vetores = []
 
-    for uid, vec in CACHE_VETORES_USUARIOS.items():
-        if uid != user_id:
-            outros_ids.append(uid)
-            outros_vetores.append(vec)
+def atualizar_vetor_usuario(user_id, tmdb_id, curtia, curte,
+                            db_session, embeddings, indices_map, armazem):
+    """
+    Chamado após cada escrita de avaliação/favorito (depois do commit).
+    Só mexe no perfil se o filme entrou ou saiu do conjunto curtido.
+    """
+    if curtia == curte or tmdb_id not in indices_map:
+        return
 
-    if not outros_ids:
-        return []
+    sinal = 1 if curte else -1
+    if not armazem.somar(
+            user_id, embeddings[indices_map[tmdb_id]], sinal):
+        calcular_vetor_usuario(
+            user_id, db_session, embeddings, indices_map, armazem)
 
-    matriz_outros = np.vstack(outros_vetores)
-    scores = cosine_similarity(meu_vetor, matriz_outros)[0]
 
-    top_indices = scores.argsort()[-k:][::-1]
+def encontrar_vizinhos_cache(
+        user_id, db_session, embeddings, indices_map, armazem, k=30,
+        interacoes=None):
+    """
+    Compara o usuário atual com o cache.
+    Precisa de embeddings/map se calcular na hora.
+    """
+    if user_id not in armazem:
+        meu_vetor = calcular_vetor_usuario(
+            user_id, db_session, embeddings, indices_map, armazem,
+            interacoes)
+        if meu_vetor is None:
+            return []
 
-    return [outros_ids[i] for i in top_indices]
+    return armazem.vizinhos(user_id, k)
 
 
 def div_genero(filmes_lista, max_por_genero=3):
+    """ filmes_lista: dicionários do catálogo (ver CatalogoFilmes). """
     resultado = []
     contador_generos = {}
     for filme in filmes_lista:
-        generos = filme.generos.split(',') if filme.generos else []
+        generos = filme['generos'].split(',') if filme['generos'] else []
         generos = [g.strip() for g in generos]
         pode_adicionar = True
         for gen in generos:
@@ -91,3 +133,10 @@ def get_user_id():
         return int(raw_id)
     except (ValueError, TypeError, RuntimeError):
         return None
+
+
+def admin_autorizado():
+    """ Rotas administrativas: cabeçalho X-Admin-Token == ADMIN_TOKEN. """
+    esperado = os.getenv("ADMIN_TOKEN")
+    recebido = request.headers.get("X-Admin-Token", "")
+    return bool(esperado) and hmac.compare_digest(esperado, recebido)
@@ -0,0 +1,263 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+from pontuacao import top_k
+
+
+class ArmazemVetores:
+    """
+    Vetores de usuário em uma matriz float32 contígua pré-alocada,
+    com mapa id -> linha. Cada linha guarda a soma dos embeddings curtidos
+    e a contagem ao lado, para atualizar o perfil em O(d) a cada escrita;
+    obter() devolve a média. Cresce dobrando a capacidade até max_usuarios;
+    depois disso o usuário atualizado há mais tempo é descartado.
+
+    Com caminho_mmap, as matrizes ficam em arquivos .npy mapeados em
+    memória (capacidade fixa = max_usuarios), compartilhados por todos os
+    workers: toda escrita usa trava de arquivo e um contador de geração
+    avisa os outros processos para reconstruírem o mapa (uma linha pode
+    ter sido descartada e entregue a outro usuário por outro worker).
+    """
+
+    def __init__(self, max_usuarios=100000, capacidade_inicial=1024,
+                 caminho_mmap=None):
+        self.max_usuarios = max_usuarios
+        self.capacidade_inicial = capacidade_inicial
+        self.caminho_mmap = caminho_mmap
+        self.dim = None
+        self._linhas = {}
+        self._geracao_local = -1
+        self._lock = threading.Lock()
+
+    def _alocar(self, dim):
+        self.dim = dim
+        if self.caminho_mmap:
+            self._criar_mmap()
+            return
+        cap = min(self.capacidade_inicial, self.max_usuarios)
+        self.vetores = np.zeros((cap, dim), dtype=np.float32)
+        self.ids = np.full(cap, -1, dtype=np.int64)
+        self.normas = np.zeros(cap, dtype=np.float32)
+        self.contagens = np.zeros(cap, dtype=np.int32)
+        self.uso = np.zeros(cap, dtype=np.float64)
+        self.geracao = np.zeros(1, dtype=np.int64)
+
+    def _criar_mmap(self):
+        os.makedirs(self.caminho_mmap, exist_ok=True)
+        with self._trava_arquivo():
+            # outro worker pode ter criado os arquivos enquanto esperávamos
+            if not os.path.exists(
+                    os.path.join(self.caminho_mmap, 'vetores.npy')):
+                cap = self.max_usuarios
+                arquivos = {
+                    'vetores': ((cap, self.dim), np.float32, 0),
+                    'ids': ((cap,), np.int64, -1),
+                    'normas': ((cap,), np.float32, 0),
+                    'contagens': ((cap,), np.int32, 0),
+                    'uso': ((cap,), np.float64, 0),
+                    'geracao': ((1,), np.int64, 0),
+                }
+                for nome, (forma, tipo, inicial) in arquivos.items():
+                    arr = np.lib.format.open_memmap(
+                        os.path.join(self.caminho_mmap, f'{nome}.npy'),
+                        mode='w+', dtype=tipo, shape=forma)
+                    arr[:] = inicial
+                    arr.flush()
+        self._abrir_mmap()
+
+    def _abrir_mmap(self):
+        for nome in ('vetores', 'ids', 'normas', 'contagens', 'uso',
+                     'geracao'):
+            setattr(self, nome, np.load(
+                os.path.join(self.caminho_mmap, f'{nome}.npy'),
+                mmap_mode='r+'))
+        self.dim = self.vetores.shape[1]
+
+    def _trava_arquivo(self):
+        return _TravaArquivo(os.path.join(self.caminho_mmap, '.lock'))
+
+    def _escrita(self):
+        """ Trava entre processos para escrever (só no modo mmap). """
+        if self.caminho_mmap:
+            return self._trava_arquivo()
+        return nullcontext()
+
+    def _crescer(self):
+        cap = self.vetores.shape[0]
+        nova = min(cap * 2, self.max_usuarios)
+        vetores = np.zeros((nova, self.dim), dtype=np.float32)
+        vetores[:cap] = self.vetores
+        self.vetores = vetores
+        self.ids = np.concatenate((self.ids, np.full(nova - cap, -1)))
+        self.normas = np.concatenate(
+            (self.normas, np.zeros(nova - cap, dtype=np.float32)))
+        self.contagens = np.concatenate(
+            (self.contagens, np.zeros(nova - cap, dtype=np.int32)))
+        self.uso = np.concatenate((self.uso, np.zeros(nova - cap)))
+
+    def _sincronizar(self):
+        """ Reconstrói o mapa se outro processo alocou/descartou linhas. """
+        if self.dim is None:
+            if not (self.caminho_mmap and os.path.exists(
+                    os.path.join(self.caminho_mmap, 'vetores.npy'))):
+                return
+            self._abrir_mmap()
+        if self._geracao_local != int(self.geracao[0]):
+            linhas = np.flatnonzero(self.ids >= 0)
+            self._linhas = {int(self.ids[i]): int(i) for i in linhas}
+            self._geracao_local = int(self.geracao[0])
+
+    def _nova_linha(self, user_id):
+        livres = np.flatnonzero(self.ids < 0)
+        if livres.size == 0 and not self.caminho_mmap \
+                and self.vetores.shape[0] < self.max_usuarios:
+            self._crescer()
+            livres = np.flatnonzero(self.ids < 0)
+        if livres.size:
+            linha = int(livres[0])
+        else:
+            # cheio: descarta o vetor atualizado há mais tempo
+            linha = int(np.argmin(self.uso))
+            self._linhas.pop(int(self.ids[linha]), None)
+        self.ids[linha] = user_id
+        self._linhas[user_id] = linha
+        self.geracao[0] += 1
+        self._geracao_local = int(self.geracao[0])
+        return linha
+
+    def _linha_atual(self, user_id):
+        """
+        Linha do usuário (None se não está no armazém). Dentro de
+        _escrita(): no modo mmap relê o mapa se a linha já é de outro.
+        """
+        self._sincronizar()
+        linha = self._linhas.get(user_id)
+        if linha is not None and self.caminho_mmap \
+                and int(self.ids[linha]) != user_id:
+            self._geracao_local = -1
+            self._sincronizar()
+            linha = self._linhas.get(user_id)
+        return linha
+
+    def _linha_para_escrita(self, user_id):
+        linha = self._linha_atual(user_id)
+        if linha is None:
+            linha = self._nova_linha(user_id)
+        return linha
+
+    def guardar(self, user_id, soma, contagem):
+        """ Substitui o perfil: soma dos embeddings curtidos e quantidade. """
+        soma = np.asarray(soma, dtype=np.float32).ravel()
+        with self._lock:
+            if self.dim is None:
+                self._alocar(soma.shape[0])
+            with self._escrita():
+                linha = self._linha_para_escrita(user_id)
+                self.vetores[linha] = soma
+                self.contagens[linha] = contagem
+                self.normas[linha] = np.linalg.norm(soma)
+                self.uso[linha] = time.time()
+
+    def somar(self, user_id, vetor, sinal):
+        """
+        Adiciona (sinal=1) ou retira (sinal=-1) um filme do perfil em O(d).
+        Retorna False se o usuário não está no armazém (quem chama
+        recalcula o perfil).
+        """
+        with self._lock:
+            if self.dim is None:
+                self._sincronizar()
+                if self.dim is None:
+                    return False
+            with self._escrita():
+                linha = self._linha_atual(user_id)
+                if linha is None:
+                    return False
+                self.vetores[linha] += sinal * np.asarray(
+                    vetor, dtype=np.float32)
+                self.contagens[linha] += sinal
+                self.normas[linha] = np.linalg.norm(self.vetores[linha])
+                self.uso[linha] = time.time()
+                vazio = self.contagens[linha] <= 0
+        if vazio:
+            self.remover(user_id)
+        return True
+
+    def obter(self, user_id):
+        """ Vetor (1, d) do usuário, ou None se não estiver no armazém. """
+        with self._lock:
+            self._sincronizar()
+            linha = self._linhas.get(user_id)
+            if linha is None:
+                return None
+            media = self.vetores[linha] / self.contagens[linha]
+            return np.array(media).reshape(1, -1)
+
+    def remover(self, user_id):
+        with self._lock:
+            self._sincronizar()
+            if self.dim is None:
+                return
+            with self._escrita():
+                linha = self._linha_atual(user_id)
+                if linha is None:
+                    return
+                del self._linhas[user_id]
+                self.ids[linha] = -1
+                self.normas[linha] = 0
+                self.contagens[linha] = 0
+                self.geracao[0] += 1
+                self._geracao_local = int(self.geracao[0])
+
+    def vizinhos(self, user_id, k=30):
+        """
+        k usuários mais similares (cosseno) com um único produto
+        matriz-vetor sobre as linhas ocupadas, sem empilhar vetores.
+        O cosseno das somas é igual ao das médias.
+        """
+        with self._lock:
+            self._sincronizar()
+            linha = self._linhas.get(user_id)
+            if linha is None:
+                return []
+            vetor = self.vetores[linha]
+            norma = self.normas[linha]
+            if norma == 0:
+                return []
+
+            scores = (self.vetores @ vetor) / (
+                np.maximum(self.normas, 1e-12) * norma)
+            mascara = self.ids < 0
+            mascara[linha] = True
+            melhores = top_k(scores, k, mascara)
+            return [int(self.ids[i]) for i in melhores]
+
+    def __contains__(self, user_id):
+        with self._lock:
+            self._sincronizar()
+            return user_id in self._linhas
+
+    def __len__(self):
+        with self._lock:
+            self._sincronizar()
+            return len(self._linhas)
+
+
+class _TravaArquivo:
+    """ Trava exclusiva entre processos (fcntl, apenas Unix). """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def __enter__(self):
+        import fcntl
+        self._arquivo = open(self.caminho, 'a')
+        fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        import fcntl
+        fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+        self._arquivo.close()
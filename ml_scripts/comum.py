@@ -0,0 +1,63 @@
+"""
+Peças compartilhadas pelos scripts de treinamento: conexão com o banco,
+tempo por etapa e cache dos dataframes intermediários em Parquet.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+BASE_DIR = Path(__file__).resolve().parent
+DIR_CACHE = BASE_DIR / 'cache'
+
+# artefatos.py e snapshot_avaliacoes.py ficam no backend
+sys.path.insert(0, str(BASE_DIR.parent / 'backend'))
+
+
+def conectar():
+    load_dotenv(dotenv_path=BASE_DIR.parent / '.env')
+    user = os.getenv("DB_USER")
+    password = os.getenv("DB_PASS")
+    host = os.getenv("DB_HOST", "localhost")
+    port = os.getenv("DB_PORT", "5432")
+    db_name = os.getenv("DB_NAME")
+    return create_engine(
+        f"postgresql://{user}:{password}@{host}:{port}/{db_name}")
+
+
+class Etapas:
+    """ Cronometra as etapas de um treinamento (gravado em execucao.json). """
+
+    def __init__(self):
+        self.tempos = {}
+
+    @contextmanager
+    def medir(self, nome):
+        print(f"[{nome}] iniciando...")
+        inicio = time.time()
+        yield
+        self.tempos[nome] = round(time.time() - inicio, 2)
+        print(f"[{nome}] concluído em {self.tempos[nome]:.2f}s")
+
+
+def em_cache(nome, gerar, usar_cache=False):
+    """
+    DataFrame de cache/<nome>.parquet se usar_cache e ele existir; senão
+    gera e grava o cache. Sem pyarrow o cache é só ignorado.
+    """
+    caminho = DIR_CACHE / f'{nome}.parquet'
+    if usar_cache and caminho.exists():
+        import pandas as pd
+        print(f"Usando cache {caminho}")
+        return pd.read_parquet(caminho)
+
+    df = gerar()
+    try:
+        DIR_CACHE.mkdir(exist_ok=True)
+        df.to_parquet(caminho, index=False)
+    except ImportError as e:
+        print(f"Cache não gravado (instale pyarrow): {e}")
+    return df
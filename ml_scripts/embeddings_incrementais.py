@@ -0,0 +1,162 @@
+"""
+Embeddings incrementais do modelo de conteúdo: cada texto de filme é
+identificado pelo hash do campo `texto`, e os vetores já calculados
+ficam guardados por hash em cache/embeddings/<modelo>/. A cada
+treinamento só os filmes novos ou com texto alterado passam pelo
+SentenceTransformer; a matriz final (na ordem dos tmdb_ids) é montada
+a partir do armazém.
+
+O armazém só cresce por partes novas (parte_00001.npz, ...), então um
+treino interrompido não perde os lotes já gravados. Quando guarda mais
+que o dobro dos textos em uso, é compactado em uma parte só.
+"""
+import glob
+import hashlib
+import os
+import numpy as np
+from comum import DIR_CACHE
+
+
+def hash_texto(texto):
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def _diretorio_modelo(nome_modelo):
+    seguro = "".join(c if c.isalnum() else "_" for c in nome_modelo)
+    return os.path.join(DIR_CACHE, 'embeddings', seguro)
+
+
+class ArmazemEmbeddings:
+    """ hash do texto -> vetor (float32), gravado em partes .npz. """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.posicoes = {}   # hash -> (parte, linha)
+        self._partes = []    # vetores de cada parte
+        self._recuperar_interrompidos()
+        self._carregar()
+
+    @classmethod
+    def do_modelo(cls, nome_modelo):
+        return cls(_diretorio_modelo(nome_modelo))
+
+    def _arquivos(self):
+        return sorted(glob.glob(os.path.join(self.diretorio, 'parte_*.npz')))
+
+    def _recuperar_interrompidos(self):
+        """
+        Arquivos largados por uma execução interrompida: temporários de
+        adicionar() são apagados; partes .old (versões anteriores de
+        compactar() as renomeavam antes de gravar a parte nova, e o
+        cache podia ficar só nelas) voltam a ser partes.
+        """
+        for temporario in glob.glob(os.path.join(self.diretorio,
+                                                 '.tmp_parte_*.npz')):
+            os.remove(temporario)
+        for antigo in glob.glob(os.path.join(self.diretorio,
+                                             'parte_*.npz.old')):
+            original = antigo[:-len('.old')]
+            if os.path.exists(original):
+                os.remove(antigo)
+            else:
+                os.replace(antigo, original)
+
+    def _proximo_numero(self):
+        """ Depois da última parte (após compactar, restam números altos). """
+        arquivos = self._arquivos()
+        if not arquivos:
+            return 1
+        return int(os.path.basename(arquivos[-1])[len('parte_'):-4]) + 1
+
+    def _carregar(self):
+        for arquivo in self._arquivos():
+            with np.load(arquivo) as dados:
+                hashes, vetores = dados['hashes'], dados['vetores']
+            parte = len(self._partes)
+            self._partes.append(vetores)
+            for linha, h in enumerate(hashes.tolist()):
+                self.posicoes[h] = (parte, linha)
+
+    def __contains__(self, h):
+        return h in self.posicoes
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def adicionar(self, hashes, vetores):
+        """ Grava uma parte nova com os vetores dos hashes. """
+        os.makedirs(self.diretorio, exist_ok=True)
+        numero = self._proximo_numero()
+        caminho = os.path.join(self.diretorio, f'parte_{numero:05d}.npz')
+        vetores = np.asarray(vetores, dtype=np.float32)
+        # fora do padrão parte_*.npz: um temporário largado por uma
+        # execução interrompida não é lido como parte
+        temporario = os.path.join(self.diretorio,
+                                  f'.tmp_parte_{numero:05d}.npz')
+        np.savez(temporario, hashes=np.array(hashes), vetores=vetores)
+        os.replace(temporario, caminho)
+        parte = len(self._partes)
+        self._partes.append(vetores)
+        for linha, h in enumerate(hashes):
+            self.posicoes[h] = (parte, linha)
+
+    def matriz(self, hashes):
+        """ Vetores na ordem dos hashes pedidos (todos já no armazém). """
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        dim = self._partes[0].shape[1]
+        saida = np.empty((len(hashes), dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            parte, linha = self.posicoes[h]
+            saida[i] = self._partes[parte][linha]
+        return saida
+
+    def compactar(self, hashes_usados):
+        """
+        Mantém só os hashes usados, em uma única parte. A parte nova é
+        gravada (temporário + replace) antes de apagar as antigas: uma
+        interrupção no meio deixa vetores repetidos, não um cache vazio.
+        """
+        usados = [h for h in dict.fromkeys(hashes_usados) if h in self]
+        vetores = self.matriz(usados) if usados else None
+        antigos = self._arquivos()
+        self.posicoes, self._partes = {}, []
+        if usados:
+            self.adicionar(usados, vetores)
+        for arquivo in antigos:
+            os.remove(arquivo)
+
+
+def gerar_embeddings_incremental(textos, nome_modelo, batch_size=64,
+                                 tam_lote=1024, armazem=None):
+    """
+    Matriz de embeddings (normalizados) dos textos, codificando só os
+    textos cujo hash ainda não está no armazém, em lotes de tam_lote na
+    CPU. Retorna (embeddings, quantidade codificada agora).
+    """
+    armazem = armazem or ArmazemEmbeddings.do_modelo(nome_modelo)
+    hashes = [hash_texto(t) for t in textos]
+
+    pendentes = {}
+    for h, texto in zip(hashes, textos):
+        if h not in armazem and h not in pendentes:
+            pendentes[h] = texto
+    print(f"{len(hashes) - len(pendentes)} embeddings reaproveitados, "
+          f"{len(pendentes)} a gerar")
+
+    if pendentes:
+        from sentence_transformers import SentenceTransformer
+        modelo = SentenceTransformer(nome_modelo, device='cpu')
+        itens = list(pendentes.items())
+        for inicio in range(0, len(itens), tam_lote):
+            lote = itens[inicio:inicio + tam_lote]
+            vetores = modelo.encode(
+                [texto for _, texto in lote], batch_size=batch_size,
+                show_progress_bar=False, normalize_embeddings=True)
+            armazem.adicionar([h for h, _ in lote], vetores)
+            print(f"  {min(inicio + tam_lote, len(itens))}/{len(itens)}")
+
+    embeddings = armazem.matriz(hashes)
+    if len(armazem) > 2 * len(set(hashes)):
+        armazem.compactar(hashes)
+    return embeddings, len(pendentes)
@@ -0,0 +1,99 @@
+"""
+Treinamento sem Jupyter, com os mesmos passos dos notebooks:
+
+    python pipeline.py train-content [--cache] [--k-vizinhos 50]
+    python pipeline.py train-collab [--n-jobs 4] [--fatores 50,100]
+    python pipeline.py train-all
+
+Cada execução grava em artefatos/AAAAMMDD-HHMMSS/ os .pkl, os
+diretórios de artefato e um execucao.json com versões, parâmetros,
+métricas e o tempo de cada etapa. Copie o que for usar para backend/.
+"""
+import argparse
+import json
+import os
+import time
+from comum import BASE_DIR, Etapas
+from artefatos import K_VIZINHOS
+
+DIR_SAIDA = BASE_DIR / 'artefatos'
+
+
+def _lista(tipo):
+    return lambda valor: [tipo(v) for v in valor.split(',') if v.strip()]
+
+
+def _treinar_conteudo(args, saida, etapas):
+    import treinamento_recomendacao
+    return treinamento_recomendacao.treinar(
+        saida, args.k_vizinhos, args.modelo, args.batch_size, args.cache,
+        etapas, not args.recalcular_embeddings, args.tam_lote)
+
+
+def _treinar_colaborativo(args, saida, etapas):
+    import treinamento_colaborativo
+    grade = dict(treinamento_colaborativo.GRADE_PADRAO)
+    for chave, valores in (('n_factors', args.fatores),
+                           ('n_epochs', args.epocas),
+                           ('lr_all', args.lr), ('reg_all', args.reg)):
+        if valores:
+            grade[chave] = valores
+    return treinamento_colaborativo.treinar(
+        saida, grade, args.cv, args.n_jobs,
+        snapshot_completo=args.snapshot_completo, etapas=etapas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('comando',
+                        choices=['train-content', 'train-collab',
+                                 'train-all'])
+    parser.add_argument('--saida', default=str(DIR_SAIDA),
+                        help="diretório base das versões")
+
+    conteudo = parser.add_argument_group('conteúdo')
+    conteudo.add_argument('--modelo',
+                          default="paraphrase-multilingual-MiniLM-L12-v2")
+    conteudo.add_argument('--batch-size', type=int, default=64)
+    conteudo.add_argument('--k-vizinhos', type=int, default=K_VIZINHOS)
+    conteudo.add_argument('--cache', action='store_true',
+                          help="reaproveita os dataframes em cache/")
+    conteudo.add_argument('--recalcular-embeddings', action='store_true',
+                          help="recodifica todos os filmes")
+    conteudo.add_argument('--tam-lote', type=int, default=1024,
+                          help="filmes codificados por lote gravado")
+
+    colab = parser.add_argument_group('colaborativo')
+    colab.add_argument('--n-jobs', type=int, default=-1,
+                       help="processos da validação (-1 = todos os núcleos)")
+    colab.add_argument('--cv', type=int, default=3)
+    colab.add_argument('--fatores', type=_lista(int))
+    colab.add_argument('--epocas', type=_lista(int))
+    colab.add_argument('--lr', type=_lista(float))
+    colab.add_argument('--reg', type=_lista(float))
+    colab.add_argument('--snapshot-completo', action='store_true',
+                       help="relê MovieLens e notas locais do zero")
+    args = parser.parse_args()
+
+    saida = os.path.join(args.saida, time.strftime("%Y%m%d-%H%M%S"))
+    etapas = Etapas()
+    execucao = {'comando': args.comando, 'saida': saida}
+    inicio = time.time()
+
+    if args.comando in ('train-content', 'train-all'):
+        execucao['conteudo'] = _treinar_conteudo(args, saida, etapas)
+    if args.comando in ('train-collab', 'train-all'):
+        execucao['colaborativo'] = _treinar_colaborativo(args, saida, etapas)
+
+    execucao['tempos'] = dict(etapas.tempos,
+                              total=round(time.time() - inicio, 2))
+    with open(os.path.join(saida, 'execucao.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(execucao, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(execucao, ensure_ascii=False, indent=2))
+    print(f"TREINAMENTO CONCLUÍDO! Artefatos em {saida}")
+
+
+if __name__ == '__main__':
+    main()
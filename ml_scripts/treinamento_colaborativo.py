@@ -0,0 +1,105 @@
+"""
+Mesmo pipeline do treinamento_colaborativo.ipynb em forma de script:
+notas do snapshot (MovieLens + avaliações + favoritos, ver
+backend/snapshot_avaliacoes.py), validação cruzada do SVD e treino final
+com todos os dados.
+
+A validação roda os folds (e, com mais de um valor por parâmetro, cada
+combinação da grade) em paralelo em n_jobs processos.
+
+    python pipeline.py train-collab --fatores 50,100 --n-jobs 4
+"""
+import itertools
+import os
+import time
+import joblib
+from surprise import SVD, Dataset, Reader
+from surprise.model_selection import GridSearchCV, cross_validate
+from comum import BASE_DIR, Etapas, conectar
+from artefatos import exportar_colaborativo
+from snapshot_avaliacoes import DIR_SNAPSHOT, atualizar_snapshot
+
+VERSAO = "1.4.0"
+PATH_RATINGS = BASE_DIR / 'ratings.csv'
+PATH_LINKS = BASE_DIR / 'links.csv'
+DIR_SNAPSHOT_PADRAO = BASE_DIR.parent / 'backend' / DIR_SNAPSHOT
+
+# hiperparâmetros do notebook; listas com mais de um valor viram grade
+GRADE_PADRAO = {
+    'n_factors': [100],
+    'n_epochs': [20],
+    'lr_all': [0.005],
+    'reg_all': [0.02],
+}
+
+
+def carregar_notas(caminho_snapshot=DIR_SNAPSHOT_PADRAO, completo=False):
+    """ df_total do notebook (id_usuario, tmdb_id, nota). """
+    with conectar().connect() as conexao:
+        snapshot = atualizar_snapshot(
+            conexao, str(caminho_snapshot), PATH_RATINGS, PATH_LINKS,
+            completo)
+    print(f"Snapshot: {snapshot.resumo()}")
+    return snapshot.dataframe()
+
+
+def validar(data, grade, cv=3, n_jobs=-1):
+    """ (melhores parâmetros, RMSE médio) da validação cruzada. """
+    combinacoes = list(itertools.product(*grade.values()))
+    if len(combinacoes) == 1:
+        params = dict(zip(grade, combinacoes[0]))
+        resultado = cross_validate(
+            SVD(random_state=42, **params), data, measures=['RMSE'],
+            cv=cv, n_jobs=n_jobs, verbose=False)
+        return params, float(resultado['test_rmse'].mean())
+
+    busca = GridSearchCV(SVD, dict(grade, random_state=[42]),
+                         measures=['rmse'], cv=cv, n_jobs=n_jobs)
+    busca.fit(data)
+    params = {k: v for k, v in busca.best_params['rmse'].items()
+              if k != 'random_state'}
+    return params, float(busca.best_score['rmse'])
+
+
+def treinar(saida=".", grade=None, cv=3, n_jobs=-1,
+            caminho_snapshot=DIR_SNAPSHOT_PADRAO, snapshot_completo=False,
+            etapas=None):
+    """ Grava modelo_colaborativo.pkl e modelo_colaborativo/ em saida. """
+    etapas = etapas or Etapas()
+    grade = grade or GRADE_PADRAO
+
+    with etapas.medir('colaborativo/notas'):
+        df_total = carregar_notas(caminho_snapshot, snapshot_completo)
+        print(f"Total de avaliações para treino: {len(df_total)}")
+
+    reader = Reader(rating_scale=(0.5, 5))
+    data = Dataset.load_from_df(
+        df_total[['id_usuario', 'tmdb_id', 'nota']], reader)
+
+    with etapas.medir('colaborativo/validacao'):
+        params, rmse = validar(data, grade, cv, n_jobs)
+        print(f"Parâmetros: {params} | RMSE médio estimado: {rmse:.4f}")
+
+    with etapas.medir('colaborativo/treino'):
+        modelo_final = SVD(random_state=42, **params)
+        modelo_final.fit(data.build_full_trainset())
+
+    metadata = {
+        "version": VERSAO,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "algorithm": "SVD",
+        "n_ratings": len(df_total),
+        "model": modelo_final
+    }
+
+    with etapas.medir('colaborativo/salvar'):
+        os.makedirs(saida, exist_ok=True)
+        joblib.dump(metadata, os.path.join(saida, "modelo_colaborativo.pkl"))
+        exportar_colaborativo(
+            os.path.join(saida, "modelo_colaborativo"), modelo_final,
+            version=VERSAO, n_ratings=metadata["n_ratings"],
+            date=metadata["date"])
+
+    return {'version': VERSAO, 'date': metadata['date'],
+            'n_ratings': len(df_total), 'parametros': params,
+            'rmse_cv': round(rmse, 4), 'folds': cv}
@@ -0,0 +1,173 @@
+"""
+Mesmo pipeline do treinamento_recomendacao.ipynb em forma de script:
+carrega os filmes do banco, monta o texto de cada filme, gera os
+embeddings e salva o modelo_recomendacao.pkl e o diretório de artefato
+(com a tabela de top-K vizinhos usada por /recomendar/multiplos).
+
+    python treinamento_recomendacao.py [--k-vizinhos 50]
+    python pipeline.py train-content      (versionado, ver pipeline.py)
+
+Copie modelo_recomendacao.pkl e/ou modelo_recomendacao/ para backend/.
+"""
+import argparse
+import json
+import os
+import time
+import joblib
+import pandas as pd
+from comum import Etapas, conectar, em_cache
+from artefatos import K_VIZINHOS, calcular_vizinhos, exportar_conteudo
+from embeddings_incrementais import gerar_embeddings_incremental
+
+VERSAO = "1.3.1"
+MODELO_PADRAO = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def carregar_stopwords():
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        return set(stopwords.words('portuguese'))
+    except LookupError:
+        print("Baixando stopwords do NLTK...")
+        nltk.download('stopwords')
+        return set(stopwords.words('portuguese'))
+
+
+def carregar_filmes(engine):
+    """ Filmes com mais de 50 votos (os demais viram ruído). """
+    query = """
+            SELECT
+                tmdb_id, titulo, sinopse, generos,
+                elenco, diretor, keywords, media_votos
+            FROM filmes
+            WHERE qtd_votos > 50
+            """
+    return pd.read_sql(query, engine)
+
+
+def limpar_nomes(nomes_str):
+    """ Pega os 3 primeiros nomes, remove espaços e junta. """
+    if not isinstance(nomes_str, str):
+        return ""
+    nomes_limpos = [n.strip().lower().replace(" ", "")
+                    for n in nomes_str.split(",")[:3]]
+    return ' '.join(nomes_limpos)
+
+
+def limpar_texto(texto, stopwords_pt):
+    """ Remove stopwords do texto. """
+    if not isinstance(texto, str):
+        return ""
+    palavras = texto.lower().split()
+    return ' '.join(p for p in palavras if p not in stopwords_pt)
+
+
+def montar_texto(df_filmes, stopwords_pt):
+    """ Texto combinado de cada filme, na ordem semântica do notebook. """
+    df = df_filmes.copy().fillna("")
+    df["elenco_limpo"] = df["elenco"].apply(limpar_nomes)
+    df["diretor_limpo"] = df["diretor"].apply(limpar_nomes)
+    df["keywords_limpas"] = df["keywords"].str.replace(",", " ", regex=False)
+    df["generos"] = df["generos"].str.replace(",", " ", regex=False)
+
+    df["texto"] = (
+        "Temas: " + df["keywords_limpas"] + "\n" +
+        "Gêneros: " + df["generos"] + "\n" +
+        "Direção: " + df["diretor_limpo"] + "\n" +
+        "Sinope: " + df["sinopse"] + "\n" +
+        "Elenco: " + df["elenco_limpo"] + "\n" +
+        "Título: " + df["titulo"]
+    )
+    df["texto"] = df["texto"].apply(limpar_texto, args=(stopwords_pt,))
+    return df[["tmdb_id", "titulo", "media_votos", "texto"]]
+
+
+def gerar_embeddings(textos, nome_modelo=MODELO_PADRAO, batch_size=64):
+    from sentence_transformers import SentenceTransformer
+    modelo = SentenceTransformer(nome_modelo)
+    return modelo.encode(textos, batch_size=batch_size,
+                         show_progress_bar=True, normalize_embeddings=True)
+
+
+def treinar(saida=".", k_vizinhos=K_VIZINHOS, nome_modelo=MODELO_PADRAO,
+            batch_size=64, usar_cache=False, etapas=None, incremental=True,
+            tam_lote=1024):
+    """
+    Grava modelo_recomendacao.pkl e modelo_recomendacao/ em saida.
+    usar_cache: reaproveita os textos de cache/filmes_texto.parquet.
+    incremental: só codifica filmes novos ou com texto alterado (ver
+    embeddings_incrementais.py); False recodifica o catálogo inteiro.
+    """
+    etapas = etapas or Etapas()
+
+    with etapas.medir('conteudo/textos'):
+        df = em_cache(
+            'filmes_texto',
+            lambda: montar_texto(carregar_filmes(conectar()),
+                                 carregar_stopwords()),
+            usar_cache)
+        print(f"{len(df)} filmes")
+
+    with etapas.medir('conteudo/embeddings'):
+        if incremental:
+            embeddings, codificados = gerar_embeddings_incremental(
+                df['texto'].tolist(), nome_modelo, batch_size, tam_lote)
+        else:
+            embeddings = gerar_embeddings(df['texto'].tolist(), nome_modelo,
+                                          batch_size)
+            codificados = len(df)
+        print(f"Formato dos embeddings (Shape): {embeddings.shape}")
+
+    artefatos = {
+        "version": VERSAO,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model_name": nome_modelo,
+        "embeddings": embeddings,
+        "tmdb_ids": df["tmdb_id"].tolist(),
+        "metadata": df[["tmdb_id", "titulo", "media_votos"]].to_dict(
+            orient="records")
+    }
+
+    vizinhos = None
+    if k_vizinhos:
+        with etapas.medir('conteudo/vizinhos'):
+            vizinhos = calcular_vizinhos(embeddings, k_vizinhos)
+            artefatos["vizinhos_indices"], artefatos["vizinhos_scores"] = \
+                vizinhos
+
+    with etapas.medir('conteudo/salvar'):
+        os.makedirs(saida, exist_ok=True)
+        joblib.dump(artefatos,
+                    os.path.join(saida, "modelo_recomendacao.pkl"))
+        exportar_conteudo(
+            os.path.join(saida, "modelo_recomendacao"), embeddings,
+            artefatos["tmdb_ids"], artefatos["metadata"],
+            version=VERSAO, model_name=nome_modelo, date=artefatos["date"],
+            k_vizinhos=k_vizinhos, vizinhos=vizinhos)
+
+    return {'version': VERSAO, 'date': artefatos['date'],
+            'model_name': nome_modelo, 'filmes': len(df),
+            'embeddings_gerados': codificados, 'k_vizinhos': k_vizinhos}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Treina o modelo de conteúdo (embeddings + vizinhos)")
+    parser.add_argument('--k-vizinhos', type=int, default=K_VIZINHOS,
+                        help="vizinhos por filme (0 = não gerar a tabela)")
+    parser.add_argument('--modelo', default=MODELO_PADRAO)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--saida', default=".")
+    parser.add_argument('--cache', action='store_true',
+                        help="reaproveita os textos em cache/")
+    parser.add_argument('--recalcular-embeddings', action='store_true',
+                        help="recodifica todos os filmes")
+    parser.add_argument('--tam-lote', type=int, default=1024,
+                        help="filmes codificados por lote gravado")
+    args = parser.parse_args()
+    etapas = Etapas()
+    info = treinar(args.saida, args.k_vizinhos, args.modelo,
+                   args.batch_size, args.cache, etapas,
+                   not args.recalcular_embeddings, args.tam_lote)
+    print(json.dumps(dict(info, tempos=etapas.tempos), indent=2))